@@ -0,0 +1,240 @@
+// Clientside rendering mode (TACTICPLOT_RENDER=client): the server sends the actions of both teams
+// (tacticplot.compact) and the figures are built here, trace for trace as tacticplot.plot and
+// tacticplot.formation build them with batch=True. The marks of the minute range are set here in
+// both rendering modes.
+
+(function () {
+    var PITCH = [120, 80];
+
+    var goal = 'sienna';
+    var no_goal = 'goldenrod';
+    var carry = 'gainsboro';
+    var defense = 'darkgreen';
+    var defense_no = 'yellowgreen';
+    var passes = 'RGB(26,26,26)';
+
+    // Points of a part as [x, y] pairs, null coordinates rotated stay null.
+    function orient(point, rotated) {
+        if (!rotated) {
+            return point;
+        }
+        return [point[0] === null ? null : PITCH[0] - point[0], point[1] === null ? null : PITCH[1] - point[1]];
+    }
+
+    function points(columns) {
+        return columns.x.map(function (x, i) { return [x, columns.y[i]]; });
+    }
+
+    function segments(columns) {
+        return columns.x.map(function (x, i) {
+            return [[x, columns.y[i]], [columns.end_x[i], columns.end_y[i]]];
+        });
+    }
+
+    // Same as tacticplot._add_layer with batch=True: all parts in one trace, separated by gaps.
+    function layer(parts, rotated, traceArgs) {
+        var x = [], y = [];
+        parts.forEach(function (part, i) {
+            if (i > 0) {
+                x.push(null);
+                y.push(null);
+            }
+            part.forEach(function (point) {
+                var xy = orient(point, rotated);
+                x.push(xy[0]);
+                y.push(xy[1]);
+            });
+        });
+        return Object.assign({type: 'scatter', x: x, y: y}, traceArgs);
+    }
+
+    function newFigure(skeleton, title) {
+        var fig = JSON.parse(JSON.stringify(skeleton));
+        fig.data = [];
+        fig.layout.title = Object.assign({}, fig.layout.title, {text: title});
+        return fig;
+    }
+
+    function plot(skeleton, legend, team, opponent, rotated) {
+        var fig = newFigure(skeleton.plot, team.name + ' Tactic Plot');
+        var opponent_rotated = !rotated;
+        var data = fig.data;
+
+        // Opponent carry events
+        data.push({type: 'scatter', x: [null], y: [null], legendgroup: 'carry', name: legend.carry,
+                   mode: 'lines', line: {color: carry, width: 1.8, dash: 'dashdot'}});
+        data.push(layer(segments(opponent.carry), opponent_rotated,
+                        {legendgroup: 'carry', showlegend: false, mode: 'lines',
+                         line: {color: carry, width: 1.6, dash: 'dashdot'}}));
+
+        // Opponent pass events
+        data.push({type: 'scatter', x: [null], y: [null], legendgroup: 'passes', name: legend.passes,
+                   mode: 'lines+markers', marker: {symbol: 'circle-open', color: passes, size: 8},
+                   line: {color: passes, width: 0.8, dash: 'dot'}});
+        var pass_segments = segments(opponent.passes);
+        data.push(layer(pass_segments.map(function (s) { return s.slice(1); }), opponent_rotated,
+                        {legendgroup: 'passes', showlegend: false, mode: 'markers',
+                         marker: {size: 6, symbol: 'circle-open', color: passes, opacity: 0.9}}));
+        data.push(layer(pass_segments.map(function (s) { return s.slice(0, 1); }), opponent_rotated,
+                        {legendgroup: 'passes', showlegend: false, mode: 'markers',
+                         marker: {size: 3, symbol: 'circle-open', color: passes, opacity: 0.6}}));
+        data.push(layer(pass_segments, opponent_rotated,
+                        {legendgroup: 'passes', showlegend: false, mode: 'lines',
+                         line: {color: passes, width: 0.3, dash: 'dot'}}));
+
+        // Shots
+        data.push(layer([points(team.no_goal)], rotated,
+                        {legendgroup: 'no goal shots', name: 'shots w/ no goal', mode: 'markers',
+                         marker: {size: 7, symbol: 'circle', color: no_goal}}));
+        data.push(layer([points(team.goal)], rotated,
+                        {legendgroup: 'goal shots', name: 'shots w/ goal', mode: 'markers',
+                         marker: {size: 9, symbol: 'circle', color: goal}}));
+
+        // Trajectories before the shots
+        var no_goal_seq = team.no_goal_seq.map(points);
+        data.push(layer(no_goal_seq.map(function (s) { return s.slice(0, -1); }), rotated,
+                        {legendgroup: 'no goal shots', showlegend: false, mode: 'markers',
+                         marker: {size: 6, symbol: 'circle', color: no_goal, opacity: 0.3}}));
+        data.push(layer(no_goal_seq, rotated,
+                        {legendgroup: 'no goal shots', showlegend: false, mode: 'lines',
+                         line: {color: no_goal, width: 0.7}}));
+        var goal_seq = team.goal_seq.map(points);
+        data.push(layer(goal_seq.map(function (s) { return s.slice(0, -1); }), rotated,
+                        {legendgroup: 'goal shots', showlegend: false, mode: 'markers',
+                         marker: {size: 6, symbol: 'circle', color: goal, opacity: 0.3}}));
+        data.push(layer(goal_seq, rotated,
+                        {legendgroup: 'goal shots', showlegend: false, mode: 'lines',
+                         line: {color: goal, width: 1.2}}));
+
+        // Defense events
+        data.push(layer([points(team.defense)], rotated,
+                        {name: 'defense-success', mode: 'markers',
+                         marker: {size: 6, symbol: 'diamond', color: defense, opacity: 0.8}}));
+        data.push(layer([points(team.defense_no)], rotated,
+                        {name: 'defense-no success', mode: 'markers',
+                         marker: {size: 6, symbol: 'diamond', color: defense_no, opacity: 0.8}}));
+        return fig;
+    }
+
+    function formation(skeleton, team, rotated) {
+        var fig = newFigure(skeleton.formation, team.name + ' Formation');
+
+        function lineup(positions) {
+            return positions.map(function (id) { return skeleton.positions[id] || [null, null]; });
+        }
+
+        var start_ids = team.lineups[0].positions;
+        fig.data.push(layer([lineup(start_ids)], rotated,
+                            {mode: 'markers', name: 'starting XI', marker: {size: 8, symbol: 'circle', color: 'grey'}}));
+
+        // Only the tactical shifts which change the positions
+        var tac_temp = start_ids.join(',');
+        team.lineups.slice(1).forEach(function (tac) {
+            if (tac.positions.join(',') !== tac_temp) {
+                fig.data.push(layer([lineup(tac.positions)], rotated,
+                                    {mode: 'markers', name: 'tactical shift ' + tac.minute + ':' + tac.second,
+                                     marker: {size: 8, symbol: 'circle', color: 'tan'}, visible: 'legendonly'}));
+                tac_temp = tac.positions.join(',');
+            }
+        });
+        return fig;
+    }
+
+    // First position in arr[lo:hi] whose value is not below value, arr[lo:hi] being sorted.
+    function lowerBound(arr, value, lo, hi) {
+        while (lo < hi) {
+            var mid = (lo + hi) >> 1;
+            if (arr[mid] < value) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        return lo;
+    }
+
+    // Positions of the rows of a category in a window of the match clock, as timewindow.TimeIndex.window:
+    // the rows are sorted by period and clock, one binary search per period.
+    function windowPositions(columns, start, end) {
+        var period = columns.period, clock = columns.clock, n = period.length;
+        var positions = [];
+        var a = 0;
+        while (a < n) {
+            var b = lowerBound(period, period[a] + 1, a, n);
+            var i = lowerBound(clock, start, a, b);
+            var j = end === null ? b : lowerBound(clock, end, a, b);
+            for (var k = i; k < j; k++) {
+                positions.push(k);
+            }
+            a = b;
+        }
+        return positions;
+    }
+
+    function pick(columns, positions) {
+        var picked = {};
+        Object.keys(columns).forEach(function (key) {
+            picked[key] = positions.map(function (k) { return columns[key][k]; });
+        });
+        return picked;
+    }
+
+    function pickSeq(seq, positions) {
+        return positions.map(function (k) { return seq[k]; });
+    }
+
+    // Actions of a team in a window of the match clock, see timewindow.window
+    function timeWindow(team, start, end) {
+        var goal = windowPositions(team.goal, start, end);
+        var no_goal = windowPositions(team.no_goal, start, end);
+        return Object.assign({}, team, {
+            goal: pick(team.goal, goal), goal_seq: pickSeq(team.goal_seq, goal),
+            no_goal: pick(team.no_goal, no_goal), no_goal_seq: pickSeq(team.no_goal_seq, no_goal),
+            carry: pick(team.carry, windowPositions(team.carry, start, end)),
+            defense: pick(team.defense, windowPositions(team.defense, start, end)),
+            defense_no: pick(team.defense_no, windowPositions(team.defense_no, start, end)),
+            passes: pick(team.passes, windowPositions(team.passes, start, end))
+        });
+    }
+
+    function render(data, minute_range, skeleton) {
+        var no_update = window.dash_clientside.no_update;
+        if (!data || !skeleton) {
+            return [no_update, no_update, no_update, no_update];
+        }
+        var team1 = data.teams[0], team2 = data.teams[1];
+        // Same window as timewindow.parse_range, the end of the slider is the end of the match
+        if (minute_range && (minute_range[0] > 0 || minute_range[1] < skeleton.match_end)) {
+            var end = minute_range[1] < skeleton.match_end ? minute_range[1] : null;
+            team1 = timeWindow(team1, minute_range[0], end);
+            team2 = timeWindow(team2, minute_range[0], end);
+        }
+        return [plot(skeleton, data.legend, team1, team2, false), plot(skeleton, data.legend, team2, team1, true),
+                formation(skeleton, team1, false), formation(skeleton, team2, true)];
+    }
+
+    // Marks of the minute range slider, in seconds of the match clock: every minute, labelled every
+    // 15 minutes, and the tactical shifts drawn on the formation figures of both teams.
+    function timeMarks(formation1, formation2, match_end) {
+        var marks = {};
+        for (var t = 0; t <= match_end; t += 60) {
+            marks[t] = t % 900 === 0 ? (t / 60) + "'" : '';
+        }
+        [[formation1, 'forestgreen'], [formation2, 'sienna']].forEach(function (item) {
+            ((item[0] && item[0].data) || []).forEach(function (trace) {
+                var shift = /^tactical shift (\d+):(\d+)$/.exec(trace.name || '');
+                if (shift) {
+                    marks[Number(shift[1]) * 60 + Number(shift[2])] = {
+                        label: shift[1] + ':' + shift[2], style: {color: item[1]}
+                    };
+                }
+            });
+        });
+        return marks;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        tacticplot: {render: render, plot: plot, formation: formation, timeWindow: timeWindow,
+                     timeMarks: timeMarks}
+    });
+})();
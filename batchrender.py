@@ -0,0 +1,106 @@
+'''
+Render the figures of every match of the catalog ahead of time, on all CPU cores.
+
+The figures are written to <output>/<code version>/, as the json of the four figures of each
+match and optionally as a standalone HTML page. The app serves them without rendering anything
+when TACTICPLOT_PRECOMPUTED_DIR points at <output> and the code version is the same.
+
+Usage:
+    python batchrender.py --output precomputed
+    python batchrender.py --output precomputed --competitions all --html --processes 8
+    TACTICPLOT_PRECOMPUTED_DIR=precomputed gunicorn dash_app:server
+'''
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import plotly
+import plotly.io as pio
+
+import fetcher
+import figurecache
+from catalog import Catalog, COMPETITIONS, parse_competitions
+
+def render(match_id, team1, team2, out_dir, html=False):
+    '''
+    Render the figures of a match and write them to out_dir.
+    :param match_id: Statsbomb match id
+    :param team1: name of the home team, as in the events
+    :param team2: name of the away team, as in the events
+    :param out_dir: versioned output directory
+    :param html: also write a standalone HTML page of the figures
+    :return: a tuple of the match id, the size of the json and the time taken in seconds
+    '''
+    from tacticplot import match_figures
+
+    start = time.perf_counter()
+    figures = match_figures(match_id, team1, team2)
+    payload = figurecache.serialize(figures)
+    figurecache.write_file(os.path.join(out_dir, figurecache.cache_key(match_id, {}) + '.json'), payload)
+
+    if html:
+        divs = [pio.to_html(fig, full_html=False, include_plotlyjs='cdn' if i == 0 else False)
+                for i, fig in enumerate(figures)]
+        page = (f'<html><head><meta charset="utf-8"><title>{team1} - {team2}</title></head>'
+                f'<body>{"".join(divs)}</body></html>')
+        figurecache.write_file(os.path.join(out_dir, f'{match_id}.html'), page)
+    return match_id, len(payload), time.perf_counter() - start
+
+def main(args):
+    catalog = Catalog(parse_competitions(args.competitions))
+    match_ids = args.match_ids or list(catalog.matches)
+    out_dir = figurecache.precomputed_dir(args.output)
+    os.makedirs(out_dir, exist_ok=True)
+
+    if not args.force:
+        done = {name[:-len('.json')] for name in os.listdir(out_dir) if name.endswith('.json')}
+        match_ids = [m for m in match_ids if figurecache.cache_key(m, {}) not in done]
+    print(f'Rendering {len(match_ids)} matches to {out_dir} with {args.processes} processes')
+
+    # Download the event files concurrently first, the processes only parse and render.
+    start = time.perf_counter()
+    fetcher.run(fetcher.prefetch_all([f'events/{m}.json' for m in match_ids]))
+    print(f'Event files ready in {time.perf_counter() - start:.1f}s')
+
+    rendered, failed = [], []
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        futures = {executor.submit(render, m, *catalog.teams(m), out_dir, args.html): m for m in match_ids}
+        for n, future in enumerate(as_completed(futures), 1):
+            try:
+                match_id, size, seconds = future.result()
+            except Exception as e:
+                failed.append(futures[future])
+                print(f'[{n}/{len(futures)}] {futures[future]} failed: {e!r}')
+                continue
+            rendered.append(match_id)
+            print(f'[{n}/{len(futures)}] {catalog.match_name(match_id)} ({match_id}): '
+                  f'{size / 1024:.0f} KB in {seconds:.2f}s')
+
+    # The manifest lists every match rendered in this version, by this run or an earlier one.
+    manifest_file = os.path.join(out_dir, 'manifest.json')
+    manifest = {'matches': []}
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    manifest.update({'version': figurecache.code_version(), 'plotly': plotly.__version__,
+                     'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                     'matches': sorted(set(manifest['matches']) | set(rendered))})
+    figurecache.write_file(manifest_file, json.dumps(manifest, indent=1))
+
+    print(f'{len(rendered)} matches rendered in {time.perf_counter() - start:.1f}s, {len(failed)} failed')
+    return not failed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='precomputed', help='output directory (default: %(default)s)')
+    parser.add_argument('--competitions', default=COMPETITIONS,
+                        help="'competition_id:season_id' pairs separated by commas, or 'all' "
+                             "(default: STATSBOMB_COMPETITIONS or %(default)s)")
+    parser.add_argument('--match-ids', type=int, nargs='+', help='only render these matches')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(),
+                        help='rendering processes (default: number of CPU cores)')
+    parser.add_argument('--html', action='store_true', help='also write a standalone HTML page per match')
+    parser.add_argument('--force', action='store_true', help='render again the matches already in the output')
+    raise SystemExit(0 if main(parser.parse_args()) else 1)
@@ -0,0 +1,456 @@
+'''
+Benchmarks for tacticplot on synthetic Statsbomb events.
+
+Usage:
+    python benchmark.py get_events --sizes 2500 5000 10000 20000 40000
+    python benchmark.py traces --match-ids 3906390 3906389
+    python benchmark.py traces --sizes 3500
+    python benchmark.py decode --match-ids 3906390 3906403
+    python benchmark.py suite --sizes match season --save-baseline
+    python benchmark.py suite --sizes match season --tolerance 0.3
+
+The suite times every entry point of tacticplot and soccerfield, measures their peak memory and the
+size of the figures sent to the browser, and compares them to the baseline saved with --save-baseline.
+The first run on a machine saves its results as the baseline. It exits with status 1 when one of
+them got slower, bigger or heavier than the tolerance allows. Times are the median of --repeat runs,
+and a case must be slower by more than MIN_SECONDS as well, so sub-millisecond cases do not fail on
+the noise of a shared machine.
+'''
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import datacache
+import eventstore
+import live
+import soccerfield, soccerfield2
+import spatial
+import tacticplot
+
+# Share of each event type in a synthetic match, roughly as in Women's World Cup 2023 event files.
+TYPE_WEIGHTS = {30: 30, 42: 27, 43: 23, 17: 5, 2: 3, 3: 2, 9: 1.5, 4: 1.5, 10: 0.5, 16: 0.8,
+                38: 1, 21: 1, 22: 1, 6: 0.5, 19: 0.3, 36: 0.05}
+TYPE_NAMES = {2: 'Ball Recovery', 3: 'Dispossessed', 4: 'Duel', 6: 'Block', 9: 'Clearance',
+              10: 'Interception', 16: 'Shot', 17: 'Pressure', 19: 'Substitution', 21: 'Foul Won',
+              22: 'Foul Committed', 30: 'Pass', 35: 'Starting XI', 36: 'Tactical Shift', 38: 'Miscontrol',
+              42: 'Ball Receipt*', 43: 'Carry'}
+PLAY_PATTERNS = [(1, 'Regular Play'), (4, 'From Throw In'), (3, 'From Free Kick'), (2, 'From Corner'),
+                 (7, 'From Goal Kick')]
+LINEUP = [1, 2, 3, 5, 6, 10, 13, 15, 17, 22, 24]
+
+# Named sizes of the synthetic event streams: one match, the 64 matches of a World Cup, and four seasons.
+SIZES = {'match': 3500, 'season': 64 * 3500, 'seasons': 4 * 64 * 3500}
+
+# Baseline of the suite, written by --save-baseline or by the first run
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Runs of each case of the suite, and the smallest increase of its median time reported as a regression
+SUITE_REPEAT = 7
+MIN_SECONDS = 0.001
+
+def synthetic_events(n_events, seed=0, teams=(("Spain Women's", 772), ("England Women's", 865))):
+    '''
+    :param n_events: number of events of the match
+    :param seed: seed of the random generator
+    :param teams: names and ids of the two teams
+    :return: json data of a synthetic match, with the fields tacticplot reads
+    '''
+    rnd = random.Random(seed)
+    type_ids = list(TYPE_WEIGHTS)
+    weights = list(TYPE_WEIGHTS.values())
+
+    def lineup():
+        return [{'player': {'id': n}, 'position': {'id': p}, 'jersey_number': n}
+                for n, p in enumerate(LINEUP if rnd.random() < 0.5 else rnd.sample(range(1, 26), 11))]
+
+    def location():
+        return [round(rnd.uniform(0, 120), 1), round(rnd.uniform(0, 80), 1)]
+
+    def event_id():
+        return str(uuid.UUID(int=rnd.getrandbits(128)))
+
+    events = []
+    for name, team_id in teams:
+        events.append({'id': event_id(), 'index': len(events) + 1, 'period': 1, 'timestamp': '00:00:00.000',
+                       'minute': 0, 'second': 0, 'type': {'id': 35, 'name': 'Starting XI'},
+                       'possession': 1, 'possession_team': {'id': team_id, 'name': name},
+                       'play_pattern': {'id': 1, 'name': 'Regular Play'}, 'team': {'id': team_id, 'name': name},
+                       'duration': 0.0, 'tactics': {'formation': 433, 'lineup': lineup()}})
+
+    team = 0
+    possession = 1
+    play_pattern = PLAY_PATTERNS[0]
+    for n in range(n_events - len(events)):
+        # Teams keep the ball for a few events in a row, like possessions.
+        if rnd.random() < 0.2:
+            team = 1 - team
+            possession += 1
+            play_pattern = rnd.choices(PLAY_PATTERNS, [70, 12, 10, 5, 3])[0]
+        name, team_id = teams[team]
+        period = 1 if n < n_events / 2 else 2
+        minute = int(90 * n / n_events)
+        second = rnd.randrange(60)
+        type_id = rnd.choices(type_ids, weights)[0]
+        e = {'id': event_id(), 'index': len(events) + 1, 'period': period,
+             'timestamp': f'00:{minute % 45:02d}:{second:02d}.{rnd.randrange(1000):03d}',
+             'minute': minute, 'second': second, 'type': {'id': type_id, 'name': TYPE_NAMES[type_id]},
+             'possession': possession, 'possession_team': {'id': team_id, 'name': name},
+             'play_pattern': {'id': play_pattern[0], 'name': play_pattern[1]},
+             'team': {'id': team_id, 'name': name}, 'duration': round(rnd.expovariate(1 / 1.5), 6)}
+        if type_id not in (19, 36):
+            player = rnd.randrange(11)
+            e['player'] = {'id': team_id * 100 + player, 'name': f'Player {player + 1}'}
+            e['position'] = {'id': LINEUP[player]}
+        if rnd.random() < 0.15:
+            e['under_pressure'] = True
+
+        if type_id == 36:
+            e['tactics'] = {'formation': 442, 'lineup': lineup()}
+        elif type_id not in (19, 21, 22):
+            e['location'] = location()
+
+        if type_id == 30:
+            e['pass'] = {'length': rnd.uniform(2, 70), 'end_location': location()}
+            if rnd.random() < 0.2:
+                e['pass']['outcome'] = {'id': 9, 'name': 'Incomplete'}
+        elif type_id == 43:
+            e['carry'] = {'end_location': location()}
+        elif type_id == 16:
+            goal = rnd.random() < 0.12
+            e['shot'] = {'outcome': {'id': 97, 'name': 'Goal'} if goal else {'id': 98, 'name': 'Off T'},
+                         'end_location': location() + [1.0]}
+        elif type_id == 4:
+            e['duel'] = {'type': {'id': rnd.choice([10, 11])}}
+        elif type_id == 10:
+            e['interception'] = {'outcome': {'id': rnd.choice([1, 4, 13, 14, 15, 16, 17])}}
+        events.append(e)
+    return events
+
+def get_events_reference(events):
+    '''
+    The classification of get_events before the single pass engine, looking shots up with
+    events.index(). Kept to check the output and compare timings.
+    '''
+    goal_events = [e for e in events if e['type']['id'] == 16 and
+            e['shot']['outcome']['name'] == 'Goal' and e['period'] != 5]
+    no_goal_events = [e for e in events if e['type']['id'] == 16 and
+            e['shot']['outcome']['name'] != 'Goal' and e['period'] != 5]
+
+    goal_seq = {}
+    for e in goal_events:
+        before_goal_events = events[events.index(e)-5 : events.index(e)+1]
+        before_goal_events = [e for e in before_goal_events if 'location' in e]
+        goal_seq[e['index']] = before_goal_events
+
+    no_goal_seq = {}
+    for e in no_goal_events:
+        before_no_goal_events = events[events.index(e)-4 : events.index(e)+1]
+        before_no_goal_events= [e for e in before_no_goal_events if 'location' in e]
+        no_goal_seq[e['index']] = before_no_goal_events
+
+    carry = [e for e in events if e['type']['id'] == 43 and e['duration'] > 3.5]
+
+    defense = [e for e in events if e['type']['id'] == 9 or
+                                    (e['type']['id'] == 4 and e['duel']['type']['id'] in [11, 4, 15, 16, 17]) or
+                                    (e['type']['id'] == 10 and e['interception']['outcome']['id'] in [4, 15, 16, 17])]
+
+    defense_no = [e for e in events if (e['type']['id'] == 4 and e['duel']['type']['id'] not in [11, 4, 15, 16, 17]) or
+                                       (e['type']['id'] == 10 and e['interception']['outcome']['id'] not in [4, 15, 16, 17])]
+
+    passes_l = [e for e in events if e['type']['id'] == 30 and e['pass']['length'] > 40 and 'outcome' not in e['pass']]
+
+    starting_XI = [e for e in events if e['type']['id'] == 35]
+    tactic_shift = [e for e in events if e['type']['id'] == 36]
+
+    return (goal_events, no_goal_events, goal_seq, no_goal_seq, carry, defense,
+            defense_no, passes_l, starting_XI, tactic_shift)
+
+def check_early_shot():
+    '''
+    Check the trajectory of a shot among the first events of its team, which has fewer events
+    before it than the window, in get_events on json data and on a column store and in a live match.
+    The reference keeps none of them, its slice starting at a negative position.
+    '''
+    events = synthetic_events(40, seed=0)
+    team = events[0]['team']
+    events[2] = dict(events[2], type={'id': 30, 'name': 'Pass'}, team=team, location=[90.0, 40.0],
+                     **{'pass': {'length': 12.0, 'end_location': [102.0, 40.0]}})
+    events[3] = dict(events[3], type={'id': 16, 'name': 'Shot'}, team=team, location=[102.0, 40.0], period=1,
+                     shot={'outcome': {'id': 97, 'name': 'Goal'}, 'end_location': [120.0, 40.0, 1.0]})
+    # The Starting XI has no location, the trajectory is the pass and the shot.
+    shot, expected = events[3]['index'], [events[2]['index'], events[3]['index']]
+
+    team_events = [e for e in events if e['team']['id'] == team['id']]
+    columns, teams = eventstore.to_columns(events)
+    rows, groups = eventstore.partition(columns)[teams[team['name']]]
+    live_match = live.LiveMatch()
+    live_match.ingest(events)
+    trajectories = {'json': [e['index'] for e in tacticplot.get_events(team_events)[2][shot]],
+                    'columns': tacticplot.get_events(rows, groups=groups)[2][shot]['index'].tolist(),
+                    'live': live_match.tuples(team['name'])[2][shot]['index'].tolist()}
+    for source, trajectory in trajectories.items():
+        assert trajectory == expected, f'trajectory of an early shot from {source}: {trajectory}, expected {expected}'
+
+def best_time(func, *args, repeat=3):
+    '''
+    :return: the fastest of `repeat` runs of func(*args), in seconds
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def median_time(func, *args, repeat=3):
+    '''
+    :return: the median of `repeat` runs of func(*args), in seconds
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+def bench_get_events(sizes, repeat=3):
+    '''
+    Time get_events against the events.index() reference on one team of synthetic matches.
+    '''
+    check_early_shot()
+    print(f"{'events':>8} {'reference ms':>13} {'get_events ms':>14} {'us/event':>9} {'speedup':>8}")
+    for size in sizes:
+        events = synthetic_events(synthetic_size(size), seed=synthetic_size(size))
+        team_events = [e for e in events if e['team']['id'] == events[0]['team']['id']]
+        assert tacticplot.get_events(team_events) == get_events_reference(team_events)
+
+        reference = best_time(get_events_reference, team_events, repeat=repeat)
+        engine = best_time(tacticplot.get_events, team_events, repeat=repeat)
+        print(f'{size:>8} {reference * 1e3:>13.2f} {engine * 1e3:>14.2f} '
+              f'{engine * 1e6 / len(team_events):>9.3f} {reference / engine:>7.1f}x')
+
+def match_tuples(events):
+    '''
+    :param events: json data of all events of a match
+    :return: names of both teams and their tuples generated by get_events
+    '''
+    team1, team2 = list(dict.fromkeys(e['team']['name'] for e in events))[:2]
+    team1_tuples = tacticplot.get_events([e for e in events if e['team']['name'] == team1])
+    team2_tuples = tacticplot.get_events([e for e in events if e['team']['name'] == team2])
+    return team1, team2, team1_tuples, team2_tuples
+
+def bench_traces(matches, repeat=3):
+    '''
+    Compare plot with one trace per event against batched layers, for both teams: figure build time,
+    size of the json sent to the browser and number of traces.
+    :param matches: dict of a label and the output of match_tuples for each match
+    '''
+    print(f"{'match':>15} {'batch':>6} {'build ms':>9} {'json ms':>8} {'json KB':>8} {'traces':>7}")
+    for label, (team1, team2, team1_tuples, team2_tuples) in matches.items():
+        for batch in (False, True):
+            def build():
+                return (tacticplot.plot(team1, team1_tuples, team2_tuples, batch=batch),
+                        tacticplot.plot(team2, team2_tuples, team1_tuples, orientation='left', batch=batch))
+            figures = build()
+            build_time = best_time(build, repeat=repeat)
+            json_time = best_time(lambda: [pio.to_json(fig) for fig in figures], repeat=repeat)
+            size = sum(len(pio.to_json(fig)) for fig in figures)
+            traces = sum(len(fig.data) for fig in figures)
+            print(f'{label:>15} {str(batch):>6} {build_time * 1e3:>9.1f} {json_time * 1e3:>8.1f} '
+                  f'{size / 1024:>8.1f} {traces:>7}')
+
+def decode_full(raw):
+    '''
+    Decode a whole events file with json.loads before projecting it to columns.
+    '''
+    return eventstore.to_columns(json.loads(raw))
+
+def decode_streaming(raw):
+    '''
+    Decode and project the events of a file one at a time.
+    '''
+    return eventstore.to_columns(eventstore.iter_events(io.BytesIO(raw)))
+
+def bench_decode(files, repeat=3):
+    '''
+    Compare the time and peak memory of decoding an events file to columns with json.loads and
+    with the streaming decoder.
+    :param files: dict of a label and the bytes of an events file for each match
+    '''
+    print(f"{'match':>15} {'MB':>6} {'events':>7} {'full ms':>8} {'stream ms':>10} "
+          f"{'full peak MB':>13} {'stream peak MB':>15}")
+    for label, raw in files.items():
+        columns, _ = decode_streaming(raw)
+        assert columns.tobytes() == decode_full(raw)[0].tobytes()
+        full, streaming = best_time(decode_full, raw, repeat=repeat), best_time(decode_streaming, raw, repeat=repeat)
+        print(f'{label:>15} {len(raw) / 2**20:>6.1f} {len(columns):>7} {full * 1e3:>8.1f} {streaming * 1e3:>10.1f} '
+              f'{peak_memory(decode_full, raw) / 2**20:>13.1f} {peak_memory(decode_streaming, raw) / 2**20:>15.1f}')
+
+def synthetic_size(size):
+    '''
+    :param size: number of events, or a name in SIZES
+    :return: number of events
+    '''
+    return SIZES[size] if size in SIZES else int(size)
+
+def peak_memory(func, *args):
+    '''
+    :return: the peak memory allocated by Python during func(*args), in bytes
+    '''
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def suite_cases(n_events):
+    '''
+    :param n_events: number of events of the synthetic stream
+    :return: dict of case names and (function, figure or None) tuples, the figure being the output
+             sent to the browser whose size is measured
+    '''
+    events = synthetic_events(n_events, seed=n_events)
+    team1, team2, team1_tuples, team2_tuples = match_tuples(events)
+    team1_events = [e for e in events if e['team']['name'] == team1]
+    columns, teams = eventstore.to_columns(events)
+    team1_columns = eventstore.team_columns(columns, teams, team1)
+    parts = eventstore.partition(columns)
+    team1_rows, team1_groups = parts[teams[team1]]
+    team2_rows, team2_groups = parts[teams[team2]]
+    team1_column_tuples = tacticplot.get_events(team1_rows, groups=team1_groups)
+    team2_column_tuples = tacticplot.get_events(team2_rows, groups=team2_groups)
+    team1_index = spatial.team_index(0, team1_column_tuples, team2_column_tuples)
+    lasso = ([90, 115, 118, 95], [15, 20, 60, 65])
+
+    def layout(module):
+        def build():
+            module._build_layout.cache_clear()
+            return module.get_layout()
+        return build
+
+    return {
+        'to_columns': (lambda: eventstore.to_columns(events), None),
+        'get_events': (lambda: tacticplot.get_events(team1_events), None),
+        'get_events_columns': (lambda: tacticplot.get_events(team1_columns), None),
+        'partition': (lambda: eventstore.partition(columns), None),
+        'get_events_partitioned': (lambda: tacticplot.get_events(team1_rows, groups=team1_groups), None),
+        'plot': (lambda: tacticplot.plot(team1, team1_tuples, team2_tuples),
+                 tacticplot.plot(team1, team1_tuples, team2_tuples)),
+        'plot_left': (lambda: tacticplot.plot(team2, team2_tuples, team1_tuples, orientation='left'),
+                      tacticplot.plot(team2, team2_tuples, team1_tuples, orientation='left')),
+        'formation': (lambda: tacticplot.formation(team1, team1_tuples),
+                      tacticplot.formation(team1, team1_tuples)),
+        'formation_left': (lambda: tacticplot.formation(team2, team2_tuples, orientation='left'),
+                           tacticplot.formation(team2, team2_tuples, orientation='left')),
+        'spatial.team_index': (lambda: spatial.team_index(0, team1_column_tuples, team2_column_tuples), None),
+        'spatial.rect': (lambda: team1_index.rect(90, 20, 120, 60), None),
+        'spatial.polygon': (lambda: team1_index.polygon(*lasso), None),
+        'live.ingest': (lambda: live.LiveMatch().ingest(events), None),
+        'soccerfield.get_layout': (layout(soccerfield), go.Figure(layout=soccerfield.get_layout())),
+        'soccerfield.get_layout cached': (soccerfield.get_layout, None),
+        'soccerfield2.get_layout': (layout(soccerfield2), go.Figure(layout=soccerfield2.get_layout())),
+        'soccerfield2.get_layout cached': (soccerfield2.get_layout, None),
+    }
+
+def bench_suite(sizes, repeat=SUITE_REPEAT):
+    '''
+    Time every entry point on synthetic streams of each size and measure their peak memory and
+    the json size of their figures.
+    :param sizes: numbers of events or names in SIZES
+    :return: dict of '{size}/{case}' keys and dicts with 'seconds', 'peak_bytes' and 'payload_bytes'
+    '''
+    check_early_shot()
+    results = {}
+    print(f"{'events':>8} {'case':<32} {'ms':>10} {'peak KB':>10} {'json KB':>8}")
+    for size in sizes:
+        n_events = synthetic_size(size)
+        for case, (func, figure) in suite_cases(n_events).items():
+            result = {'seconds': median_time(func, repeat=repeat), 'peak_bytes': peak_memory(func),
+                      'payload_bytes': len(pio.to_json(figure)) if figure is not None else 0}
+            results[f'{size}/{case}'] = result
+            print(f"{n_events:>8} {case:<32} {result['seconds'] * 1e3:>10.2f} "
+                  f"{result['peak_bytes'] / 1024:>10.1f} {result['payload_bytes'] / 1024:>8.1f}")
+    return results
+
+def compare(results, baseline, tolerance=0.25):
+    '''
+    :param results: output of bench_suite
+    :param baseline: output of bench_suite saved earlier
+    :param tolerance: allowed relative increase of time and peak memory. Payloads must not grow at all.
+    :return: list of the regressions found, as strings
+    '''
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric, allowed, floor in (('seconds', tolerance, MIN_SECONDS), ('peak_bytes', tolerance, 0),
+                                       ('payload_bytes', 0, 0)):
+            old, new = baseline[key][metric], result[metric]
+            if new > old * (1 + allowed) and new - old > floor:
+                regressions.append(f'{key} {metric}: {old:.6g} -> {new:.6g}')
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmark', choices=['get_events', 'traces', 'decode', 'suite'])
+    parser.add_argument('--sizes', nargs='+',
+                        help='number of events of each synthetic match, or one of ' + ', '.join(SIZES))
+    parser.add_argument('--match-ids', type=int, nargs='+',
+                        help='Statsbomb matches to use instead of synthetic ones (traces and decode)')
+    parser.add_argument('--repeat', type=int,
+                        help=f'runs of each case (default: 3, {SUITE_REPEAT} for the suite)')
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+                        help='baseline of the suite (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save the results of the suite as the new baseline instead of comparing')
+    parser.add_argument('--no-baseline', action='store_true',
+                        help='only print the results of the suite, without a baseline to compare them to')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative increase of time and peak memory (default: %(default)s)')
+    args = parser.parse_args()
+    sizes = args.sizes and [size if size in SIZES else int(size) for size in args.sizes]
+
+    if args.benchmark == 'get_events':
+        bench_get_events(sizes or [2500, 5000, 10000, 20000, 40000], args.repeat or 3)
+    elif args.benchmark == 'traces':
+        if args.match_ids:
+            matches = {str(match_id): match_tuples(datacache.load_json(f'events/{match_id}.json'))
+                       for match_id in args.match_ids}
+        else:
+            matches = {f'synthetic {size}': match_tuples(synthetic_events(synthetic_size(size), seed=synthetic_size(size)))
+                       for size in sizes or [3500]}
+        bench_traces(matches, args.repeat or 3)
+    elif args.benchmark == 'decode':
+        if args.match_ids:
+            files = {str(match_id): datacache.load_raw(f'events/{match_id}.json') for match_id in args.match_ids}
+        else:
+            # The largest event files of Women's World Cup 2023, matches with extra time, have about 5000 events.
+            files = {f'synthetic {size}': json.dumps(synthetic_events(synthetic_size(size), seed=synthetic_size(size))).encode()
+                     for size in sizes or [3500, 5000]}
+        bench_decode(files, args.repeat or 3)
+    elif args.benchmark == 'suite':
+        results = bench_suite(sizes or ['match', 'season'], args.repeat or SUITE_REPEAT)
+        if args.no_baseline:
+            pass
+        elif args.save_baseline or not os.path.exists(args.baseline):
+            with open(args.baseline, 'w') as f:
+                json.dump(results, f, indent=1, sort_keys=True)
+            print(f'Baseline saved to {args.baseline}')
+        else:
+            with open(args.baseline) as f:
+                regressions = compare(results, json.load(f), args.tolerance)
+            for regression in regressions:
+                print('REGRESSION', regression)
+            if regressions:
+                sys.exit(1)
+            print('No regression against the baseline')
@@ -0,0 +1,144 @@
+import bisect
+import os
+from collections import defaultdict
+
+from datacache import load_snapshot
+
+# Competitions and seasons served by the app, as 'competition_id:season_id' pairs separated by
+# commas, or 'all' for every season in competitions.json. Defaults to Women's World Cup 2023.
+COMPETITIONS = os.environ.get('STATSBOMB_COMPETITIONS', '72:107')
+
+# Order of the knockout stages in the selection menu, other stages come first in order of their first match.
+KNOCKOUT_STAGES = ['Round of 16', 'Quarter-finals', 'Semi-finals', '3rd Place Final', 'Final']
+
+# Shorter names of some countries for the selection menu
+COUNTRY_NAMES = {'Korea\xa0(South)': 'South Korea', 'United States of America': 'USA'}
+
+def parse_competitions(value):
+    '''
+    :param value: 'all', or 'competition_id:season_id' pairs separated by commas
+    :return: None for all seasons, or a list of (competition_id, season_id) tuples
+    '''
+    if value.strip() == 'all':
+        return None
+    return [tuple(int(i) for i in pair.split(':')) for pair in value.split(',') if pair.strip()]
+
+def team_label(team_name):
+    '''
+    :param team_name: Statsbomb team name, e.g. "Spain Women's"
+    :return: name shown on the plots, e.g. 'Spain'
+    '''
+    return team_name[:-len(" Women's")] if team_name.endswith(" Women's") else team_name
+
+class Catalog:
+    '''
+    Competitions, seasons and matches of the Statsbomb open data, indexed for constant time lookups.
+    '''
+
+    def __init__(self, competitions=None):
+        '''
+        :param competitions: list of (competition_id, season_id) tuples to load, None for all
+        '''
+        competition_list, source = load_snapshot('competitions.json')
+        self.sources = {source}
+        self.seasons = {}
+        for c in competition_list:
+            key = (c['competition_id'], c['season_id'])
+            if competitions is None or key in competitions:
+                self.seasons[key] = c
+        if competitions is not None:
+            # Keep the order asked for, it is the order of the selection menu.
+            self.seasons = {key: self.seasons[key] for key in competitions if key in self.seasons}
+
+        self.matches = {}
+        self.season_matches = {}
+        self.team_matches = defaultdict(list)
+        self.stage_matches = defaultdict(list)
+        for competition_id, season_id in self.seasons:
+            match_list, source = load_snapshot(f'matches/{competition_id}/{season_id}.json')
+            self.sources.add(source)
+            match_list = sorted(match_list, key=lambda m: (m['match_date'], m.get('kick_off') or ''))
+            self.season_matches[(competition_id, season_id)] = [m['match_id'] for m in match_list]
+            for match in match_list:
+                self.matches[match['match_id']] = match
+                self.team_matches[match['home_team']['home_team_name']].append(match['match_id'])
+                self.team_matches[match['away_team']['away_team_name']].append(match['match_id'])
+                stage = (competition_id, season_id, match['competition_stage']['name'])
+                self.stage_matches[stage].append(match['match_id'])
+
+        # Seasons were loaded one after the other, sort the matches of each team across seasons.
+        for match_ids in self.team_matches.values():
+            match_ids.sort(key=lambda i: self.matches[i]['match_date'])
+
+        # All matches sorted by date, for date range queries
+        self.dates = sorted((m['match_date'], match_id) for match_id, m in self.matches.items())
+
+    def match(self, match_id):
+        '''
+        :return: match data as in matches/{competition_id}/{season_id}.json
+        '''
+        return self.matches[int(match_id)]
+
+    def teams(self, match_id):
+        '''
+        :return: a tuple of the home and away team names
+        '''
+        match = self.match(match_id)
+        return match['home_team']['home_team_name'], match['away_team']['away_team_name']
+
+    def match_name(self, match_id):
+        '''
+        :return: name of the match in the selection menu, e.g. 'Spain vs. England'
+        '''
+        match = self.match(match_id)
+        season = self.seasons[(match['competition']['competition_id'], match['season']['season_id'])]
+        if season.get('competition_international'):
+            home = match['home_team']['country']['name']
+            away = match['away_team']['country']['name']
+            home, away = COUNTRY_NAMES.get(home, home), COUNTRY_NAMES.get(away, away)
+        else:
+            home, away = (team_label(name) for name in self.teams(match_id))
+        return f'{home} vs. {away}'
+
+    def matches_of_team(self, team_name):
+        '''
+        :return: match ids of a team sorted by date
+        '''
+        return self.team_matches.get(team_name, [])
+
+    def matches_between(self, start_date, end_date):
+        '''
+        :param start_date: first date, 'YYYY-MM-DD'
+        :param end_date: last date, 'YYYY-MM-DD'
+        :return: match ids played between both dates, sorted by date
+        '''
+        start = bisect.bisect_left(self.dates, (start_date,))
+        end = bisect.bisect_right(self.dates, (end_date, float('inf')))
+        return [match_id for _, match_id in self.dates[start:end]]
+
+    def stages(self, competition_id, season_id):
+        '''
+        :return: stage names of a season in the order of the selection menu
+        '''
+        names = [stage for (c, s, stage) in self.stage_matches if (c, s) == (competition_id, season_id)]
+        first_dates = {stage: self.matches[self.stage_matches[(competition_id, season_id, stage)][0]]['match_date']
+                       for stage in names}
+        return sorted(names, key=lambda stage: (stage in KNOCKOUT_STAGES,
+                                                KNOCKOUT_STAGES.index(stage) if stage in KNOCKOUT_STAGES else 0,
+                                                first_dates[stage]))
+
+    def season_teams(self, competition_id, season_id):
+        '''
+        :return: names of the teams playing in a season, sorted by name
+        '''
+        names = set()
+        for match_id in self.season_matches[(competition_id, season_id)]:
+            names.update(self.teams(match_id))
+        return sorted(names)
+
+    def season_name(self, competition_id, season_id):
+        '''
+        :return: e.g. "Women's World Cup 2023"
+        '''
+        season = self.seasons[(competition_id, season_id)]
+        return f"{season['competition_name']} {season['season_name']}"
@@ -0,0 +1,23 @@
+'''
+Settings shared by the layout of the app and the modules rendering the matches. Kept free of
+imports, so a worker builds the layout without loading numpy and the event store.
+'''
+
+# End of the minute range slider, in seconds of the match clock. A window ending there runs to the
+# end of the match, stoppage time and extra time included.
+MATCH_END = 120 * 60
+
+# Thresholds of the classification rules, see rules.RULES. Refer to Statsbomb data specification for the ids.
+DEFAULT_PARAMS = {
+    # Carries longer than this, in seconds
+    'carry_min_duration': 3.5,
+    # Passes longer than this, in yards
+    'long_pass_min_length': 40,
+    # Pass outcome ids of the long passes, -1 being a completed pass which has no outcome
+    'long_pass_outcomes': [-1],
+    # Duel type ids counted as a successful defense, the other duels are not successful: 11 Tackle
+    # and 10 Aerial Lost
+    'duel_success_types': [11],
+    # Interception outcome ids counted as a successful defense
+    'interception_success_outcomes': [4, 15, 16, 17],
+}
@@ -1,427 +1,834 @@
-import dash
-from dash import Dash, html, dcc
-import dash_bootstrap_components as dbc
-from dash.dependencies import Input,Output
-import requests
-
-from tacticplot import plot, plot2, get_events, formation, formation2
-
-def load_json(url):
-    '''
-    Load json data from the given URL.
-    '''
-    response = requests.get(url)
-    return response.json()
-
-# Load the URL of match data for World Cup 2023 from Statsbomb
-url_WC_2023 = 'https://raw.githubusercontent.com/statsbomb/open-data/master/data/matches/72/107.json'
-json_data_2023 = load_json(url_WC_2023)
-
-# Sort stage group for user to select match
-stage_dict = {}
-for match in json_data_2023:
-    stage_name = match['competition_stage']['name']
-    match_id = str(match['match_id'])
-    
-    if stage_name not in stage_dict:
-        stage_dict[stage_name] = []
-    stage_dict[stage_name].append(match_id)
-
-stage_dict['Group Stage'] = sorted(stage_dict['Group Stage'])
-
-# Pair match id and match name for user to select match
-match_dict = {str(match["match_id"]): 
-    f"{match['home_team']['country']['name']} vs. {match['away_team']['country']['name']}"
-    for match in json_data_2023}
-
-match_dict = {key: value.replace('Korea\xa0(South)', 'South Korea') for key, value in match_dict.items()}
-match_dict = {key: value.replace('United States of America', 'USA') for key, value in match_dict.items()}
-
-# Get a full list of match ids
-match_list = [str(match['match_id']) for match in json_data_2023]
-
-# Get a dictionary with match ids as keys and a tuple of both teams in that match as value
-team_dict = {match['match_id']: 
-    (match['home_team']['home_team_name'], match['away_team']['away_team_name'])
-    for match in json_data_2023}
-
-# Build the app
-app = Dash(__name__, external_stylesheets=[dbc.themes.ZEPHYR],
-          meta_tags=[{"name": "viewport", "content": "width=device-width,"
-                      "initial-scale=1, maximum-scale=1, maximum-scale=1"}])
-
-app.title = "World Cup 2023 Data Visualization"
-
-server = app.server
-app.config.suppress_callback_exceptions = True
-
-def description_card():
-    '''
-    :return: An HTML Div element introducing the app.
-    :rtype: dash_html_components.Div
-    '''
-    return html.Div(
-        id="description",
-        children=[
-            html.H5("Statsbomb Open Data Visualization",
-                    style = {"font-size": "24px", "font-weight": "bold", 'color': 'dark-grey'}),
-            html.Img(src=app.get_asset_url("statsbomb.png"),
-                     style={"width": "60%", "height": "auto", "margin-bottom": "20px",
-                            "margin-left": "18px"}),
-
-            html.Div(
-                id="intro",
-                children="Great appreciation towards Statsbomb for sharing valuable data of the "
-                         "Women's World Cup 2023, as part of their commitment to support women's soccer. "
-                         "This project visualizes the data with an emphasis on team tactics, aiming to extend "
-                         "its usage and recognition.",
-                style={"font-size": "14px"}
-
-            ),
-            html.Img(src=app.get_asset_url("wc2023.jpg"),
-                     style={"width": "100%", "height": "auto", "margin-top": "20px",
-                            "margin-bottom": "20px"}),
-        ],
-    )
-
-def game_select_card():
-    '''
-    :return: An HTML Div element providing accordion menu for match selection.
-    :rtype: dash_html_components.Div
-    '''
-    return html.Div([
-        dbc.Accordion(
-          [
-            dbc.AccordionItem(
-                className= "accordion-title",
-                children =
-                [
-                    html.Button(match_dict[match], id=match, style={'width': '46%', 'font-size': '13px',
-                                                                    "margin-left": "-13px", "margin-right": "15px"},
-                               className="border-0 bg-light font-weight-light my-0")
-                    for match in stage_dict['Group Stage']
-                ],
-                title="Group Stage"
-            ),
-            dbc.AccordionItem(
-                [
-                    html.Button(match_dict[match], id=match, style={'width': '46%', 'font-size': '13px',
-                                                                    "margin-left": "-13px", "margin-right": "15px"},
-                               className="border-0 bg-light font-weight-light my-0")
-                    for match in stage_dict['Round of 16']
-                ],
-                title="Round of 16"
-            ),
-            dbc.AccordionItem(
-                [
-                    html.Button(match_dict[match], id=match, style={'width': '46%', 'font-size': '13px',
-                                                                    "margin-left": "-13px", "margin-right": "15px"},
-                               className="border-0 bg-light font-weight-light my-0")
-                    for match in stage_dict['Quarter-finals']
-                ],
-                title="Quarter-finals"
-            ),
-            dbc.AccordionItem(
-                [
-                    html.Button(match_dict[match], id=match, style={'width': '46%', 'font-size': '13px',
-                                                                    "margin-left": "-13px", "margin-right": "15px"},
-                               className="border-0 bg-light font-weight-light my-0")
-                    for match in stage_dict['Semi-finals']
-                ],
-                title="Semi-finals"
-            ),
-            dbc.AccordionItem(
-                [
-                    html.Button(match_dict[match], id=match, style={'width': '46%', 'font-size': '13px',
-                                                                    "margin-left": "-13px", "margin-right": "15px"},
-                               className="border-0 bg-light font-weight-light my-0")
-                    for match in stage_dict['3rd Place Final']
-                ],
-                title="3rd Place Final"
-            ),
-            dbc.AccordionItem(
-                [
-                    html.Button(match_dict[match], id=match, style={'width': '46%', 'font-size': '13px',
-                                                                    "margin-left": "-13px", "margin-right": "15px"},
-                               className="border-0 bg-light font-weight-light my-0")
-                    for match in stage_dict['Final']
-                ],
-                title="Final"
-            ),
-          ], flush = True,
-        ),
-
-        html.Div(id="output-div", style={'display': 'none'}),
-
-    ])
-
-# App layout
-app.layout = dbc.Container(
-    fluid=True,
-    children=[
-        # First row is the banner
-        dbc.Row(
-            html.Div([
-                html.Div(id="banner1", className="banner ",
-                         children=[
-                             html.Img(src=app.get_asset_url("github.JPG"),
-                                      style={"width":"auto", "height": "20px",  'margin-bottom':"5px", 'margin-left':'73px'})
-                         ], style ={"display": "inline-block"}),
-                html.Div(id="banner2", className="banner",
-                         children=[
-                             dbc.NavLink("by Lori He",
-                                         href="https://github.com/lorihe/Statsbomb_open_data_utilization",
-                                         style={'color': 'honeydew'})
-                         ], style ={"display": "inline-block"}),
-                ]
-            ),
-            style={"height": "32px", "background-color": "black", 'margin-bottom': '10px',
-                   "z-index": "2"},
-        ),
-
-        # Second row is content
-        dbc.Row([
-            # First column is app description and match selection menu
-            dbc.Col(
-                html.Div(
-                    children= [
-                        html.Div(description_card(), style={"width": "90%"}),
-                        html.Div(game_select_card(), style={"width": "90%"})
-                    ], style = {'margin-left': '40px', 'margin-bottom': '20px'}
-                ), xs={'size': 12}, sm={'size': 12}, md={'size': 12},
-                   lg={'size': 3}, xl={'size': 3},
-                   style = {'margin-right': '-1%'}
-            ),
-
-            # Second column shows match overview information
-            dbc.Col(
-                html.Div(
-                    id = 'column',
-                    children=[
-                        html.H6('a',
-                                style={'margin-left': '-19px', 'margin-right': '-110px',
-                                       'color': 'RGB(180,238,180)', 'backgroundColor': 'RGB(180,238,180)'}),
-                        html.H5('Match Overview',
-                                style={'margin-top': '100px'}),
-                        html.Div([
-                            html.P('Match Date:',
-                                   style={'margin-top': '30px', 'font-size': '17px', 'font-weight': 'bold'}),
-                            html.P(id = 'time',
-                                   style={'margin-top': '-10px', 'color':'forestgreen'}),
-                            html.P('Match Result:',
-                                   style={'margin-top': '20px', 'font-size': '17px', 'font-weight': 'bold'}),
-                            html.P('(Regular and extra time)',
-                                   style={'margin-top': '-20px', 'font-size': '16px'}),
-                            html.P(id = 'team1_string',
-                                   style={'margin-top': '-10px', 'color':'forestgreen'}),
-                            html.P(id = 'team2_string',
-                                   style={'margin-top': '-10px', 'color':'forestgreen'}),
-                            html.P('Managers:',
-                                   style={'margin-top': '20px', 'font-size': '17px', 'font-weight': 'bold'}),
-                            html.P(id='team1_manager_string',
-                                   style={'margin-top': '-10px'}),
-                            html.P(id='team1_manager',
-                                   style={'margin-top': '-10px', 'color': 'forestgreen'}),
-                            html.P(id='team2_manager_string',
-                                   style={'margin-top': '-10px'}),
-                            html.P(id='team2_manager',
-                                   style={'margin-top': '-10px', 'color': 'forestgreen'}),
-                            ]
-                        )], style = {'margin-left': '20px', 'margin-right': '8%px'}
-                ),
-                xs=12, sm=12, md=12, lg=2, xl = 2,
-                style={"background-color":"RGB(250,247,247)", 'margin-top': '-10px',
-                       'margin-right':'-5%','height': '1300px'},
-            ),
-
-            # Third column shows the plots
-            dbc.Col(
-                html.Div(
-                    children=[
-                        dbc.Spinner(children = [
-                                        dcc.Graph(id="team1-plot",
-                                          config={'displayModeBar': False},
-                                          style= {"margin-top": "20px", "margin-left": "30px"}),
-                                        dcc.Graph(id = "team1-formation",
-                                                  config = {'displayModeBar': False},
-                                        style= {
-                                            "width": "180px", "height" : "270px",
-                                            "position": "absolute",
-                                            "top": "335px",
-                                            "left": "945px",
-                                            "z-index": "2",
-                                        })
-                                   ],
-                                    size="lg", color="lightgreen"),
-
-                        dbc.Spinner(children = [
-                                    dcc.Graph(id="team2-plot",
-                                      config={'displayModeBar': False},
-                                      style= {"margin-top": "-100px", "margin-left": "30px"}),
-                                    dcc.Graph(id="team2-formation",
-                                      config={'displayModeBar': False},
-                                      style={
-                                          "width": "180px", "height": "270px",
-                                          "position": "absolute",
-                                          "top": "920px",
-                                          "left": "945px",
-                                          "z-index": "2",
-                                      })
-                                    ],
-                                    size="lg", color="lightgreen"),
-
-                    ], style={ "position": "relative", "width":"100%", "height":"100%", 'overflow-x':"auto"}
-                ), xs=12, sm=12, md=12, lg=6, xl=6,
-                style={"background-color":"RGB(250,247,247)",
-                              "margin-top": "-10px", 'height': '1300px'}
-            ),
-
-            # Forth columns shows the notes
-            dbc.Col(
-                html.Div(
-                    children=[
-                        html.H6('a',
-                                style={'color': 'RGB(180,238,180)', 'backgroundColor': 'RGB(180,238,180)'}),
-                        html.P('Notes',
-                                style={'margin-top': '10px', 'text-decoration': 'underline'}),
-                        html.Div([
-                            html.P('Plot direction:',
-                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
-                            html.P("Plots unified the play direction of first and second half, which means on those plots "
-                                   "the sides doesn't switch between the two halves.",
-                                   style={ 'font-size': '14px', 'margin-top': '-15px'}),
-                            html.P('Opponent carry:',
-                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
-                            html.P("Indicates the start and end when an opponent player successfully carry the "
-                                   "ball for more then 3.5s. Line doesn't reflect the real trajectory in between start and end.",
-                                   style={'font-size': '14px', 'margin-top': '-15px'}),
-                            html.P('Opponent long pass:',
-                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
-                            html.P("Indicates opponent players successfully pass and receive the ball over 40 yards."
-                                   " Larger circle indicates sender location, smaller circle indicates receiver location.",
-                                   style={'font-size': '14px', 'margin-top': '-15px', }),
-                            html.P('Shots (w/ and w/o goal):',
-                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
-                            html.P("Larger dots indicate location of shots, smaller dots and line indicate recent "
-                                   "ball trajectory before the shot.",
-                                   style={'font-size': '14px', 'margin-top': '-15px'}),
-                            html.P('Defense (success and no success):',
-                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
-                            html.P("Indicates active defense actions, which were classified as 'clearance', 'duel'"
-                                   " or 'interception' in Statsbomb.",
-                                   style={'font-size': '14px', 'margin-top': '-15px'}),
-                            html.P('Formation:',
-                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
-                            html.P("Only tactical shifts which resulted with formation change were plotted. Click legends to "
-                                   "turn layer on or off. Double-click turns on all layers. Double-click again isolates the selected layer.",
-                                   style={'font-size': '14px', 'margin-top': '-15px'}),
-
-                        ], style = {'width': '80%'}),
-                        html.P("| The usage of this data is for non-profit educational purposes only. |",
-                            style={'font-size': '13px', 'width': '80%', 'margin-top': '115%'})
-                    ], style = {"background-color": "RGB(250,247,247)", 'height': '100%',
-                                'margin-left':'8%','margin-right':'-80%'}
-                ),
-                xs=12, sm=12, md=12, lg=1, xl=1,
-                style={"background-color": "RGB(250,247,247)",
-                       'margin-top': '-10px',  'height': '1300px'}
-            ),
-        ], className="h-100 gx-0 mx-0 px-0")
-    ])
-
-# Callback 1: Input - button click from match selection memu. Output - match id.
-input_matches = [Input(match, "n_clicks") for match in match_list]
-@app.callback(
-    Output("output-div", "children"),
-    input_matches
-)
-def get_match(*n_clicks_values):
-    clicked_match_id = dash.callback_context.triggered[0]["prop_id"].split(".")[0]
-    if not clicked_match_id:
-        match_id = 3906390
-    else:
-        match_id = int(clicked_match_id)
-
-    return match_id
-
-# Callback 2: Input - match id from callback 1. Output - a bunch of strings displayed in match overview.
-@app.callback(
-    Output('time', 'children'),
-    Output('team1_string', 'children'),
-    Output('team2_string', 'children'),
-    Output('team1_manager_string', 'children'),
-    Output('team2_manager_string', 'children'),
-    Output('team1_manager', 'children'),
-    Output('team2_manager', 'children'),
-    [Input("output-div", 'children')]
-)
-def get_info(selected_match):
-    '''
-    :param selected_match: match id from callback 1
-    :return: a bunch of strings
-    '''
-    match_info = [m for m in json_data_2023 if m['match_id'] == selected_match][0]
-    time = match_info['match_date']
-    team1_score = match_info['home_score']
-    team2_score = match_info['away_score']
-    team1_manager = match_info['home_team']['managers'][0]['name']
-    team2_manager = match_info['away_team']['managers'][0]['name']
-
-    team1 = team_dict[selected_match][0]
-    team2 = team_dict[selected_match][1]
-
-    team1_name = ' '.join(team1.split()[:-1])
-    team2_name = ' '.join(team2.split()[:-1])
-
-    team1_string = f"{team1_name} score: {team1_score}"
-    team2_string = f"{team2_name} score: {team2_score}"
-
-    team1_manager_string = f"{team1_name} manager:"
-    team2_manager_string = f"{team2_name} manager:"
-
-    return (time, team1_string, team2_string, team1_manager_string, team2_manager_string,
-            team1_manager, team2_manager)
-
-# Callback 3: Input - match id from callback 1. Output - tactic plot and formation plot for both teams
-@app.callback(
-    Output('team1-plot', 'figure'),
-    Output('team2-plot', 'figure'),
-    Output('team1-formation', 'figure'),
-    Output('team2-formation', 'figure'),
-    [Input("output-div", 'children')]
-)
-def update_plot(selected_match):
-    '''
-    :param selected_match: match id from callback 1
-    :return: A tuple containing four plot figures.
-    '''
-    match_id = int(selected_match)
-    team1 = team_dict[match_id][0]
-    team2 = team_dict[match_id][1]
-
-    team1_name = ' '.join(team1.split()[:-1])
-    team2_name = ' '.join(team2.split()[:-1])
-
-    # Load event data from Statsbomb
-    url = f'https://raw.githubusercontent.com/statsbomb/open-data/master/data/events/{match_id}.json'
-    match_events = load_json(url)
-
-    # Get tuples of team actions using imported local module
-    team1_events = [event for event in match_events if event['team']['name'] == team1]
-    team1_tuples = get_events(team1_events)
-
-    team2_events = [event for event in match_events if event['team']['name'] == team2]
-    team2_tuples = get_events(team2_events)
-
-    # Generate plots using imported local module
-    fig1 = plot(team1_name, team1_tuples, team2_tuples)
-    fig2 = plot2(team2_name, team2_tuples, team1_tuples)
-
-    fig3 = formation(team1_name, team1_tuples)
-    fig4 = formation2(team2_name, team2_tuples)
-
-    return fig1, fig2, fig3, fig4
-    
-
-if __name__ == '__main__':
-    app.run_server(debug=True, port=1020)
+from time import perf_counter
+_boot_start = perf_counter()
+
+import logging
+import os
+
+from dash import Dash, Patch, ctx, html, dcc, no_update
+import dash_bootstrap_components as dbc
+from dash.dependencies import ClientsideFunction,Input,Output,State,ALL
+
+from catalog import Catalog, COMPETITIONS, parse_competitions, team_label
+import datacache
+import figurecache
+import metrics
+import warmup
+from constants import DEFAULT_PARAMS, MATCH_END
+
+# 'server' renders the figures in Python. 'client' sends the classified actions of each match once
+# and the browser builds the figures with assets/tacticplot.js.
+RENDER_MODE = os.environ.get('TACTICPLOT_RENDER', 'server')
+
+# tacticplot (and numpy with it), rules and timewindow are only imported by the first update_plot, so
+# a worker can answer requests as soon as the layout is built.
+
+logger = logging.getLogger(__name__)
+
+# Time spent by this worker on each step of its boot, in seconds
+startup_report = {'pid': os.getpid(), 'imports_s': perf_counter() - _boot_start}
+
+# Load the competitions and matches served by the app. Cached copies are used when there are
+# some, so workers boot without a network round-trip.
+_step_start = perf_counter()
+catalog = Catalog(parse_competitions(COMPETITIONS))
+startup_report['catalog_source'] = ','.join(sorted(catalog.sources))
+
+# Sort stage group for user to select match
+stage_dict = {}
+for competition_id, season_id in catalog.seasons:
+    for stage in catalog.stages(competition_id, season_id):
+        title = stage
+        if len(catalog.seasons) > 1:
+            title = f'{catalog.season_name(competition_id, season_id)} - {stage}'
+        stage_dict[title] = [str(match_id) for match_id in catalog.stage_matches[(competition_id, season_id, stage)]]
+
+# Pair match id and match name for user to select match
+match_dict = {str(match_id): catalog.match_name(match_id) for match_id in catalog.matches}
+
+# Get a full list of match ids
+match_list = [str(match_id) for match_id in catalog.matches]
+
+# Match shown when the page opens, the World Cup 2023 final or else the latest match
+default_match = 3906390 if 3906390 in catalog.matches else catalog.dates[-1][1]
+
+# Teams of every season for the season heatmaps, as 'competition_id:season_id:team name' values
+season_team_options = []
+for competition_id, season_id in catalog.seasons:
+    for team in catalog.season_teams(competition_id, season_id):
+        label = team_label(team)
+        if len(catalog.seasons) > 1:
+            label = f'{label} - {catalog.season_name(competition_id, season_id)}'
+        season_team_options.append({'label': label, 'value': f'{competition_id}:{season_id}:{team}'})
+default_season = catalog.match(default_match)
+default_season_team = (f"{default_season['competition']['competition_id']}:"
+                       f"{default_season['season']['season_id']}:{catalog.teams(default_match)[0]}")
+
+startup_report['catalog_s'] = perf_counter() - _step_start
+_step_start = perf_counter()
+
+# Build the app
+app = Dash(__name__, external_stylesheets=[dbc.themes.ZEPHYR],
+          meta_tags=[{"name": "viewport", "content": "width=device-width,"
+                      "initial-scale=1, maximum-scale=1, maximum-scale=1"}])
+
+app.title = "World Cup 2023 Data Visualization"
+
+server = app.server
+app.config.suppress_callback_exceptions = True
+
+# Prometheus metrics on /metrics: stage and callback latencies, cache statistics and boot times
+metrics.install(server)
+metrics.add_collector(lambda: {f'tacticplot_data_cache_{k}': v for k, v in datacache.cache_stats().items()})
+metrics.add_collector(lambda: {f'tacticplot_figure_cache_{k}': v for k, v in figurecache.cache_stats().items()})
+metrics.add_collector(lambda: {f'tacticplot_startup_{k}': v for k, v in startup_report.items() if k != 'pid'})
+metrics.add_collector(lambda: {f'tacticplot_warmup_{k}': v for k, v in warmup.progress().items()})
+warmup.install(server)
+
+@server.route('/warmup')
+def warmup_progress():
+    '''
+    :return: progress of the warm-up of the caches, see warmup.progress
+    '''
+    return warmup.progress()
+
+def description_card():
+    '''
+    :return: An HTML Div element introducing the app.
+    :rtype: dash_html_components.Div
+    '''
+    return html.Div(
+        id="description",
+        children=[
+            html.H5("Statsbomb Open Data Visualization",
+                    style = {"font-size": "24px", "font-weight": "bold", 'color': 'dark-grey'}),
+            html.Img(src=app.get_asset_url("statsbomb.png"),
+                     style={"width": "60%", "height": "auto", "margin-bottom": "20px",
+                            "margin-left": "18px"}),
+
+            html.Div(
+                id="intro",
+                children="Great appreciation towards Statsbomb for sharing valuable data of the "
+                         "Women's World Cup 2023, as part of their commitment to support women's soccer. "
+                         "This project visualizes the data with an emphasis on team tactics, aiming to extend "
+                         "its usage and recognition.",
+                style={"font-size": "14px"}
+
+            ),
+            html.Img(src=app.get_asset_url("wc2023.jpg"),
+                     style={"width": "100%", "height": "auto", "margin-top": "20px",
+                            "margin-bottom": "20px"}),
+        ],
+    )
+
+def game_select_card():
+    '''
+    :return: An HTML Div element providing accordion menu for match selection.
+    :rtype: dash_html_components.Div
+    '''
+    return html.Div([
+        dbc.Accordion(
+          [
+            dbc.AccordionItem(
+                className= "accordion-title",
+                children =
+                [
+                    html.Button(match_dict[match], id={'type': 'match-button', 'index': match},
+                                style={'width': '46%', 'font-size': '13px',
+                                       "margin-left": "-13px", "margin-right": "15px"},
+                               className="border-0 bg-light font-weight-light my-0")
+                    for match in matches
+                ],
+                title=stage
+            )
+            for stage, matches in stage_dict.items()
+          ], flush = True,
+        ),
+
+        # Match id selected in the menu, read by the callbacks below
+        dcc.Store(id="selected-match", data=default_match),
+
+        # Version of the figures shown, set once their pitch and styling are in the browser
+        dcc.Store(id="figure-skeleton"),
+
+        # Clientside rendering mode: actions of both teams in the selected match, and the skeletons
+        # of the figures with the coordinates of the positions
+        dcc.Store(id="match-data"),
+        dcc.Store(id="figure-layouts"),
+
+    ])
+
+def rules_card():
+    '''
+    :return: An HTML Div element with the thresholds of the classification of the actions, kept for the session.
+    :rtype: dash_html_components.Div
+    '''
+    controls = dict(persistence=True, persistence_type='session')
+    checklist = dict(labelStyle={'display': 'block', 'font-size': '13px'}, **controls)
+    title = {'margin-top': '15px', 'font-size': '14px', 'font-weight': 'bold'}
+    return html.Div([
+        html.H5('Classification Rules', style={'margin-top': '30px'}),
+        html.P('Opponent carry longer than (s):', style=title),
+        dcc.Slider(id='rule-carry-duration', min=0, max=10, step=0.5, value=DEFAULT_PARAMS['carry_min_duration'],
+                   marks={t: str(t) for t in range(0, 11, 2)}, **controls),
+        html.P('Opponent long pass longer than (yards):', style=title),
+        dcc.Slider(id='rule-pass-length', min=10, max=80, step=5, value=DEFAULT_PARAMS['long_pass_min_length'],
+                   marks={t: str(t) for t in range(10, 81, 10)}, **controls),
+        html.P('Opponent long pass outcomes:', style=title),
+        dcc.Checklist(id='rule-pass-outcomes', value=DEFAULT_PARAMS['long_pass_outcomes'],
+                      options=[{'label': ' Complete', 'value': -1}, {'label': ' Incomplete', 'value': 9},
+                               {'label': ' Out', 'value': 75}, {'label': ' Pass Offside', 'value': 76},
+                               {'label': ' Unknown', 'value': 77}], **checklist),
+        html.P('Successful duels:', style=title),
+        dcc.Checklist(id='rule-duel-types', value=DEFAULT_PARAMS['duel_success_types'],
+                      options=[{'label': ' Tackle', 'value': 11}, {'label': ' Aerial Lost', 'value': 10}],
+                      **checklist),
+        html.P('Successful interceptions:', style=title),
+        dcc.Checklist(id='rule-interception-outcomes', value=DEFAULT_PARAMS['interception_success_outcomes'],
+                      options=[{'label': ' Won', 'value': 4}, {'label': ' Success', 'value': 15},
+                               {'label': ' Success In Play', 'value': 16}, {'label': ' Success Out', 'value': 17},
+                               {'label': ' Lost', 'value': 1}, {'label': ' Lost In Play', 'value': 13},
+                               {'label': ' Lost Out', 'value': 14}], **checklist),
+
+        # Thresholds of the session, set by callback 8 from the controls above
+        dcc.Store(id='rule-params'),
+    ])
+
+# Tactic plots only show the box and lasso select buttons, to list the events in a zone
+ZONE_CONFIG = {'modeBarButtons': [['select2d', 'lasso2d']], 'displaylogo': False}
+
+# The minute range slider ends at MATCH_END. It snaps to its marks, one every minute and
+# one at each tactical shift of the match, set by callback 7.
+default_time_marks = {t: f"{t // 60}'" if t % (15 * 60) == 0 else '' for t in range(0, MATCH_END + 1, 60)}
+
+# Events listed under the selected zone, the others are only counted
+ZONE_EVENTS_SHOWN = 12
+
+# Speeds of the live replays, in seconds of the match clock per second, and how often the browser
+# asks for the new events of a live match
+LIVE_SPEEDS = [1, 10, 60]
+LIVE_INTERVAL_MS = int(os.environ.get('TACTICPLOT_LIVE_INTERVAL_MS', 1000))
+
+# App layout
+app.layout = dbc.Container(
+    fluid=True,
+    children=[
+        # First row is the banner
+        dbc.Row(
+            html.Div([
+                html.Div(id="banner1", className="banner ",
+                         children=[
+                             html.Img(src=app.get_asset_url("github.JPG"),
+                                      style={"width":"auto", "height": "20px",  'margin-bottom':"5px", 'margin-left':'73px'})
+                         ], style ={"display": "inline-block"}),
+                html.Div(id="banner2", className="banner",
+                         children=[
+                             dbc.NavLink("by Lori He",
+                                         href="https://github.com/lorihe/Statsbomb_open_data_utilization",
+                                         style={'color': 'honeydew'})
+                         ], style ={"display": "inline-block"}),
+                ]
+            ),
+            style={"height": "32px", "background-color": "black", 'margin-bottom': '10px',
+                   "z-index": "2"},
+        ),
+
+        # Second row is content
+        dbc.Row([
+            # First column is app description and match selection menu
+            dbc.Col(
+                html.Div(
+                    children= [
+                        html.Div(description_card(), style={"width": "90%"}),
+                        html.Div(game_select_card(), style={"width": "90%"}),
+                        html.Div(rules_card(), style={"width": "90%"})
+                    ], style = {'margin-left': '40px', 'margin-bottom': '20px'}
+                ), xs={'size': 12}, sm={'size': 12}, md={'size': 12},
+                   lg={'size': 3}, xl={'size': 3},
+                   style = {'margin-right': '-1%'}
+            ),
+
+            # Second column shows match overview information
+            dbc.Col(
+                html.Div(
+                    id = 'column',
+                    children=[
+                        html.H6('a',
+                                style={'margin-left': '-19px', 'margin-right': '-110px',
+                                       'color': 'RGB(180,238,180)', 'backgroundColor': 'RGB(180,238,180)'}),
+                        html.H5('Match Overview',
+                                style={'margin-top': '100px'}),
+                        html.Div([
+                            html.P('Match Date:',
+                                   style={'margin-top': '30px', 'font-size': '17px', 'font-weight': 'bold'}),
+                            html.P(id = 'time',
+                                   style={'margin-top': '-10px', 'color':'forestgreen'}),
+                            html.P('Match Result:',
+                                   style={'margin-top': '20px', 'font-size': '17px', 'font-weight': 'bold'}),
+                            html.P('(Regular and extra time)',
+                                   style={'margin-top': '-20px', 'font-size': '16px'}),
+                            html.P(id = 'team1_string',
+                                   style={'margin-top': '-10px', 'color':'forestgreen'}),
+                            html.P(id = 'team2_string',
+                                   style={'margin-top': '-10px', 'color':'forestgreen'}),
+                            html.P('Managers:',
+                                   style={'margin-top': '20px', 'font-size': '17px', 'font-weight': 'bold'}),
+                            html.P(id='team1_manager_string',
+                                   style={'margin-top': '-10px'}),
+                            html.P(id='team1_manager',
+                                   style={'margin-top': '-10px', 'color': 'forestgreen'}),
+                            html.P(id='team2_manager_string',
+                                   style={'margin-top': '-10px'}),
+                            html.P(id='team2_manager',
+                                   style={'margin-top': '-10px', 'color': 'forestgreen'}),
+                            html.P('Selected Zone:',
+                                   style={'margin-top': '20px', 'font-size': '17px', 'font-weight': 'bold'}),
+                            dcc.RadioItems(id='zone-scope',
+                                           options=[{'label': ' This match', 'value': 'match'},
+                                                    {'label': ' Whole season', 'value': 'season'}],
+                                           value='match',
+                                           labelStyle={'display': 'block', 'font-size': '14px'},
+                                           style={'margin-top': '-10px'}),
+                            html.Div(id='zone-events', style={'margin-top': '10px', 'font-size': '14px'}),
+                            ]
+                        )], style = {'margin-left': '20px', 'margin-right': '8%px'}
+                ),
+                xs=12, sm=12, md=12, lg=2, xl = 2,
+                style={"background-color":"RGB(250,247,247)", 'margin-top': '-10px',
+                       'margin-right':'-5%','height': '1380px'},
+            ),
+
+            # Third column shows the plots
+            dbc.Col(
+                html.Div(
+                    children=[
+                        dbc.Spinner(children = [
+                                        dcc.Graph(id="team1-plot",
+                                          config=ZONE_CONFIG,
+                                          style= {"margin-top": "20px", "margin-left": "30px"}),
+                                        dcc.Graph(id = "team1-formation",
+                                                  config = {'displayModeBar': False},
+                                        style= {
+                                            "width": "180px", "height" : "270px",
+                                            "position": "absolute",
+                                            "top": "335px",
+                                            "left": "945px",
+                                            "z-index": "2",
+                                        })
+                                   ],
+                                    size="lg", color="lightgreen", delay_show=300),
+
+                        dbc.Spinner(children = [
+                                    dcc.Graph(id="team2-plot",
+                                      config=ZONE_CONFIG,
+                                      style= {"margin-top": "-100px", "margin-left": "30px"}),
+                                    dcc.Graph(id="team2-formation",
+                                      config={'displayModeBar': False},
+                                      style={
+                                          "width": "180px", "height": "270px",
+                                          "position": "absolute",
+                                          "top": "920px",
+                                          "left": "945px",
+                                          "z-index": "2",
+                                      })
+                                    ],
+                                    size="lg", color="lightgreen", delay_show=300),
+
+                        # Minute range of the actions shown on the tactic plots, in seconds of the match clock
+                        html.Div([
+                            html.P('Match time:', style={'font-size': '14px', 'font-weight': 'bold'}),
+                            dcc.RangeSlider(id='minute-range', min=0, max=MATCH_END, step=None,
+                                            value=[0, MATCH_END], marks=default_time_marks,
+                                            allowCross=False, updatemode='drag'),
+                        ], style={'margin-left': '60px', 'margin-right': '150px', 'margin-top': '-20px'}),
+
+                        # Replay of the selected match as a live match, the plots growing as its events arrive
+                        html.Div([
+                            html.Button('Replay live', id='live-start', className="border-0 bg-light",
+                                        style={'font-size': '14px'}),
+                            dcc.Dropdown(id='live-speed', value=LIVE_SPEEDS[1], clearable=False,
+                                         options=[{'label': f'{speed}x', 'value': speed} for speed in LIVE_SPEEDS],
+                                         style={'width': '90px', 'font-size': '14px', 'margin-left': '10px'}),
+                            dcc.Interval(id='live-interval', interval=LIVE_INTERVAL_MS, disabled=True),
+                            # Rows of each category already sent to the plots, see live.LiveMatch.cursor
+                            dcc.Store(id='live-cursor'),
+                        ], style={'display': 'flex', 'align-items': 'center', 'margin-left': '60px', 'margin-top': '10px'}),
+
+                    ], style={ "position": "relative", "width":"100%", "height":"100%", 'overflow-x':"auto"}
+                ), xs=12, sm=12, md=12, lg=6, xl=6,
+                style={"background-color":"RGB(250,247,247)",
+                              "margin-top": "-10px", 'height': '1380px'}
+            ),
+
+            # Forth columns shows the notes
+            dbc.Col(
+                html.Div(
+                    children=[
+                        html.H6('a',
+                                style={'color': 'RGB(180,238,180)', 'backgroundColor': 'RGB(180,238,180)'}),
+                        html.P('Notes',
+                                style={'margin-top': '10px', 'text-decoration': 'underline'}),
+                        html.Div([
+                            html.P('Plot direction:',
+                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
+                            html.P("Plots unified the play direction of first and second half, which means on those plots "
+                                   "the sides doesn't switch between the two halves.",
+                                   style={ 'font-size': '14px', 'margin-top': '-15px'}),
+                            html.P('Opponent carry:',
+                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
+                            html.P("Indicates the start and end when an opponent player successfully carry the "
+                                   "ball for more then 3.5s (by default, see Classification Rules). Line doesn't reflect the real trajectory in between start and end.",
+                                   style={'font-size': '14px', 'margin-top': '-15px'}),
+                            html.P('Opponent long pass:',
+                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
+                            html.P("Indicates opponent players successfully pass and receive the ball over 40 yards (by default)."
+                                   " Larger circle indicates sender location, smaller circle indicates receiver location.",
+                                   style={'font-size': '14px', 'margin-top': '-15px', }),
+                            html.P('Shots (w/ and w/o goal):',
+                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
+                            html.P("Larger dots indicate location of shots, smaller dots and line indicate recent "
+                                   "ball trajectory before the shot.",
+                                   style={'font-size': '14px', 'margin-top': '-15px'}),
+                            html.P('Defense (success and no success):',
+                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
+                            html.P("Indicates active defense actions, which were classified as 'clearance', 'duel'"
+                                   " or 'interception' in Statsbomb.",
+                                   style={'font-size': '14px', 'margin-top': '-15px'}),
+                            html.P('Formation:',
+                                   style={'margin-top': '10px', 'font-size': '14px', 'font-weight': 'bold'}),
+                            html.P("Only tactical shifts which resulted with formation change were plotted. Click legends to "
+                                   "turn layer on or off. Double-click turns on all layers. Double-click again isolates the selected layer.",
+                                   style={'font-size': '14px', 'margin-top': '-15px'}),
+
+                        ], style = {'width': '80%'}),
+                        html.P("| The usage of this data is for non-profit educational purposes only. |",
+                            style={'font-size': '13px', 'width': '80%', 'margin-top': '115%'})
+                    ], style = {"background-color": "RGB(250,247,247)", 'height': '100%',
+                                'margin-left':'8%','margin-right':'-80%'}
+                ),
+                xs=12, sm=12, md=12, lg=1, xl=1,
+                style={"background-color": "RGB(250,247,247)",
+                       'margin-top': '-10px',  'height': '1380px'}
+            ),
+        ], className="h-100 gx-0 mx-0 px-0"),
+
+        # Third row shows a team across all its matches of a season
+        dbc.Row([
+            dbc.Col(
+                html.Div([
+                    html.H5('Season Heatmaps', style={'margin-top': '30px'}),
+                    dcc.Dropdown(id='season-team', options=season_team_options, value=default_season_team,
+                                 clearable=False, style={'font-size': '14px', 'margin-top': '20px'}),
+                    dcc.RadioItems(id='heatmap-category',
+                                   options=[{'label': ' Shots', 'value': 'shots'},
+                                            {'label': ' Defensive actions', 'value': 'defense'},
+                                            {'label': ' Opponent carries', 'value': 'opponent_carry'}],
+                                   value='shots',
+                                   labelStyle={'display': 'block', 'font-size': '14px'},
+                                   style={'margin-top': '20px'}),
+                    html.P("Average number of events per match in each 5x5 yards area of the pitch, the "
+                           "team attacking to the right.",
+                           style={'font-size': '14px', 'margin-top': '20px'}),
+                ], style={'margin-left': '40px', 'width': '90%'}),
+                xs=12, sm=12, md=12, lg=3, xl=3,
+            ),
+            dbc.Col(
+                dbc.Spinner(dcc.Graph(id='season-heatmap', config={'displayModeBar': False},
+                                      style={'margin-top': '20px', 'margin-left': '30px'}),
+                            size="lg", color="lightgreen"),
+                xs=12, sm=12, md=12, lg=9, xl=9,
+                style={"background-color": "RGB(250,247,247)"}
+            ),
+        ], className="gx-0 mx-0 px-0"),
+    ])
+
+# Callback 1: Input - button click from match selection memu. Output - match id.
+# Runs in the browser: a click never sends the state of the other buttons to the server, the
+# callbacks below only receive the selected match id from the store.
+app.clientside_callback(
+    """
+    function(n_clicks) {
+        const triggered = dash_clientside.callback_context.triggered;
+        if (!triggered.length || !triggered[0].value) {
+            return dash_clientside.no_update;
+        }
+        const button_id = JSON.parse(triggered[0].prop_id.split('.')[0]);
+        return parseInt(button_id.index);
+    }
+    """,
+    Output("selected-match", "data"),
+    Input({'type': 'match-button', 'index': ALL}, "n_clicks")
+)
+
+def _manager(team):
+    '''
+    :param team: home_team or away_team of a match
+    :return: name of the first manager, some matches have none
+    '''
+    managers = team.get('managers') or [{'name': 'unknown'}]
+    return managers[0]['name']
+
+# Callback 2: Input - match id from callback 1. Output - a bunch of strings displayed in match overview.
+@app.callback(
+    Output('time', 'children'),
+    Output('team1_string', 'children'),
+    Output('team2_string', 'children'),
+    Output('team1_manager_string', 'children'),
+    Output('team2_manager_string', 'children'),
+    Output('team1_manager', 'children'),
+    Output('team2_manager', 'children'),
+    [Input("selected-match", 'data')]
+)
+@metrics.instrument_callback
+def get_info(selected_match):
+    '''
+    :param selected_match: match id stored by callback 1
+    :return: a bunch of strings
+    '''
+    match_info = catalog.match(selected_match)
+    time = match_info['match_date']
+    team1_score = match_info['home_score']
+    team2_score = match_info['away_score']
+    team1_manager = _manager(match_info['home_team'])
+    team2_manager = _manager(match_info['away_team'])
+
+    team1, team2 = catalog.teams(selected_match)
+
+    team1_name = team_label(team1)
+    team2_name = team_label(team2)
+
+    team1_string = f"{team1_name} score: {team1_score}"
+    team2_string = f"{team2_name} score: {team2_score}"
+
+    team1_manager_string = f"{team1_name} manager:"
+    team2_manager_string = f"{team2_name} manager:"
+
+    return (time, team1_string, team2_string, team1_manager_string, team2_manager_string,
+            team1_manager, team2_manager)
+
+def patch_figure(figure):
+    '''
+    :param figure: figure as a dict or a go.Figure
+    :return: a Patch replacing the traces and the title of the figure in the browser, and keeping
+             its layout with the soccer field as it is
+    '''
+    if not isinstance(figure, dict):
+        figure = figure.to_plotly_json()
+    patch = Patch()
+    patch['data'] = figure['data']
+    patch['layout']['title']['text'] = figure['layout']['title']['text']
+    return patch
+
+def _rule_overrides(rule_params):
+    '''
+    :param rule_params: thresholds stored by callback 8
+    :return: a dict of the thresholds changed from DEFAULT_PARAMS, None when there are none
+    '''
+    import rules
+
+    defaults = rules.params()
+    overrides = {name: value for name, value in rules.params(rule_params).items() if value != defaults[name]}
+    return overrides or None
+
+# Callback 3: Input - match id from callback 1, minute range and classification rules. Output - tactic
+# plot and formation plot for both teams
+@metrics.instrument_callback
+def update_plot(selected_match, minute_range, rule_params, skeleton):
+    '''
+    :param selected_match: match id stored by callback 1
+    :param minute_range: first and last second of the match clock selected on the slider
+    :param rule_params: thresholds of the classification stored by callback 8
+    :param skeleton: version of the figures in the browser, None before the first figures
+    :return: A tuple containing four plot figures, or patches of their traces and titles when the
+             browser has the figures of another match already, and the version of the figures.
+    '''
+    match_id = int(selected_match)
+    team1, team2 = catalog.teams(match_id)
+    window = None
+    if minute_range and list(minute_range) != [0, MATCH_END]:
+        import timewindow
+        window = timewindow.parse_range(minute_range)
+    params = _rule_overrides(rule_params)
+
+    def build():
+        from tacticplot import match_figures
+        return match_figures(match_id, team1, team2, window=window, params=params)
+
+    if window is not None or params is not None:
+        # Windows change while the slider is dragged and rules are per session, they are not cached.
+        figures = build()
+    else:
+        # Figures of a match never change, every worker reuses the ones rendered by batchrender.py
+        # or already rendered by any worker
+        figures = figurecache.get_or_build(match_id, {}, build)
+
+    # Only the first figures are sent whole. The pitch and the styling are the same for every match,
+    # after that only the traces and the titles change.
+    version = figurecache.code_version()
+    if skeleton == version:
+        patches = [patch_figure(figure) for figure in figures]
+        if ctx.triggered_id in ('minute-range', 'rule-params'):
+            # The formations show every lineup of the match, they stay as they are.
+            patches[2:] = [no_update, no_update]
+        return tuple(patches) + (no_update,)
+    return tuple(figures) + (version,)
+
+# Callback 3 in the clientside rendering mode: the server sends the actions of both teams, and the
+# figure skeletons once per browser session. Callback 4 builds the figures in the browser.
+@metrics.instrument_callback
+def update_data(selected_match, rule_params, skeleton):
+    '''
+    :param selected_match: match id stored by callback 1
+    :param rule_params: thresholds of the classification stored by callback 8
+    :param skeleton: version of the figure skeletons in the browser, None before the first match
+    :return: the data of the match (see tacticplot.compact), the figure skeletons or no_update when
+             the browser has them, and their version
+    '''
+    match_id = int(selected_match)
+    team1, team2 = catalog.teams(match_id)
+    params = _rule_overrides(rule_params)
+
+    def build():
+        from tacticplot import match_payload
+        return match_payload(match_id, team1, team2, params)
+
+    data = build() if params is not None else figurecache.get_or_build(match_id, {'render': 'client'}, build)
+
+    version = figurecache.code_version()
+    if skeleton == version:
+        return data, no_update, no_update
+    from tacticplot import client_skeleton
+    return data, client_skeleton(), version
+
+if RENDER_MODE == 'client':
+    app.callback(
+        Output('match-data', 'data'),
+        Output('figure-layouts', 'data'),
+        Output('figure-skeleton', 'data'),
+        [Input("selected-match", 'data'), Input('rule-params', 'data')],
+        [State('figure-skeleton', 'data')]
+    )(update_data)
+
+    # Callback 4: Input - data of the match from callback 3. Output - tactic plot and formation plot for both teams
+    app.clientside_callback(
+        ClientsideFunction(namespace='tacticplot', function_name='render'),
+        Output('team1-plot', 'figure'),
+        Output('team2-plot', 'figure'),
+        Output('team1-formation', 'figure'),
+        Output('team2-formation', 'figure'),
+        [Input('match-data', 'data'), Input('minute-range', 'value')],
+        [State('figure-layouts', 'data')]
+    )
+else:
+    app.callback(
+        Output('team1-plot', 'figure'),
+        Output('team2-plot', 'figure'),
+        Output('team1-formation', 'figure'),
+        Output('team2-formation', 'figure'),
+        Output('figure-skeleton', 'data'),
+        [Input("selected-match", 'data'), Input('minute-range', 'value'), Input('rule-params', 'data')],
+        [State('figure-skeleton', 'data')]
+    )(update_plot)
+
+# Callback 5: Input - team of a season and category. Output - heatmap of the team over the season
+@app.callback(
+    Output('season-heatmap', 'figure'),
+    [Input('season-team', 'value'), Input('heatmap-category', 'value')]
+)
+@metrics.instrument_callback
+def update_heatmap(season_team, category):
+    '''
+    :param season_team: 'competition_id:season_id:team name' value of the dropdown
+    :param category: one of heatmap.CATEGORIES
+    :return: heatmap figure, summed from the histograms of each match of the team
+    '''
+    import heatmap
+    competition_id, season_id, team = season_team.split(':', 2)
+    return heatmap.season_figure(catalog, team, int(competition_id), int(season_id), category)
+
+# Callback 6: Input - box or lasso selection on a tactic plot. Output - events in the selected zone
+@app.callback(
+    Output('zone-events', 'children'),
+    [Input('team1-plot', 'selectedData'), Input('team2-plot', 'selectedData'), Input('zone-scope', 'value')],
+    [State('selected-match', 'data')]
+)
+@metrics.instrument_callback
+def update_zone(team1_selection, team2_selection, scope, selected_match):
+    '''
+    :param team1_selection: selectedData of the tactic plot of the home team
+    :param team2_selection: selectedData of the tactic plot of the away team
+    :param scope: 'match' for the events of the selected match, 'season' for all matches of the team
+    :param selected_match: match id stored by callback 1
+    :return: a list of HTML elements counting the events in the zone and listing the first ones
+    '''
+    import spatial
+
+    # The selection last made, or the one there is when only the scope changed
+    if ctx.triggered_id == 'team2-plot' or (ctx.triggered_id != 'team1-plot' and not team1_selection):
+        selection, team_position = team2_selection, 1
+    else:
+        selection, team_position = team1_selection, 0
+    if not selection:
+        return html.P('Use the box or lasso select of a tactic plot.', style={'color': 'grey'})
+
+    match_id = int(selected_match)
+    team = catalog.teams(match_id)[team_position]
+    if scope == 'season':
+        match = catalog.match(match_id)
+        index = spatial.season_index(catalog, team, match['competition']['competition_id'],
+                                     match['season']['season_id'])
+    else:
+        index = spatial.match_index(match_id, *catalog.teams(match_id))[team]
+
+    # The lower plot shows the away team attacking to the left.
+    points = spatial.select(index, selection, rotated=team_position == 1)
+    counts = spatial.summary(points)
+    points = spatial.chronological(points, catalog.matches_of_team(team))
+    children = [html.P(f'{team_label(team)}: {len(points)} events', style={'color': 'forestgreen'})]
+    children += [html.P(f'{spatial.CATEGORY_NAMES[category]}: {count}', style={'margin-top': '-15px'})
+                 for category, count in counts.items() if count]
+    for point in points[:ZONE_EVENTS_SHOWN]:
+        event = f"{point['minute']}:{point['second']:02d} {spatial.CATEGORY_NAMES[spatial.CATEGORIES[point['category']]]}"
+        if scope == 'season':
+            event += f", {catalog.match_name(int(point['match_id']))}"
+        children.append(html.P(event, style={'margin-top': '-15px', 'font-size': '13px'}))
+    return children
+
+# Callback 7: Input - formation plots. Output - marks of the minute range at the tactical shifts
+# drawn on them. Runs in the browser, whatever the rendering mode.
+app.clientside_callback(
+    ClientsideFunction(namespace='tacticplot', function_name='timeMarks'),
+    Output('minute-range', 'marks'),
+    [Input('team1-formation', 'figure'), Input('team2-formation', 'figure')],
+    [State('minute-range', 'max')]
+)
+
+# Callback 8: Input - controls of the classification rules. Output - thresholds read by callback 3.
+# Runs in the browser, callback 3 runs once for a change of any control.
+app.clientside_callback(
+    """
+    function(carry_duration, pass_length, pass_outcomes, duel_types, interception_outcomes) {
+        return {
+            carry_min_duration: carry_duration,
+            long_pass_min_length: pass_length,
+            long_pass_outcomes: pass_outcomes,
+            duel_success_types: duel_types,
+            interception_success_outcomes: interception_outcomes
+        };
+    }
+    """,
+    Output('rule-params', 'data'),
+    [Input('rule-carry-duration', 'value'), Input('rule-pass-length', 'value'), Input('rule-pass-outcomes', 'value'),
+     Input('rule-duel-types', 'value'), Input('rule-interception-outcomes', 'value')]
+)
+
+# Callback 9: Input - click on the live replay button. Output - tactic plots and formations of the
+# events of the replay so far, and the start of the updates of callback 10
+@app.callback(
+    Output('team1-plot', 'figure', allow_duplicate=True),
+    Output('team2-plot', 'figure', allow_duplicate=True),
+    Output('team1-formation', 'figure', allow_duplicate=True),
+    Output('team2-formation', 'figure', allow_duplicate=True),
+    Output('live-cursor', 'data'),
+    Output('live-interval', 'disabled'),
+    [Input('live-start', 'n_clicks')],
+    [State('selected-match', 'data'), State('live-speed', 'value')],
+    prevent_initial_call=True
+)
+@metrics.instrument_callback
+def start_live(n_clicks, selected_match, speed):
+    '''
+    :param n_clicks: clicks on the live replay button
+    :param selected_match: match id stored by callback 1
+    :param speed: one of LIVE_SPEEDS
+    :return: A tuple containing four plot figures, the cursor of the rows they show and False to
+             start the updates, unless the match is over already.
+    '''
+    import live
+    from tacticplot import formation, plot
+
+    match_id = int(selected_match)
+    team1, team2 = catalog.teams(match_id)
+    # Joins the replay of the match when another session started it, without starting it over.
+    live.start_replay(match_id, speed)
+    live_match = live.update(match_id)
+    cursor = live_match.cursor()
+    team1_tuples, team2_tuples = live_match.tuples(team1, cursor), live_match.tuples(team2, cursor)
+    return (plot(team_label(team1), team1_tuples, team2_tuples),
+            plot(team_label(team2), team2_tuples, team1_tuples, orientation='left'),
+            formation(team_label(team1), team1_tuples),
+            formation(team_label(team2), team2_tuples, orientation='left'),
+            cursor, live_match.finished)
+
+# Callback 10: Input - interval of a live replay. Output - new points of the tactic plots, and the
+# formations when a team changed its lineup
+@app.callback(
+    Output('team1-plot', 'extendData'),
+    Output('team2-plot', 'extendData'),
+    Output('team1-formation', 'figure', allow_duplicate=True),
+    Output('team2-formation', 'figure', allow_duplicate=True),
+    Output('live-cursor', 'data', allow_duplicate=True),
+    Output('live-interval', 'disabled', allow_duplicate=True),
+    [Input('live-interval', 'n_intervals')],
+    [State('selected-match', 'data'), State('live-cursor', 'data')],
+    prevent_initial_call=True
+)
+@metrics.instrument_callback
+def update_live(n_intervals, selected_match, cursor):
+    '''
+    :param n_intervals: number of updates so far
+    :param selected_match: match id stored by callback 1
+    :param cursor: rows already sent to the plots, see live.LiveMatch.cursor, None for none of them
+    :return: A tuple containing the extendData of both tactic plots, the formations or no_update,
+             the new cursor, and True to stop the updates once the match is over.
+    '''
+    import live
+    from tacticplot import formation
+
+    match_id = int(selected_match)
+    team1, team2 = catalog.teams(match_id)
+    live_match = live.update(match_id)
+    new_cursor = live_match.cursor()
+    if cursor and any(n > new_cursor.get(team, {}).get(category, 0)
+                      for team, counts in cursor.items() for category, n in counts.items()):
+        # Another session started the replay over, its events would mix with the ones on the plots.
+        return (no_update,) * 5 + (True,)
+    team1_new, team2_new = live_match.since(team1, cursor, new_cursor), live_match.since(team2, cursor, new_cursor)
+
+    extend_data = (live.extend_data(team1_new, team2_new, rotated=False) or no_update,
+                   live.extend_data(team2_new, team1_new, rotated=True) or no_update)
+    formations = []
+    for team, team_new, orientation in ((team1, team1_new, 'right'), (team2, team2_new, 'left')):
+        if len(team_new['starting_XI']) or len(team_new['tactic_shift']):
+            formations.append(formation(team_label(team), live_match.tuples(team), orientation=orientation))
+        else:
+            formations.append(no_update)
+    return extend_data + tuple(formations) + (new_cursor, live_match.finished)
+
+# Callback 11: Input - another match, minute range or rules. Output - end of the updates of a live
+# replay, callback 3 showing the finished match again. Runs in the browser.
+app.clientside_callback(
+    """
+    function() {
+        return true;
+    }
+    """,
+    Output('live-interval', 'disabled', allow_duplicate=True),
+    [Input("selected-match", 'data'), Input('minute-range', 'value'), Input('rule-params', 'data')],
+    prevent_initial_call=True
+)
+
+startup_report['layout_s'] = perf_counter() - _step_start
+startup_report['total_s'] = perf_counter() - _boot_start
+logger.info('Worker %(pid)s booted in %(total_s).3fs: imports %(imports_s).3fs, '
+            'catalog %(catalog_s).3fs (%(catalog_source)s), layout %(layout_s).3fs', startup_report)
+
+def start_warmup():
+    '''
+    Fetch, parse and render every match in the background, finals and recent matches first.
+    Called by gunicorn.conf.py in each worker after the fork, see warmup.start.
+    '''
+    warmup.start(catalog, RENDER_MODE)
+
+if __name__ == '__main__':
+    start_warmup()
+    app.run_server(debug=True, port=1020)
@@ -0,0 +1,346 @@
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Root of the Statsbomb open data repository. Every file is addressed by its path below this root,
+# e.g. 'matches/72/107.json' or 'events/3906390.json'.
+BASE_URL = os.environ.get('STATSBOMB_BASE_URL',
+                          'https://raw.githubusercontent.com/statsbomb/open-data/master/data/')
+
+# Compressed copies of fetched files are kept here and shared by every process on the machine.
+CACHE_DIR = os.environ.get('STATSBOMB_CACHE_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), '.statsbomb_cache'))
+
+# Offline mode: point STATSBOMB_LOCAL_DIR at the 'data' directory of a local open-data checkout and
+# no request ever leaves the machine. STATSBOMB_OFFLINE=1 alone serves whatever is already cached.
+LOCAL_DIR = os.environ.get('STATSBOMB_LOCAL_DIR')
+OFFLINE = bool(LOCAL_DIR) or os.environ.get('STATSBOMB_OFFLINE') == '1'
+
+# Cached copies of files which change upstream (competition and match lists) are refreshed in the
+# background when they are older than this many seconds, see load_snapshot.
+SNAPSHOT_MAX_AGE = int(os.environ.get('STATSBOMB_SNAPSHOT_MAX_AGE', 3600))
+
+# Number of decoded files kept in memory per process.
+MEMORY_ITEMS = int(os.environ.get('STATSBOMB_MEMORY_ITEMS', 32))
+
+# Connections kept open to the data host, shared by all threads of a process, and the seconds
+# to wait for the host before giving up on a request.
+POOL_SIZE = int(os.environ.get('STATSBOMB_POOL_SIZE', 8))
+TIMEOUT = float(os.environ.get('STATSBOMB_TIMEOUT', 30))
+
+# Failed requests (connection errors, timeouts, 429 and 5xx answers) are tried again up to RETRIES
+# times, waiting about BACKOFF seconds and twice longer after every attempt.
+RETRIES = int(os.environ.get('STATSBOMB_RETRIES', 3))
+BACKOFF = float(os.environ.get('STATSBOMB_BACKOFF', 0.5))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class MemoryCache:
+    '''
+    Values used last by this process, least recently used first, at most MEMORY_ITEMS of them.
+    Safe to share between threads.
+    '''
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        # A lock held by another thread at fork time would never be released in the child.
+        os.register_at_fork(after_in_child=self._forget_lock)
+
+    def _forget_lock(self):
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        '''
+        :return: the value of key, None when it is not in memory
+        '''
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > MEMORY_ITEMS:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+@contextlib.contextmanager
+def atomic_open(path, mode='wb'):
+    '''
+    Open a temporary file next to path for writing, moved over path once written and closed, so
+    other processes never read a half written file.
+    :param path: file to write, its directory is created if needed
+    :param mode: 'wb' or 'w'
+    '''
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    os.replace(tmp_path, path)
+
+_memory = MemoryCache()
+_lock = threading.Lock()
+_session = None
+_stats = {'memory_hits': 0, 'disk_hits': 0, 'local_hits': 0, 'misses': 0,
+          'bytes_downloaded': 0, 'bytes_saved': 0}
+
+def session():
+    '''
+    :return: the requests session of this process, reusing up to POOL_SIZE connections to the data host
+    '''
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+def _forget_session():
+    # Connections of the pool must not be shared with a forked child.
+    global _session, _lock
+    _session = None
+    _lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_forget_session)
+
+def data_path(url):
+    '''
+    :param url: a Statsbomb open data URL, or a path relative to the data root
+    :return: the path of the file relative to the data root, e.g. 'events/3906390.json'
+    '''
+    if url.startswith(BASE_URL):
+        return url[len(BASE_URL):]
+    if '/data/' in url:
+        return url.split('/data/', 1)[1]
+    if '://' in url:
+        # Not an open data URL, cache it under a name derived from the full URL.
+        return 'other/' + hashlib.sha1(url.encode()).hexdigest() + '.json'
+    return url.lstrip('/')
+
+def data_url(path):
+    '''
+    :param path: path of a file relative to the data root, e.g. 'matches/72/107.json'
+    :return: full URL of the file
+    '''
+    return BASE_URL + path
+
+def _cache_file(path):
+    return os.path.join(CACHE_DIR, *path.split('/')) + '.gz'
+
+def _read_disk(path):
+    try:
+        with gzip.open(_cache_file(path), 'rb') as f:
+            return f.read()
+    except (OSError, EOFError):
+        return None
+
+def _write_disk(path, raw):
+    with atomic_open(_cache_file(path)) as f, gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6) as gz:
+        gz.write(raw)
+
+def _read_local(path):
+    try:
+        with open(os.path.join(LOCAL_DIR, *path.split('/')), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _count(key, size):
+    with _lock:
+        _stats[key] += 1
+        if key == 'misses':
+            _stats['bytes_downloaded'] += size
+        else:
+            _stats['bytes_saved'] += size
+
+def _get(url):
+    '''
+    :return: the bytes at url, trying again with an exponential backoff when the request fails
+             for a reason which may not last
+    '''
+    for attempt in range(RETRIES + 1):
+        try:
+            response = session().get(url, timeout=TIMEOUT)
+            if response.status_code not in RETRY_STATUSES or attempt == RETRIES:
+                response.raise_for_status()
+                return response.content
+            reason = f'status {response.status_code}'
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == RETRIES:
+                raise
+            reason = repr(e)
+        delay = BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+        logger.info('Fetching %s failed (%s), trying again in %.1fs', url, reason, delay)
+        time.sleep(delay)
+
+def is_cached(url):
+    '''
+    :param url: a Statsbomb open data URL, or a path relative to the data root
+    :return: True when load_raw can read the file without a request
+    '''
+    path = data_path(url)
+    if LOCAL_DIR:
+        return os.path.exists(os.path.join(LOCAL_DIR, *path.split('/')))
+    return os.path.exists(_cache_file(path))
+
+def load_raw(url, refresh=False):
+    '''
+    Load the undecoded bytes of a Statsbomb file, from disk when possible.
+    :param url: a Statsbomb open data URL, or a path relative to the data root
+    :param refresh: ignore the disk cache and fetch the file again (not possible in offline mode)
+    :return: bytes of the json file
+    '''
+    path = data_path(url)
+
+    if LOCAL_DIR:
+        raw = _read_local(path)
+        if raw is None:
+            raise FileNotFoundError(f'{path} not found in local mirror {LOCAL_DIR}')
+        _count('local_hits', len(raw))
+        return raw
+
+    if not refresh or OFFLINE:
+        raw = _read_disk(path)
+        if raw is not None:
+            _count('disk_hits', len(raw))
+            return raw
+    if OFFLINE:
+        raise FileNotFoundError(f'{path} is not cached and offline mode is on')
+
+    raw = _get(data_url(path) if '://' not in url else url)
+    _count('misses', len(raw))
+    _write_disk(path, raw)
+    return raw
+
+def _gzip_size(cache_file):
+    # The last 4 bytes of a gzip file are the size of the uncompressed data modulo 2**32.
+    with open(cache_file, 'rb') as f:
+        f.seek(-4, os.SEEK_END)
+        return int.from_bytes(f.read(4), 'little')
+
+def open_raw(url):
+    '''
+    Open a Statsbomb file for reading in chunks, without holding its bytes in memory when it is
+    on disk already. Files which are not cached yet are fetched with load_raw first.
+    :param url: a Statsbomb open data URL, or a path relative to the data root
+    :return: a binary file object of the json file, to be closed by the caller
+    '''
+    path = data_path(url)
+
+    if LOCAL_DIR:
+        local_file = os.path.join(LOCAL_DIR, *path.split('/'))
+        try:
+            f = open(local_file, 'rb')
+        except OSError:
+            raise FileNotFoundError(f'{path} not found in local mirror {LOCAL_DIR}')
+        _count('local_hits', os.fstat(f.fileno()).st_size)
+        return f
+
+    cache_file = _cache_file(path)
+    try:
+        size = _gzip_size(cache_file)
+        f = gzip.open(cache_file, 'rb')
+    except OSError:
+        return io.BytesIO(load_raw(url))
+    _count('disk_hits', size)
+    return f
+
+def load_json(url, refresh=False):
+    '''
+    Load json data from the given URL, served from memory or the disk cache when available.
+    The returned object is shared between callers and must not be modified.
+    :param url: a Statsbomb open data URL, or a path relative to the data root
+    :param refresh: ignore the caches and fetch the file again
+    :return: decoded json data
+    '''
+    path = data_path(url)
+    if not refresh:
+        entry = _memory.get(path)
+        if entry is not None:
+            data, size = entry
+            _count('memory_hits', size)
+            return data
+
+    raw = load_raw(url, refresh=refresh)
+    data = json.loads(raw)
+    _memory.put(path, (data, len(raw)))
+    return data
+
+def load_snapshot(url):
+    '''
+    Load a file which may change upstream, like a match list, without waiting on the network when
+    a copy is cached. The cached copy is returned at once and, when older than SNAPSHOT_MAX_AGE,
+    fetched again in a background thread for the processes started after it.
+    :param url: a Statsbomb open data URL, or a path relative to the data root
+    :return: a tuple of the decoded json data and its source, 'local', 'cache' or 'network'
+    '''
+    path = data_path(url)
+    if LOCAL_DIR:
+        return load_json(url), 'local'
+
+    raw = _read_disk(path)
+    if raw is None:
+        return load_json(url), 'network'
+
+    _count('disk_hits', len(raw))
+    data = json.loads(raw)
+    _memory.put(path, (data, len(raw)))
+
+    age = time.time() - os.path.getmtime(_cache_file(path))
+    if not OFFLINE and age > SNAPSHOT_MAX_AGE:
+        threading.Thread(target=_refresh, args=(url,), name=f'refresh {path}', daemon=True).start()
+    return data, 'cache'
+
+def _refresh(url):
+    try:
+        load_raw(url, refresh=True)
+    except (requests.RequestException, OSError) as e:
+        logger.warning('Could not refresh %s: %s', url, e)
+
+def cache_stats():
+    '''
+    :return: a dict with hit and miss counts per cache level, bytes downloaded and bytes served
+             from a cache instead of the network
+    '''
+    with _lock:
+        stats = dict(_stats)
+    stats['memory_items'] = len(_memory)
+    lookups = stats['memory_hits'] + stats['disk_hits'] + stats['local_hits'] + stats['misses']
+    stats['hit_ratio'] = (lookups - stats['misses']) / lookups if lookups else 0.0
+    return stats
+
+def clear_memory():
+    '''
+    Drop the decoded files held in memory. The disk cache is left untouched.
+    '''
+    _memory.clear()
@@ -0,0 +1,283 @@
+import codecs
+import json
+import os
+
+import numpy as np
+
+import datacache
+import fetcher
+from metrics import timer
+
+# One row per event. Only the fields used by tacticplot are kept, missing values are NaN for
+# coordinates and numbers and -1 for ids. Refer to Statsbomb data specification for the ids.
+EVENT_DTYPE = np.dtype([
+    ('index', 'i4'),
+    ('period', 'i1'),
+    ('minute', 'i2'),
+    ('second', 'i1'),
+    ('type_id', 'i2'),
+    ('team_id', 'i4'),
+    ('x', 'f8'),
+    ('y', 'f8'),
+    ('end_x', 'f8'),
+    ('end_y', 'f8'),
+    ('duration', 'f8'),
+    ('pass_length', 'f8'),
+    ('shot_outcome_id', 'i2'),
+    ('pass_outcome_id', 'i2'),
+    ('duel_type_id', 'i2'),
+    ('interception_outcome_id', 'i2'),
+    # Position ids of the lineup for Starting XI and Tactical Shift events, 0 for unused slots.
+    ('lineup', 'i1', (11,)),
+])
+
+GOAL_OUTCOME_ID = 97
+
+_NO_LINEUP = [0] * 11
+
+# Column stores are written next to the json cache, one .npy and one .json file per match.
+STORE_DIR = os.path.join(datacache.CACHE_DIR, 'columns')
+
+# Order of the rows of the stores written by build_store. Stores written with another layout are built again.
+STORE_LAYOUT = 'team'
+
+# Opened stores and their partitions
+_opened = datacache.MemoryCache()
+_partitions = datacache.MemoryCache()
+
+def field_id(obj, *keys):
+    '''
+    :param obj: an event or one of its nested dicts
+    :param keys: path to the field, e.g. 'shot', 'outcome', 'id'
+    :return: the field, -1 when the event does not have it
+    '''
+    for key in keys:
+        if not isinstance(obj, dict) or key not in obj:
+            return -1
+        obj = obj[key]
+    return obj
+
+def iter_events(stream, chunk_size=64 * 1024):
+    '''
+    Decode a json array of events one event at a time, reading the file in chunks. Only the event
+    being decoded and one chunk are in memory at once.
+    :param stream: binary file object of a Statsbomb events file, see datacache.open_raw
+    :param chunk_size: number of bytes read at once
+    :return: an iterator over the decoded events
+    '''
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer, pos, eof = '', 0, False
+    expected, closable = '[', False
+
+    while True:
+        # Skip whitespace and the separator expected before the next value.
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + utf8.decode(chunk, final=eof), 0
+
+        if pos == len(buffer):
+            raise ValueError('Unexpected end of the events file')
+        char = buffer[pos]
+        if char == ']' and closable:
+            return
+        if expected is not None:
+            if char != expected:
+                raise ValueError(f'Expected {expected!r} at {char!r} in the events file')
+            pos += 1
+            # The array may be empty, but must not end with a comma.
+            closable = expected == '['
+            expected = None
+            continue
+
+        # Decode the next event, reading more chunks while it is incomplete.
+        while True:
+            try:
+                event, pos = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = stream.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + utf8.decode(chunk, final=eof), 0
+        yield event
+        expected, closable = ',', True
+
+def _project(e, teams):
+    '''
+    :param e: json data of an event
+    :param teams: dict of team names and ids, completed with the team of the event
+    :return: a tuple of the fields of EVENT_DTYPE for the event
+    '''
+    teams[e['team']['name']] = e['team']['id']
+    x, y = e['location'][:2] if 'location' in e else (np.nan, np.nan)
+    end_x = end_y = pass_length = np.nan
+    pass_outcome_id = -1
+    for kind in ('pass', 'carry'):
+        if kind in e and 'end_location' in e[kind]:
+            end_x, end_y = e[kind]['end_location'][:2]
+    if 'pass' in e:
+        pass_length = e['pass'].get('length', np.nan)
+        pass_outcome_id = field_id(e['pass'], 'outcome', 'id')
+
+    lineup = _NO_LINEUP
+    if 'tactics' in e:
+        position_ids = [player['position']['id'] for player in e['tactics']['lineup']][:11]
+        lineup = position_ids + [0] * (11 - len(position_ids))
+
+    return (e['index'], e['period'], e['minute'], e['second'], e['type']['id'], e['team']['id'],
+            x, y, end_x, end_y, e.get('duration', np.nan), pass_length,
+            field_id(e, 'shot', 'outcome', 'id'), pass_outcome_id, field_id(e, 'duel', 'type', 'id'),
+            field_id(e, 'interception', 'outcome', 'id'), lineup)
+
+def to_columns(events):
+    '''
+    :param events: json data of Statsbomb events, or any iterable of events like iter_events
+    :return: a tuple of a numpy structured array with EVENT_DTYPE, one row per event, and a dict
+             mapping team names to team ids
+    '''
+    teams = {}
+    # Each event is reduced to a tuple of its projected fields as soon as it is decoded.
+    columns = np.array([_project(e, teams) for e in events], dtype=EVENT_DTYPE)
+    return columns, teams
+
+def _store_files(match_id):
+    return (os.path.join(STORE_DIR, f'{match_id}.npy'), os.path.join(STORE_DIR, f'{match_id}.json'))
+
+def build_store(match_id):
+    '''
+    Convert the event json of a match to columns and save them to disk.
+    :param match_id: Statsbomb match id
+    :return: path of the saved .npy file
+    '''
+    path = f'events/{match_id}.json'
+    with timer('fetch'):
+        # Callbacks asking for the same match at the same time share one download.
+        fetcher.run(fetcher.prefetch(path))
+        stream = datacache.open_raw(path)
+    # Events are decoded and projected one at a time, the full json data is never in memory.
+    with stream, timer('parse'):
+        columns, teams = to_columns(iter_events(stream))
+    # The rows of each team are contiguous on disk, partition reads them as views of the memory map.
+    columns = sort_by_team(columns)
+
+    npy_file, meta_file = _store_files(match_id)
+    # The meta file is moved first, an existing .npy file always has its meta file next to it.
+    with datacache.atomic_open(npy_file) as npy, datacache.atomic_open(meta_file, 'w') as meta:
+        json.dump({'match_id': match_id, 'teams': teams, 'layout': STORE_LAYOUT}, meta)
+        np.save(npy, columns)
+    return npy_file
+
+def _layout(meta_file):
+    try:
+        with open(meta_file) as f:
+            return json.load(f).get('layout')
+    except OSError:
+        return None
+
+def open_store(match_id):
+    '''
+    Open the column store of a match with memory mapping, building it first if needed.
+    All processes opening the same match share its pages through the OS cache.
+    :param match_id: Statsbomb match id
+    :return: a tuple of a read-only structured array with EVENT_DTYPE and a dict mapping team
+             names to team ids
+    '''
+    opened = _opened.get(match_id)
+    if opened is not None:
+        return opened
+
+    npy_file, meta_file = _store_files(match_id)
+    if not os.path.exists(npy_file) or _layout(meta_file) != STORE_LAYOUT:
+        build_store(match_id)
+    columns = np.load(npy_file, mmap_mode='r')
+    with open(meta_file) as f:
+        teams = json.load(f)['teams']
+
+    _opened.put(match_id, (columns, teams))
+    return columns, teams
+
+def team_columns(columns, teams, team_name):
+    '''
+    :param columns: array returned by open_store
+    :param teams: dict returned by open_store
+    :param team_name: name of a team in the match
+    :return: rows of the events related to the team
+    '''
+    return columns[columns['team_id'] == teams[team_name]]
+
+def sort_by_team(columns):
+    '''
+    :param columns: array returned by to_columns
+    :return: the rows sorted by team, the rows of a team staying in the order of the match
+    '''
+    return columns[np.argsort(columns['team_id'], kind='stable')]
+
+def partition(columns):
+    '''
+    Split the rows of a column store by team and group them by period and type id, so that each
+    category of events is read without scanning the whole match again.
+    :param columns: array returned by open_store. Rows of another order are sorted by team first,
+                    see sort_by_team, the rows of the stores of open_store staying views of the memory map
+    :return: a dict mapping team ids to tuples of the rows of the team, in order, and a dict
+             mapping (period, type_id) to the positions of the matching rows in them, ascending
+    '''
+    if len(columns) == 0:
+        return {}
+    team_id = columns['team_id']
+    starts = np.concatenate(([0], np.flatnonzero(team_id[1:] != team_id[:-1]) + 1, [len(columns)]))
+    if len(np.unique(team_id[starts[:-1]])) < len(starts) - 1:
+        return partition(sort_by_team(columns))
+
+    parts = {}
+    for start, end in zip(starts[:-1], starts[1:]):
+        rows = columns[start:end]
+        parts[int(team_id[start])] = (rows, group(rows))
+    return parts
+
+def group(columns):
+    '''
+    :param columns: rows of a column store, e.g. the rows of one team
+    :return: a dict mapping (period, type_id) to the ascending positions of the matching rows
+    '''
+    order = np.lexsort((columns['type_id'], columns['period']))
+    period, type_id = columns['period'][order], columns['type_id'][order]
+    changed = (period[1:] != period[:-1]) | (type_id[1:] != type_id[:-1])
+    starts = np.concatenate(([0], np.flatnonzero(changed) + 1, [len(order)]))
+    return {(int(period[a]), int(type_id[a])): order[a:b] for a, b in zip(starts[:-1], starts[1:])}
+
+def select(groups, type_ids, exclude_periods=()):
+    '''
+    :param groups: dict of a team returned by partition
+    :param type_ids: event type ids to select
+    :param exclude_periods: periods to leave out, e.g. (5,) for penalty shootouts
+    :return: ascending positions of the selected rows in the rows of the team
+    '''
+    selected = [positions for (period, type_id), positions in groups.items()
+                if type_id in type_ids and period not in exclude_periods]
+    if not selected:
+        return np.zeros(0, dtype=np.intp)
+    return np.sort(np.concatenate(selected)) if len(selected) > 1 else selected[0]
+
+def open_partition(match_id):
+    '''
+    :param match_id: Statsbomb match id
+    :return: a tuple of partition() of the column store of the match and the dict mapping team
+             names to team ids, both kept in memory for the next calls
+    '''
+    partitioned = _partitions.get(match_id)
+    if partitioned is not None:
+        return partitioned
+
+    columns, teams = open_store(match_id)
+    with timer('partition'):
+        parts = partition(columns)
+
+    _partitions.put(match_id, (parts, teams))
+    return parts, teams
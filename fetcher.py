@@ -0,0 +1,187 @@
+'''
+Concurrent access to the Statsbomb open data with asyncio.
+
+Files are fetched by datacache.load_raw, with its disk cache, pooled session, timeout and retries,
+on a pool of threads driven by one event loop per process. Concurrent requests of the same file,
+from coroutines or from the threads of several Dash callbacks, share a single download.
+
+Usage:
+    python fetcher.py 72 107
+    python fetcher.py 72 107 --no-three-sixty
+'''
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import datacache
+
+_loop = None
+_loop_lock = threading.Lock()
+# path -> asyncio.Future of the bytes, only used from the event loop thread
+_in_flight = {}
+_stats = {'requests': 0, 'shared': 0}
+
+def _forget_loop():
+    # The loop thread does not exist in a forked child, e.g. a worker of a process pool.
+    global _loop, _loop_lock
+    _loop = None
+    _loop_lock = threading.Lock()
+    _in_flight.clear()
+
+os.register_at_fork(after_in_child=_forget_loop)
+
+def loop():
+    '''
+    :return: the event loop of this process, running in a daemon thread, with a default executor
+             of datacache.POOL_SIZE threads so every connection of the pool can be used at once
+    '''
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop.set_default_executor(ThreadPoolExecutor(max_workers=datacache.POOL_SIZE,
+                                                          thread_name_prefix='fetch'))
+            threading.Thread(target=_loop.run_forever, name='fetcher', daemon=True).start()
+        return _loop
+
+def run(coroutine, timeout=None):
+    '''
+    Run a coroutine of this module on the event loop of the process and wait for its result.
+    Can be called from any thread except the loop thread, e.g. from a Dash callback.
+    '''
+    return asyncio.run_coroutine_threadsafe(coroutine, loop()).result(timeout)
+
+async def fetch(path):
+    '''
+    :param path: path of a file relative to the data root, e.g. 'events/3906390.json'
+    :return: bytes of the file, from the cache when possible
+    '''
+    _stats['requests'] += 1
+    future = _in_flight.get(path)
+    if future is not None:
+        _stats['shared'] += 1
+        # Shielded, so that a cancelled caller does not cancel the download of the others.
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().run_in_executor(None, datacache.load_raw, path)
+    _in_flight[path] = future
+    try:
+        return await asyncio.shield(future)
+    finally:
+        future.add_done_callback(lambda _: _in_flight.pop(path, None))
+
+async def fetch_json(path):
+    '''
+    :return: decoded json data of the file
+    '''
+    return json.loads(await fetch(path))
+
+async def prefetch(path):
+    '''
+    Make sure a file is in the cache, without reading it when it is there already.
+    :return: the path of the file
+    '''
+    if not datacache.is_cached(path):
+        await fetch(path)
+    return path
+
+async def prefetch_all(paths):
+    '''
+    Make sure all the files are in the cache, fetching the missing ones concurrently.
+    '''
+    await asyncio.gather(*(prefetch(path) for path in paths))
+
+async def _optional(file):
+    '''
+    :param file: coroutine fetching a file which only some matches have
+    :return: its result, None when the open data does not have the file
+    '''
+    try:
+        return await file
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return None
+        raise
+    except FileNotFoundError:
+        return None
+
+async def fetch_match(match_id, three_sixty=True):
+    '''
+    Fetch the events, lineups and 360 data of a match at the same time.
+    :param match_id: Statsbomb match id
+    :param three_sixty: also fetch the 360 frames, which only some matches have
+    :return: a dict with the bytes of 'events', 'lineups' and 'three-sixty' (None when the match
+             has no 360 data or it was not asked for)
+    '''
+    files = [fetch(f'events/{match_id}.json'), fetch(f'lineups/{match_id}.json')]
+    if three_sixty:
+        files.append(_optional(fetch(f'three-sixty/{match_id}.json')))
+    results = await asyncio.gather(*files)
+    return {'events': results[0], 'lineups': results[1],
+            'three-sixty': results[2] if three_sixty else None}
+
+async def prefetch_match(match_id, three_sixty=True):
+    '''
+    Make sure the events, lineups and 360 data of a match are in the cache, fetching them at the same time.
+    :param match_id: Statsbomb match id
+    :param three_sixty: also fetch the 360 frames, which only some matches have
+    :return: a dict with the paths of 'events', 'lineups' and 'three-sixty' (None when the match
+             has no 360 data or it was not asked for)
+    '''
+    files = [prefetch(f'events/{match_id}.json'), prefetch(f'lineups/{match_id}.json')]
+    if three_sixty:
+        files.append(_optional(prefetch(f'three-sixty/{match_id}.json')))
+    results = await asyncio.gather(*files)
+    return {'events': results[0], 'lineups': results[1],
+            'three-sixty': results[2] if three_sixty else None}
+
+async def fetch_season(competition_id, season_id, three_sixty=True, progress=None):
+    '''
+    Fetch every match of a season into the cache, the files of all matches being fetched
+    concurrently. Each file is written to the disk cache as it arrives and is not kept in memory.
+    :param competition_id: Statsbomb competition id
+    :param season_id: Statsbomb season id
+    :param three_sixty: also fetch the 360 frames
+    :param progress: function called with (match_id, error or None) after each match
+    :return: a dict mapping match ids to the output of prefetch_match, or to the exception raised
+    '''
+    matches = await fetch_json(f'matches/{competition_id}/{season_id}.json')
+
+    async def one(match_id):
+        try:
+            result = await prefetch_match(match_id, three_sixty)
+        except Exception as e:
+            result = e
+        if progress is not None:
+            progress(match_id, result if isinstance(result, Exception) else None)
+        return match_id, result
+
+    return dict(await asyncio.gather(*(one(m['match_id']) for m in matches)))
+
+def stats():
+    '''
+    :return: a dict with the number of files asked for and of those which shared a download in flight
+    '''
+    return dict(_stats)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('competition_id', type=int)
+    parser.add_argument('season_id', type=int)
+    parser.add_argument('--no-three-sixty', action='store_true', help='skip the 360 frames')
+    args = parser.parse_args()
+
+    def report(match_id, error):
+        print(f'{match_id}: {"failed, " + repr(error) if error else "ok"}')
+
+    start = time.perf_counter()
+    results = run(fetch_season(args.competition_id, args.season_id, not args.no_three_sixty, report))
+    failed = sum(isinstance(result, Exception) for result in results.values())
+    print(f'{len(results)} matches in {time.perf_counter() - start:.1f}s, {failed} failed, '
+          f'{datacache.cache_stats()["bytes_downloaded"] / 2**20:.1f} MB downloaded')
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import plotly
+from plotly.utils import PlotlyJSONEncoder
+
+import datacache
+from metrics import timer
+
+# Rendered figures are kept on disk so every gunicorn worker on the machine can reuse them.
+CACHE_DIR = os.environ.get('TACTICPLOT_FIGURE_CACHE_DIR', os.path.join(datacache.CACHE_DIR, 'figures'))
+
+# Upper bound of the disk space used by the figures, least recently used figures are removed first.
+MAX_BYTES = int(os.environ.get('TACTICPLOT_FIGURE_CACHE_BYTES', 256 * 1024 * 1024))
+
+# The cache is scanned for figures to evict when the figures written by this process may have filled
+# it, and at least every EVICT_EVERY writes for the figures written by the other processes.
+EVICT_EVERY = int(os.environ.get('TACTICPLOT_FIGURE_CACHE_EVICT_EVERY', 100))
+
+# Figures of other versions of the code are removed once unused for this many seconds. A version
+# still served on the machine, e.g. during a rolling deploy, keeps its figures.
+OLD_VERSION_AGE = float(os.environ.get('TACTICPLOT_FIGURE_CACHE_OLD_VERSION_AGE', 7 * 24 * 3600))
+
+# Figures rendered ahead of time by batchrender.py, read before the cache when they were rendered
+# by the same version of the code.
+PRECOMPUTED_DIR = os.environ.get('TACTICPLOT_PRECOMPUTED_DIR')
+
+# Source files the figures depend on. Any change to them gives a new cache version.
+SOURCE_FILES = ['tacticplot.py', 'soccerfield.py', 'soccerfield2.py', 'eventstore.py', 'catalog.py', 'rules.py',
+                'constants.py', 'geometry.py', 'timewindow.py']
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'precomputed_hits': 0}
+# Size of the cache at the last scan, and bytes and figures written by this process since then
+_size = {'scanned': None, 'written': 0, 'writes': 0}
+_version = None
+
+def code_version():
+    '''
+    :return: a short hash of the rendering code and the plotly version
+    '''
+    global _version
+    if _version is None:
+        digest = hashlib.sha1(plotly.__version__.encode())
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in SOURCE_FILES:
+            with open(os.path.join(root, name), 'rb') as f:
+                digest.update(f.read())
+        _version = digest.hexdigest()[:12]
+    return _version
+
+def _version_dir():
+    return os.path.join(CACHE_DIR, code_version())
+
+def precomputed_dir(root=None):
+    '''
+    :param root: output directory of batchrender.py, PRECOMPUTED_DIR by default
+    :return: the directory of the figures rendered by this version of the code in it
+    '''
+    return os.path.join(root or PRECOMPUTED_DIR, code_version())
+
+def cache_key(match_id, options=None):
+    '''
+    :param match_id: Statsbomb match id
+    :param options: dict of rendering options which change the figures
+    :return: name of the cache entry
+    '''
+    options = json.dumps(options or {}, sort_keys=True)
+    return f"{match_id}-{hashlib.sha1(options.encode()).hexdigest()[:12]}"
+
+def get(key):
+    '''
+    :param key: name returned by cache_key
+    :return: the cached json string, or None
+    '''
+    path = os.path.join(_version_dir(), key + '.json')
+    try:
+        with open(path) as f:
+            payload = f.read()
+        # The modification time is the last use, see _evict.
+        os.utime(path)
+    except OSError:
+        with _lock:
+            _stats['misses'] += 1
+        return None
+    with _lock:
+        _stats['hits'] += 1
+    return payload
+
+def contains(key):
+    '''
+    :param key: name returned by cache_key
+    :return: True when the figures are cached, without counting a hit or a miss
+    '''
+    return os.path.exists(os.path.join(_version_dir(), key + '.json'))
+
+def write_file(path, text):
+    '''
+    Write a text file, see datacache.atomic_open.
+    '''
+    with datacache.atomic_open(path, 'w') as f:
+        f.write(text)
+
+def put(key, payload):
+    '''
+    :param key: name returned by cache_key
+    :param payload: json string to store
+    '''
+    version_dir = _version_dir()
+    if not os.path.isdir(version_dir):
+        os.makedirs(version_dir, exist_ok=True)
+        _remove_old_versions()
+
+    write_file(os.path.join(version_dir, key + '.json'), payload)
+    with _lock:
+        _size['written'] += len(payload)
+        _size['writes'] += 1
+        scan = (_size['scanned'] is None or _size['scanned'] + _size['written'] > MAX_BYTES or
+                _size['writes'] >= EVICT_EVERY)
+    if scan:
+        _evict(version_dir)
+
+def _last_use(path):
+    '''
+    :return: the time of the last figure written or read in a version directory
+    '''
+    last_use = os.stat(path).st_mtime
+    for entry in os.scandir(path):
+        try:
+            last_use = max(last_use, entry.stat().st_mtime)
+        except OSError:
+            continue
+    return last_use
+
+def _remove_old_versions():
+    now = time.time()
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_dir() and entry.name != code_version():
+            try:
+                unused = now - _last_use(entry.path) > OLD_VERSION_AGE
+            except OSError:
+                continue
+            if unused:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+def _evict(version_dir):
+    '''
+    Remove the least recently used figures until the cache fits in MAX_BYTES.
+    '''
+    entries = []
+    for entry in os.scandir(version_dir):
+        if entry.name.endswith('.json'):
+            try:
+                stat = entry.stat()
+            except OSError:
+                # Removed by another worker in the meantime.
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    # Once over the limit, a tenth of the cache is freed so the next writes do not scan it again.
+    target = MAX_BYTES if total <= MAX_BYTES else 0.9 * MAX_BYTES
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        with _lock:
+            _stats['evictions'] += 1
+    with _lock:
+        _size.update(scanned=total, written=0, writes=0)
+
+def serialize(figures):
+    '''
+    :param figures: list of go.Figure, or any json data
+    :return: json string of the figures as dicts, as stored in the cache
+    '''
+    return json.dumps(figures, cls=PlotlyJSONEncoder)
+
+def get_or_build(match_id, options, build):
+    '''
+    :param match_id: Statsbomb match id
+    :param options: dict of rendering options which change the figures
+    :param build: function without arguments returning the list of figures when they are not cached,
+                  or other json data
+    :return: list of figures, as go.Figure when just built or as dicts when read from the cache
+    '''
+    key = cache_key(match_id, options)
+    if PRECOMPUTED_DIR:
+        try:
+            with open(os.path.join(precomputed_dir(), key + '.json')) as f:
+                payload = f.read()
+        except OSError:
+            pass
+        else:
+            with _lock:
+                _stats['precomputed_hits'] += 1
+            return json.loads(payload)
+
+    with timer('figure_cache_read'):
+        payload = get(key)
+        figures = json.loads(payload) if payload is not None else None
+    if figures is not None:
+        return figures
+
+    figures = build()
+    with timer('serialize'):
+        payload = serialize(figures)
+    with timer('figure_cache_write'):
+        put(key, payload)
+    return figures
+
+def cache_stats():
+    '''
+    :return: a dict with hit, miss and eviction counts of this process, and the number and size
+             of the figures currently cached by all processes
+    '''
+    with _lock:
+        stats = dict(_stats)
+    stats['version'] = code_version()
+    stats['entries'] = stats['bytes'] = 0
+    if os.path.isdir(_version_dir()):
+        for entry in os.scandir(_version_dir()):
+            if entry.name.endswith('.json'):
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    # Evicted by another worker in the meantime.
+                    continue
+                stats['entries'] += 1
+                stats['bytes'] += size
+    return stats
@@ -0,0 +1,62 @@
+'''
+Coordinates of the pitch, shared by the tactic plot, the heatmaps, the spatial index and live mode.
+
+Points are in Statsbomb coordinates: x along the length of the pitch, y along its width, in yards.
+'''
+import numpy as np
+
+# Pitch length and width. A point (x, y) rotated by 180 degrees is PITCH - (x, y).
+PITCH = np.array([120, 80])
+
+# Size of the cells of the grid in yards, and number of cells along the length and the width of the pitch.
+CELL = 5
+GRID = (int(PITCH[0]) // CELL, int(PITCH[1]) // CELL)
+
+def locations(events):
+    '''
+    :param events: json data of events, or rows of a column store
+    :return: array of shape (n, 2) with the x and y of the event locations
+    '''
+    if isinstance(events, np.ndarray):
+        return np.column_stack((events['x'], events['y']))
+    return np.array([e['location'][:2] for e in events], dtype=float).reshape(-1, 2)
+
+def end_locations(events, kind=None):
+    '''
+    :param events: json data of events, or rows of a column store
+    :param kind: 'carry' or 'pass', only needed for json data
+    :return: array of shape (n, 2) with the x and y of the event end locations
+    '''
+    if isinstance(events, np.ndarray):
+        return np.column_stack((events['end_x'], events['end_y']))
+    return np.array([e[kind]['end_location'][:2] for e in events], dtype=float).reshape(-1, 2)
+
+def segments(events, kind=None):
+    '''
+    :return: list of arrays of shape (2, 2), from the location to the end location of each event
+    '''
+    return list(np.stack((locations(events), end_locations(events, kind)), axis=1))
+
+def orient(xy, rotated):
+    '''
+    :param xy: array of shape (n, 2)
+    :param rotated: rotate the points by 180 degrees around the center of the pitch
+    :return: the points as drawn on the figure
+    '''
+    return PITCH - xy if rotated else xy
+
+def join(parts, leading=False):
+    '''
+    Join several parts (line segments, trajectories or single points) into one trace.
+    :param parts: list of arrays of shape (n, 2)
+    :param leading: also put a gap before the first part, to append the parts to a trace that
+                    already has points
+    :return: array of shape (m, 2) with a NaN row, serialized as null, between the parts
+    '''
+    separator = np.full((1, 2), np.nan)
+    pieces = []
+    for part in parts:
+        pieces += [separator, part]
+    if pieces and not leading:
+        pieces = pieces[1:]
+    return np.concatenate(pieces) if pieces else np.empty((0, 2))
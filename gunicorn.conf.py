@@ -0,0 +1,10 @@
+'''
+gunicorn settings of the app. Read from the current directory by gunicorn 20 and later, and by
+older versions with -c:
+    gunicorn -c gunicorn.conf.py --workers 4 dash_app:server
+'''
+
+def post_worker_init(worker):
+    # The warm-up of the caches runs in a worker which loaded the app, never in the master process.
+    import dash_app
+    dash_app.start_warmup()
@@ -0,0 +1,199 @@
+'''
+Heatmaps of a team across all its matches of a season.
+
+The locations of the events of each category are binned on the pitch into a 2D histogram per match
+and team, saved next to the column stores. The view of a team is the sum of the histograms of its
+matches, so a new match only costs its own histogram.
+
+Usage:
+    python heatmap.py
+    python heatmap.py --competitions 72:107 --category defense
+'''
+import argparse
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+import datacache
+import eventstore
+import rules
+import soccerfield
+from catalog import Catalog, COMPETITIONS, parse_competitions, team_label
+from geometry import GRID, PITCH, locations
+from metrics import timer
+
+# Categories of a histogram, in the order of its first axis. The opponent carries are seen from
+# the side of the team, as in the tactic plot.
+CATEGORIES = ('shots', 'defense', 'opponent_carry')
+
+CATEGORY_NAMES = {'shots': 'Shots', 'defense': 'Defensive Actions',
+                  'opponent_carry': f"Opponent Carries (>{rules.params()['carry_min_duration']:g}s)"}
+
+# Histograms are written next to the column stores, one .npz file per match.
+HEATMAP_DIR = os.path.join(datacache.CACHE_DIR, 'heatmaps')
+
+# Source files the histograms depend on. Any change to them gives a new directory.
+SOURCE_FILES = ['heatmap.py', 'eventstore.py', 'rules.py', 'constants.py', 'geometry.py', 'tacticplot.py']
+
+# Sums of the histograms of each team and season: (team name, competition id, season id) ->
+# (frozenset of the match ids summed, counts)
+_aggregates = {}
+_lock = threading.Lock()
+_version = None
+
+def _version_dir():
+    global _version
+    if _version is None:
+        digest = hashlib.sha1()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in SOURCE_FILES:
+            with open(os.path.join(root, name), 'rb') as f:
+                digest.update(f.read())
+        _version = digest.hexdigest()[:12]
+    return os.path.join(HEATMAP_DIR, _version)
+
+def histogram(xy):
+    '''
+    :param xy: array of shape (n, 2) with the x and y of locations, NaN rows are left out
+    :return: array of shape GRID with the number of locations in each bin
+    '''
+    xy = xy[~np.isnan(xy).any(axis=1)]
+    counts, _, _ = np.histogram2d(xy[:, 0], xy[:, 1], bins=GRID, range=[[0, PITCH[0]], [0, PITCH[1]]])
+    return counts.astype(np.int32)
+
+def _locations(*rows):
+    return np.concatenate([locations(r) for r in rows])
+
+def team_histograms(team_tuples, opponent_tuples):
+    '''
+    :param team_tuples: a tuple generated by tacticplot.get_events for the rows of the team in a
+                        column store
+    :param opponent_tuples: the same tuple for the opponent team
+    :return: array of shape (len(CATEGORIES),) + GRID
+    '''
+    shots = _locations(team_tuples[0], team_tuples[1])
+    defense = _locations(team_tuples[5], team_tuples[6])
+    # Carries are binned at their start. Opponent locations are rotated to the side of the team.
+    opponent_carry = PITCH - _locations(opponent_tuples[4])
+    return np.stack([histogram(shots), histogram(defense), histogram(opponent_carry)])
+
+def build_match(match_id, team1, team2):
+    '''
+    :param match_id: Statsbomb match id
+    :param team1: name of the home team, as in the events
+    :param team2: name of the away team, as in the events
+    :return: a dict mapping both team names to their histograms, see team_histograms
+    '''
+    from tacticplot import get_events
+
+    match_parts, match_teams = eventstore.open_partition(match_id)
+    team1_events, team1_groups = match_parts[match_teams[team1]]
+    team2_events, team2_groups = match_parts[match_teams[team2]]
+    with timer('heatmap'):
+        team1_tuples = get_events(team1_events, groups=team1_groups)
+        team2_tuples = get_events(team2_events, groups=team2_groups)
+        return {team1: team_histograms(team1_tuples, team2_tuples),
+                team2: team_histograms(team2_tuples, team1_tuples)}
+
+def match_histograms(match_id, team1, team2):
+    '''
+    Read the histograms of a match from disk, building and saving them first if needed.
+    :return: a dict mapping both team names to their histograms, see build_match
+    '''
+    path = os.path.join(_version_dir(), f'{match_id}.npz')
+    try:
+        with np.load(path) as f:
+            return dict(zip(f['teams'].tolist(), f['histograms']))
+    except OSError:
+        pass
+
+    histograms = build_match(match_id, team1, team2)
+    with datacache.atomic_open(path) as f:
+        np.savez(f, teams=np.array(list(histograms)), histograms=np.stack(list(histograms.values())))
+    return histograms
+
+def season_histograms(catalog, team_name, competition_id, season_id):
+    '''
+    Sum of the histograms of all matches of a team in a season. The sum is kept in memory and
+    only the matches added to the catalog since the last call are read.
+    :param catalog: Catalog of the app
+    :param team_name: Statsbomb team name
+    :return: a tuple of the number of matches summed and an array of shape (len(CATEGORIES),) + GRID
+    '''
+    key = (team_name, competition_id, season_id)
+    season = set(catalog.season_matches[(competition_id, season_id)])
+    match_ids = [m for m in catalog.matches_of_team(team_name) if m in season]
+
+    with _lock:
+        done, counts = _aggregates.get(key, (frozenset(), None))
+    if counts is None or not done <= set(match_ids):
+        done, counts = frozenset(), np.zeros((len(CATEGORIES),) + GRID, dtype=np.int64)
+
+    added = [m for m in match_ids if m not in done]
+    for match_id in added:
+        counts = counts + match_histograms(match_id, *catalog.teams(match_id))[team_name]
+    if added:
+        done = done | frozenset(added)
+        with _lock:
+            _aggregates[key] = (done, counts)
+    return len(done), counts
+
+def figure(team_name, counts, n_matches, category):
+    '''
+    :param team_name: name shown in the title
+    :param counts: array returned by season_histograms
+    :param n_matches: number of matches summed in counts
+    :param category: one of CATEGORIES
+    :return: heatmap figure of the average number of events per match in each bin, the team
+             attacking to the right
+    '''
+    per_match = (counts[CATEGORIES.index(category)] / max(n_matches, 1)).round(2)
+    x_size, y_size = PITCH / GRID
+
+    fig = go.Figure(layout=soccerfield.get_layout())
+    fig.add_trace(go.Heatmap(
+        # Bins along the length of the pitch are the columns of the heatmap.
+        z=per_match.T,
+        x0=x_size / 2, dx=x_size, y0=y_size / 2, dy=y_size,
+        zmin=0, colorscale='Greens',
+        colorbar=dict(title='per match', thickness=12),
+        hovertemplate='%{z:.2f} per match<extra></extra>'))
+    fig.update_layout(title=dict(text=f'{team_name} {CATEGORY_NAMES[category]}, {n_matches} matches',
+                                 xanchor="left", x=0.05, y=0.97),
+                      title_font=dict(family="Roboto, sans-serif", size=18, color='forestgreen'),
+                      width=1120, height=680, paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor='rgba(0,0,0,0)',
+                      margin=dict(l=0, r=100, t=40, b=0),
+                      xaxis=dict(showgrid=False, zeroline=False), yaxis=dict(showgrid=False, zeroline=False),
+                      dragmode=False)
+    return fig
+
+def season_figure(catalog, team_name, competition_id, season_id, category):
+    '''
+    :return: heatmap figure of a team in a season, see figure
+    '''
+    n_matches, counts = season_histograms(catalog, team_name, competition_id, season_id)
+    return figure(team_label(team_name), counts, n_matches, category)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--competitions', default=COMPETITIONS,
+                        help="'competition_id:season_id' pairs separated by commas, or 'all' "
+                             "(default: STATSBOMB_COMPETITIONS or %(default)s)")
+    parser.add_argument('--category', choices=CATEGORIES, default='shots')
+    args = parser.parse_args()
+
+    catalog = Catalog(parse_competitions(args.competitions))
+    for (competition_id, season_id) in catalog.seasons:
+        start = time.perf_counter()
+        totals = {name: season_histograms(catalog, name, competition_id, season_id)
+                  for name in catalog.season_teams(competition_id, season_id)}
+        print(f'{catalog.season_name(competition_id, season_id)}: {len(totals)} teams '
+              f'in {time.perf_counter() - start:.1f}s')
+        for name, (n_matches, counts) in sorted(totals.items(), key=lambda item: -item[1][1].sum()):
+            total = counts[CATEGORIES.index(args.category)].sum()
+            print(f'  {team_label(name)}: {total} {args.category} in {n_matches} matches, '
+                  f'{total / max(n_matches, 1):.1f} per match')
@@ -0,0 +1,393 @@
+'''
+Live mode: the actions of a match as its events arrive, instead of from a finished match file.
+
+A feed is a file of json lines, one event per line, which only grows. It is written by a replay of
+a finished match at real or accelerated speed, or by any other source appending events to it. Each
+process of the app follows the feed with a FileTail and ingests the new events into a LiveMatch,
+which classifies them with the rules of tacticplot.get_events and appends them to its categories.
+An event costs the same at the last minute of the match as at the first one: only the new events
+are parsed and classified, and the browser only receives the new points of each trace.
+
+Usage:
+    python live.py 3906390 --speed 60
+    python live.py 3906390 --follow
+'''
+import argparse
+import fcntl
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import datacache
+import eventstore
+import fetcher
+import geometry
+import rules
+from catalog import team_label
+
+# Feeds are written next to the json cache, one file per match.
+LIVE_DIR = os.path.join(datacache.CACHE_DIR, 'live')
+
+# Speed of the replays started by the app, in seconds of the match clock per second.
+REPLAY_SPEED = float(os.environ.get('TACTICPLOT_REPLAY_SPEED', 10))
+
+# Last line of a feed, written when the match is over.
+END_LINE = '{"end": true}'
+
+# Categories of the rows of a team, in the order of the tuples of tacticplot.get_events. The other
+# positions hold the trajectories before the shots.
+CATEGORIES = {'goal': 0, 'no_goal': 1, 'carry': 4, 'defense': 5, 'defense_no': 6, 'passes': 7,
+              'starting_XI': 8, 'tactic_shift': 9}
+
+# Positions of the traces in the figures of tacticplot.plot with batch=True
+PLOT_TRACES = {'carry': 1, 'pass_end': 3, 'pass_start': 4, 'pass_line': 5, 'no_goal': 6, 'goal': 7,
+               'no_goal_seq_markers': 8, 'no_goal_seq': 9, 'goal_seq_markers': 10, 'goal_seq': 11,
+               'defense': 12, 'defense_no': 13}
+
+# Followed feeds of this process: match id -> (FileTail, LiveMatch)
+_matches = datacache.MemoryCache()
+# Held while a feed is read, a FileTail is not thread safe
+_lock = threading.Lock()
+
+def feed_path(match_id):
+    return os.path.join(LIVE_DIR, f'{match_id}.jsonl')
+
+def _lock_path(match_id):
+    # Locked by the replay writing the feed, whatever the process
+    return feed_path(match_id) + '.lock'
+
+class _Rows:
+    '''
+    Rows of eventstore.EVENT_DTYPE appended in place, the capacity doubling when it is full.
+    '''
+
+    def __init__(self, capacity=16):
+        self._data = np.zeros(capacity, dtype=eventstore.EVENT_DTYPE)
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def rows(self):
+        return self._data[:self._n]
+
+    def append(self, rows):
+        n = self._n + len(rows)
+        if n > len(self._data):
+            data = np.zeros(max(n, 2 * len(self._data)), dtype=eventstore.EVENT_DTYPE)
+            data[:self._n] = self._data[:self._n]
+            self._data = data
+        self._data[self._n:n] = rows
+        self._n = n
+
+class _Team:
+    '''
+    Events of a team in a live match and their categories, see LiveMatch.
+    '''
+
+    def __init__(self):
+        self.events = _Rows()
+        self.categories = {category: _Rows() for category in CATEGORIES}
+        self.goal_seq, self.no_goal_seq = {}, {}
+
+    def ingest(self, rows, params, goal_window, no_goal_window):
+        offset = len(self.events)
+        self.events.append(rows)
+        groups = eventstore.group(rows)
+        selected = rules.classify(rows, groups, params)
+        selected['starting_XI'] = eventstore.select(groups, (35,))
+        selected['tactic_shift'] = eventstore.select(groups, (36,))
+        for category, positions in selected.items():
+            self.categories[category].append(rows[positions])
+
+        # The trajectory before a shot is read from the last events of the team, whatever the batch they came in.
+        events = self.events.rows
+        for category, seq, window in (('goal', self.goal_seq, goal_window), ('no_goal', self.no_goal_seq, no_goal_window)):
+            for i in selected[category] + offset:
+                before_events = events[max(i - window, 0):i + 1]
+                seq[int(events['index'][i])] = before_events[~np.isnan(before_events['x'])]
+
+class LiveMatch:
+    '''
+    Categories of tacticplot.get_events of both teams of a match, updated as its events arrive.
+    '''
+
+    def __init__(self, params=None, goal_window=5, no_goal_window=4):
+        '''
+        :param params: dict of thresholds changed from rules.DEFAULT_PARAMS
+        :param goal_window: number of events before a goal shot kept as its trajectory
+        :param no_goal_window: number of events before a no goal shot kept as its trajectory
+        '''
+        self.params = params
+        self.goal_window = goal_window
+        self.no_goal_window = no_goal_window
+        # Team names and ids, in the order they appear in the events
+        self.teams = {}
+        self.finished = False
+        self._teams = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(team.events) for team in self._teams.values())
+
+    def ingest(self, events):
+        '''
+        Classify new events and append them to the categories of their team.
+        :param events: json data of the events, in the order of the match. The END_LINE object ends the match.
+        '''
+        if events and events[-1] == json.loads(END_LINE):
+            events, self.finished = events[:-1], True
+        if not events:
+            return
+        columns, teams = eventstore.to_columns(events)
+        with self._lock:
+            for name, team_id in teams.items():
+                self.teams.setdefault(name, team_id)
+                team = self._teams.setdefault(team_id, _Team())
+                team.ingest(columns[columns['team_id'] == team_id], self.params, self.goal_window, self.no_goal_window)
+
+    def _team(self, team_name):
+        team_id = self.teams.get(team_name)
+        return self._teams.get(team_id) or _Team()
+
+    def tuples(self, team_name, end=None):
+        '''
+        :param team_name: name of a team, as in the events
+        :param end: cursor of the last rows to return, see cursor, None for all of them
+        :return: a tuple like the ones of tacticplot.get_events with the events of the team so far
+        '''
+        with self._lock:
+            team = self._team(team_name)
+            counts = None if end is None else end.get(team_name) or {}
+            team_tuples = [None] * 10
+            for category, i in CATEGORIES.items():
+                rows = team.categories[category].rows
+                team_tuples[i] = (rows if counts is None else rows[:counts.get(category, 0)]).copy()
+            team_tuples[2] = {int(i): team.goal_seq[int(i)] for i in team_tuples[0]['index']}
+            team_tuples[3] = {int(i): team.no_goal_seq[int(i)] for i in team_tuples[1]['index']}
+        return tuple(team_tuples)
+
+    def cursor(self):
+        '''
+        :return: a dict mapping the team names to the number of rows of each of their categories
+        '''
+        with self._lock:
+            return {name: {category: len(rows) for category, rows in self._team(name).categories.items()}
+                    for name in self.teams}
+
+    def since(self, team_name, start, end):
+        '''
+        :param team_name: name of a team, as in the events
+        :param start: cursor of the rows already seen, see cursor, None for none of them
+        :param end: cursor of the last rows to return
+        :return: a dict mapping each category to its rows between both cursors, and the trajectories
+                 of the new shots as 'goal_seq' and 'no_goal_seq' lists
+        '''
+        with self._lock:
+            team = self._team(team_name)
+            new = {category: rows.rows[((start or {}).get(team_name) or {}).get(category, 0):
+                                       (end.get(team_name) or {}).get(category, 0)]
+                   for category, rows in team.categories.items()}
+            new['goal_seq'] = [team.goal_seq[int(i)] for i in new['goal']['index']]
+            new['no_goal_seq'] = [team.no_goal_seq[int(i)] for i in new['no_goal']['index']]
+        return new
+
+class FileTail:
+    '''
+    Events appended to a feed since it was last read.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._partial = b''
+
+    def read(self):
+        '''
+        :return: a tuple of True when the feed was replaced since the last call, e.g. by a new replay,
+                 and the events appended to it since then. A line being written is left for the next call.
+        '''
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False, []
+        replaced = False
+        if self._file is None or os.fstat(self._file.fileno()).st_ino != inode:
+            if self._file is not None:
+                self._file.close()
+                replaced = True
+            self._file = open(self.path, 'rb')
+            self._partial = b''
+        lines = (self._partial + self._file.read()).split(b'\n')
+        self._partial = lines.pop()
+        return replaced, [json.loads(line) for line in lines if line]
+
+def update(match_id):
+    '''
+    Ingest the events appended to the feed of a match since the last call of this process.
+    :param match_id: Statsbomb match id
+    :return: the LiveMatch of the feed, a new one when the feed was replaced
+    '''
+    with _lock:
+        tail, live_match = _matches.get(match_id) or (FileTail(feed_path(match_id)), LiveMatch())
+        replaced, events = tail.read()
+        if replaced:
+            live_match = LiveMatch()
+        _matches.put(match_id, (tail, live_match))
+        live_match.ingest(events)
+    return live_match
+
+def new_feed(match_id, path=None):
+    '''
+    :param match_id: Statsbomb match id
+    :param path: feed to replace, feed_path(match_id) by default
+    :return: an empty feed opened for writing, which replaced the previous one at once: the
+             processes following it start over
+    '''
+    path = path or feed_path(match_id)
+    with datacache.atomic_open(path, 'w'):
+        pass
+    # Only the replay holding the lock of the feed writes to it, see start_replay.
+    return open(path, 'a')
+
+def replay(match_id, speed=REPLAY_SPEED, feed=None, stop=None):
+    '''
+    Write the events of a finished match to a feed, as they happened at `speed` times the match clock.
+    :param match_id: Statsbomb match id
+    :param speed: seconds of the match clock per second, 1 for real time
+    :param feed: file returned by new_feed, a new feed of the match by default. It is closed at the end.
+    :param stop: threading.Event which stops the replay when set
+    '''
+    feed = feed or new_feed(match_id)
+    stop = stop or threading.Event()
+    with feed:
+        fetcher.run(fetcher.prefetch(f'events/{match_id}.json'))
+        with datacache.open_raw(f'events/{match_id}.json') as stream:
+            clock = 0
+            for event in eventstore.iter_events(stream):
+                # The stoppage time of a period overlaps the start of the next one, the clock never goes back.
+                event_clock = event['minute'] * 60 + event['second']
+                if event_clock > clock:
+                    feed.flush()
+                    if stop.wait((event_clock - clock) / speed):
+                        return
+                    clock = event_clock
+                feed.write(json.dumps(event) + '\n')
+        feed.write(END_LINE + '\n')
+
+def _replay_locked(match_id, speed, feed, lock_file):
+    try:
+        replay(match_id, speed, feed)
+    finally:
+        lock_file.close()
+
+def start_replay(match_id, speed=REPLAY_SPEED):
+    '''
+    Replay a match in a background thread of this process, unless a replay of the match is running
+    already in any process of the machine: the sessions which start the replay meanwhile follow the
+    same feed, at the speed of the first one. Returns once the feed of a new replay replaced the
+    previous one.
+    :param match_id: Statsbomb match id
+    :param speed: see replay
+    :return: True when a new replay started, False when the running one goes on
+    '''
+    path = _lock_path(match_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(path, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    # The lock is held until the replay is over, or its process died.
+    try:
+        feed = new_feed(match_id)
+    except BaseException:
+        lock_file.close()
+        raise
+    threading.Thread(target=_replay_locked, args=(match_id, speed, feed, lock_file),
+                     name=f'replay-{match_id}', daemon=True).start()
+    return True
+
+def _xy(parts, rotated, gaps):
+    '''
+    :param parts: list of arrays of shape (n, 2)
+    :param rotated: rotate the points by 180 degrees around the center of the pitch
+    :param gaps: start each part with a gap, as between the parts of a layer of tacticplot.plot
+    :return: lists of the x and y of the points, None for the gaps and the missing locations
+    '''
+    xy = geometry.orient(geometry.join(parts, leading=gaps), rotated)
+    return [[None if np.isnan(v) else float(v) for v in xy[:, i]] for i in (0, 1)]
+
+def extend_data(team_new, opponent_new, rotated):
+    '''
+    :param team_new: rows of the team since the last update, see LiveMatch.since
+    :param opponent_new: rows of the opponent team since the last update
+    :param rotated: the figure shows the team attacking to the left, see tacticplot.ORIENTATIONS
+    :return: extendData of the tactic plot of the team (see tacticplot.plot), None when nothing is new
+    '''
+    # Opponent actions are seen from the other side of the pitch.
+    opponent_rotated = not rotated
+    carry, passes = opponent_new['carry'], opponent_new['passes']
+    layers = {
+        'carry': _xy(geometry.segments(carry), opponent_rotated, True),
+        'pass_end': _xy(geometry.end_locations(passes)[:, None], opponent_rotated, True),
+        'pass_start': _xy(geometry.locations(passes)[:, None], opponent_rotated, True),
+        'pass_line': _xy(geometry.segments(passes), opponent_rotated, True),
+        'no_goal': _xy([geometry.locations(team_new['no_goal'])], rotated, False),
+        'goal': _xy([geometry.locations(team_new['goal'])], rotated, False),
+        'no_goal_seq_markers': _xy([geometry.locations(seq)[:-1] for seq in team_new['no_goal_seq']], rotated, True),
+        'no_goal_seq': _xy([geometry.locations(seq) for seq in team_new['no_goal_seq']], rotated, True),
+        'goal_seq_markers': _xy([geometry.locations(seq)[:-1] for seq in team_new['goal_seq']], rotated, True),
+        'goal_seq': _xy([geometry.locations(seq) for seq in team_new['goal_seq']], rotated, True),
+        'defense': _xy([geometry.locations(team_new['defense'])], rotated, False),
+        'defense_no': _xy([geometry.locations(team_new['defense_no'])], rotated, False),
+    }
+    layers = {name: xy for name, xy in layers.items() if xy[0]}
+    if not layers:
+        return None
+    return [{'x': [x for x, _ in layers.values()], 'y': [y for _, y in layers.values()]},
+            [PLOT_TRACES[name] for name in layers]]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('match_id', type=int)
+    parser.add_argument('--speed', type=float, default=REPLAY_SPEED,
+                        help='seconds of the match clock per second (default: TACTICPLOT_REPLAY_SPEED or %(default)s)')
+    parser.add_argument('--follow', action='store_true',
+                        help='follow the feed of the match instead of writing it, printing the actions as they arrive')
+    args = parser.parse_args()
+
+    if not args.follow:
+        print(f'Replaying match {args.match_id} to {feed_path(args.match_id)} at {args.speed:g}x')
+        replay(args.match_id, args.speed)
+        raise SystemExit
+
+    live_match, cursor = None, None
+    while True:
+        start = time.perf_counter()
+        previous = live_match
+        n_events = len(previous) if previous is not None else 0
+        live_match = update(args.match_id)
+        elapsed = time.perf_counter() - start
+        if live_match is not previous:
+            # The feed was replaced by a new replay
+            n_events, cursor = 0, None
+        new_cursor = live_match.cursor()
+        for name in live_match.teams:
+            counts = {category: len(rows) for category, rows in live_match.since(name, cursor, new_cursor).items()
+                      if category in rules.RULES and len(rows)}
+            if counts:
+                print(f'{team_label(name)}: ' + ', '.join(f'{n} {category}' for category, n in counts.items()))
+        n_new = len(live_match) - n_events
+        if n_new > 0:
+            print(f'  {n_new} events in {elapsed * 1e3:.1f}ms, {elapsed / n_new * 1e6:.0f}us per event, '
+                  f'{len(live_match)} so far')
+        cursor = new_cursor
+        if live_match.finished:
+            break
+        time.sleep(1)
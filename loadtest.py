@@ -0,0 +1,368 @@
+'''
+Load test of the Dash app against a local stand-in for the Statsbomb open data.
+
+A local HTTP server serves the same paths as raw.githubusercontent.com/statsbomb/open-data, with
+synthetic events or the files of a local open-data checkout, after a configurable latency. The app
+runs under gunicorn pointed at this server with an empty cache, and simulated users click match
+buttons by posting the callbacks of the app to /_dash-update-component.
+
+Usage:
+    python loadtest.py --workers 1 2 4 --concurrency 1 4 16 --duration 20
+    python loadtest.py --latency 0.3 --matches 64 --concurrency 8
+    python loadtest.py --data-dir ../open-data/data --competitions 72:107
+
+For each number of workers and each concurrency level the report gives the throughput, the
+p50/p95/p99 latency of the callbacks and the resident memory of the workers at the end of the run.
+The warm-up of the caches of the app is off unless --warmup is given, the report says which.
+'''
+import argparse
+import datetime
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from benchmark import synthetic_events
+from constants import MATCH_END
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Stages of the synthetic season and their number of matches, as in a 32 team World Cup.
+STAGES = [('Group Stage', 48), ('Round of 16', 8), ('Quarter-finals', 4), ('Semi-finals', 2),
+          ('3rd Place Final', 1), ('Final', 1)]
+COUNTRIES = ['Spain', 'England', 'Sweden', 'Australia', 'France', 'Japan', 'Netherlands', 'Colombia',
+             'United States of America', 'Germany', 'Brazil', 'Canada', 'Norway', 'Denmark', 'Italy',
+             'Nigeria', 'Jamaica', 'Morocco', 'South Africa', 'Switzerland', 'New Zealand', 'Ireland',
+             'Portugal', 'Philippines', 'Argentina', 'China PR', 'Haiti', 'Zambia', 'Costa Rica',
+             'Vietnam', 'Panama', 'Korea\xa0(South)']
+
+UPDATE_PLOT = {
+    'output': '..team1-plot.figure...team2-plot.figure...team1-formation.figure...team2-formation.figure'
+              '...figure-skeleton.data..',
+    'outputs': [{'id': 'team1-plot', 'property': 'figure'}, {'id': 'team2-plot', 'property': 'figure'},
+                {'id': 'team1-formation', 'property': 'figure'}, {'id': 'team2-formation', 'property': 'figure'},
+                {'id': 'figure-skeleton', 'property': 'data'}],
+    'changedPropIds': ['selected-match.data'],
+}
+GET_INFO = {
+    'output': '..time.children...team1_string.children...team2_string.children...team1_manager_string.children'
+              '...team2_manager_string.children...team1_manager.children...team2_manager.children..',
+    'outputs': [{'id': name, 'property': 'children'} for name in
+                ('time', 'team1_string', 'team2_string', 'team1_manager_string', 'team2_manager_string',
+                 'team1_manager', 'team2_manager')],
+    'changedPropIds': ['selected-match.data'],
+}
+
+def synthetic_season(n_matches, events_per_match, competition_id=72, season_id=107):
+    '''
+    :param n_matches: number of matches of the season
+    :param events_per_match: number of events of each match
+    :return: dict mapping paths relative to the data root to the bytes of the json files
+    '''
+    rnd = random.Random(n_matches)
+    files = {'competitions.json': json.dumps([{
+        'competition_id': competition_id, 'season_id': season_id, 'competition_name': "Women's World Cup",
+        'season_name': '2023', 'country_name': 'International', 'competition_international': True}])}
+
+    stages = [(stage_id, name) for stage_id, (name, count) in enumerate(STAGES, 1) for _ in range(count)]
+    stages = [stages[0]] * (n_matches - len(stages)) + stages[-n_matches:]
+    first_day = datetime.date(2023, 7, 20)
+    matches = []
+    for n, (stage_id, stage) in enumerate(stages):
+        match_id = 3900000 + n
+        home, away = rnd.sample(range(len(COUNTRIES)), 2)
+        teams = [(f"{COUNTRIES[home]} Women's", 1000 + home), (f"{COUNTRIES[away]} Women's", 1000 + away)]
+        matches.append({
+            # Four matches a day
+            'match_id': match_id, 'match_date': (first_day + datetime.timedelta(days=n // 4)).isoformat(),
+            'kick_off': f'{10 + n % 4 * 3:02d}:00:00.000',
+            'competition': {'competition_id': competition_id, 'competition_name': "Women's World Cup"},
+            'season': {'season_id': season_id, 'season_name': '2023'},
+            'home_team': {'home_team_id': teams[0][1], 'home_team_name': teams[0][0],
+                          'country': {'id': home, 'name': COUNTRIES[home]},
+                          'managers': [{'id': home, 'name': f'Manager {home}'}]},
+            'away_team': {'away_team_id': teams[1][1], 'away_team_name': teams[1][0],
+                          'country': {'id': away, 'name': COUNTRIES[away]},
+                          'managers': [{'id': away, 'name': f'Manager {away}'}]},
+            'home_score': rnd.randrange(4), 'away_score': rnd.randrange(4), 'match_status': 'available',
+            'competition_stage': {'id': stage_id, 'name': stage},
+        })
+        files[f'events/{match_id}.json'] = json.dumps(synthetic_events(events_per_match, seed=match_id, teams=teams))
+        files[f'lineups/{match_id}.json'] = json.dumps([
+            {'team_id': team_id, 'team_name': name,
+             'lineup': [{'player_id': team_id * 100 + n, 'player_name': f'Player {n + 1}', 'jersey_number': n + 1}
+                        for n in range(23)]}
+            for name, team_id in teams])
+    files[f'matches/{competition_id}/{season_id}.json'] = json.dumps(matches)
+    return {path: content.encode() for path, content in files.items()}
+
+class DataServer(ThreadingHTTPServer):
+    '''
+    HTTP server answering GET /<path> with the files of the open data, after `latency` seconds.
+    '''
+    daemon_threads = True
+
+    def __init__(self, files=None, data_dir=None, latency=0.0, jitter=0.0):
+        '''
+        :param files: dict of paths and bytes, see synthetic_season
+        :param data_dir: 'data' directory of an open-data checkout, used when files is None
+        :param latency: seconds to wait before each answer
+        :param jitter: random seconds added to the latency, up to this value
+        '''
+        super().__init__(('127.0.0.1', 0), _DataHandler)
+        self.files = files
+        self.data_dir = data_dir
+        self.latency = latency
+        self.jitter = jitter
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+    def read(self, path):
+        if self.files is not None:
+            return self.files.get(path)
+        try:
+            with open(os.path.join(self.data_dir, *path.split('/')), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+class _DataHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency + random.uniform(0, server.jitter))
+        content = server.read(self.path.split('?')[0].lstrip('/'))
+        if content is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_app(workers, base_url, cache_dir, competitions, threads=1, warmup=False):
+    '''
+    Start the app under gunicorn with an empty cache, pointed at the stand-in server.
+    :param warmup: let the app warm its caches up in the background (see warmup.py) while it is
+                   measured, off by default so the runs only measure the clicks
+    :return: a tuple of the gunicorn process and the URL of the app
+    '''
+    port = _free_port()
+    env = dict(os.environ, STATSBOMB_BASE_URL=base_url, STATSBOMB_CACHE_DIR=cache_dir,
+               STATSBOMB_COMPETITIONS=competitions, TACTICPLOT_WARMUP='1' if warmup else '0')
+    env.pop('STATSBOMB_LOCAL_DIR', None)
+    env.pop('STATSBOMB_OFFLINE', None)
+    env.pop('TACTICPLOT_FIGURE_CACHE_DIR', None)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{port}', '--timeout', '300', '--log-level', 'warning', 'dash_app:server'],
+        cwd=ROOT, env=env)
+
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode}')
+        try:
+            if requests.get(url + '/_dash-layout', timeout=5).ok:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    stop_app(process)
+    raise RuntimeError('The app did not start within 120 seconds')
+
+def stop_app(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def worker_rss(pid):
+    '''
+    :param pid: pid of the gunicorn master
+    :return: list of the resident memory of each worker, in bytes
+    '''
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+    rss = []
+    for child in children:
+        try:
+            with open(f'/proc/{child}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        rss.append(int(line.split()[1]) * 1024)
+        except OSError:
+            continue
+    return rss
+
+def app_matches(url):
+    '''
+    :return: match ids of the buttons in the layout of the app
+    '''
+    layout = json.dumps(requests.get(url + '/_dash-layout', timeout=30).json())
+    return sorted({int(i) for i in _button_indices(layout)})
+
+def _button_indices(layout):
+    marker = '"type": "match-button", "index": '
+    start = layout.find(marker)
+    while start != -1:
+        end = start + len(marker)
+        yield layout[end:layout.index('}', end)].strip('"')
+        start = layout.find(marker, end)
+
+def run_users(url, match_ids, concurrency, duration, think_time=0.0):
+    '''
+    Simulate users clicking a random match button, then waiting think_time seconds, for `duration`
+    seconds. Each click posts both callbacks which depend on the selected match.
+    :return: a tuple of a dict of the latencies of successful calls per callback, the number of
+             errors and the elapsed time
+    '''
+    latencies = {'get_info': [], 'update_plot': []}
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def user(seed):
+        rnd = random.Random(seed)
+        session = requests.Session()
+        # Like the browser, the user gets whole figures first and patches after that.
+        skeleton = None
+        while time.perf_counter() < deadline:
+            match_id = rnd.choice(match_ids)
+            for name, callback in (('get_info', GET_INFO), ('update_plot', UPDATE_PLOT)):
+                body = dict(callback, inputs=[{'id': 'selected-match', 'property': 'data', 'value': match_id}])
+                if name == 'update_plot':
+                    body['inputs'].append({'id': 'minute-range', 'property': 'value', 'value': [0, MATCH_END]})
+                    body['inputs'].append({'id': 'rule-params', 'property': 'data', 'value': None})
+                    body['state'] = [{'id': 'figure-skeleton', 'property': 'data', 'value': skeleton}]
+                start = time.perf_counter()
+                try:
+                    response = session.post(url + '/_dash-update-component', json=body, timeout=300)
+                    ok = response.ok
+                    if ok and name == 'update_plot':
+                        skeleton = response.json()['response'].get('figure-skeleton', {}).get('data', skeleton)
+                except requests.RequestException:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if ok:
+                        latencies[name].append(elapsed)
+                    else:
+                        errors[0] += 1
+            if think_time:
+                time.sleep(rnd.uniform(0, 2 * think_time))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - start
+
+def percentile(values, p):
+    '''
+    :return: the p-th percentile of values, nearest rank
+    '''
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))]
+
+def main(args):
+    if args.data_dir:
+        server = DataServer(data_dir=args.data_dir, latency=args.latency, jitter=args.jitter)
+        competitions = args.competitions
+    else:
+        server = DataServer(synthetic_season(args.matches, args.events), latency=args.latency, jitter=args.jitter)
+        competitions = '72:107'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Latencies are those of update_plot, the callback rendering the figures.
+    print(f"Warm-up of the caches {'on' if args.warmup else 'off'}")
+    print(f"{'workers':>7} {'users':>6} {'clicks':>7} {'errors':>6} {'clicks/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS/worker MB':>14} {'RSS total MB':>13}")
+    results = []
+    try:
+        for workers in args.workers:
+            # Every run starts from empty caches, so the first clicks pay for the fetch like in production.
+            cache_dir = tempfile.mkdtemp(prefix='loadtest-')
+            process, url = start_app(workers, server.base_url, cache_dir, competitions, args.threads, args.warmup)
+            try:
+                match_ids = app_matches(url)
+                for concurrency in args.concurrency:
+                    latencies, errors, elapsed = run_users(url, match_ids, concurrency, args.duration, args.think_time)
+                    rss = worker_rss(process.pid)
+                    plot_latencies = latencies['update_plot']
+                    result = {'workers': workers, 'concurrency': concurrency, 'warmup': args.warmup,
+                              'clicks': len(plot_latencies),
+                              'errors': errors, 'throughput': len(plot_latencies) / elapsed,
+                              'p50': percentile(plot_latencies, 50), 'p95': percentile(plot_latencies, 95),
+                              'p99': percentile(plot_latencies, 99),
+                              'get_info_p95': percentile(latencies['get_info'], 95),
+                              'rss_max': max(rss, default=0), 'rss_total': sum(rss)}
+                    results.append(result)
+                    print(f"{workers:>7} {concurrency:>6} {result['clicks']:>7} {errors:>6} "
+                          f"{result['throughput']:>8.1f} {result['p50'] * 1e3:>8.0f} {result['p95'] * 1e3:>8.0f} "
+                          f"{result['p99'] * 1e3:>8.0f} {result['rss_max'] / 2**20:>14.0f} "
+                          f"{result['rss_total'] / 2**20:>13.0f}")
+            finally:
+                stop_app(process)
+                shutil.rmtree(cache_dir, ignore_errors=True)
+    finally:
+        server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help='numbers of gunicorn workers to test')
+    parser.add_argument('--threads', type=int, default=1, help='threads per gunicorn worker')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16],
+                        help='numbers of simulated users to test')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per concurrency level')
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help='average seconds a user waits between two clicks')
+    parser.add_argument('--latency', type=float, default=0.1,
+                        help='seconds the data server waits before each answer')
+    parser.add_argument('--jitter', type=float, default=0.05, help='random seconds added to the latency')
+    parser.add_argument('--matches', type=int, default=64, help='matches of the synthetic season')
+    parser.add_argument('--events', type=int, default=3500, help='events of each synthetic match')
+    parser.add_argument('--warmup', action='store_true',
+                        help='let the app warm its caches up in the background during the runs')
+    parser.add_argument('--data-dir', help="serve the 'data' directory of an open-data checkout instead")
+    parser.add_argument('--competitions', default='72:107',
+                        help='STATSBOMB_COMPETITIONS of the app with --data-dir')
+    parser.add_argument('--output', help='also write the results to this json file')
+    main(parser.parse_args())
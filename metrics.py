@@ -0,0 +1,179 @@
+import cProfile
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import datacache
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Profile every request when set to 1, or only requests sent with an 'X-Profile: 1' header when set
+# to 'header'. The header is ignored otherwise, any client could send it.
+PROFILE = os.environ.get('TACTICPLOT_PROFILE', '0')
+PROFILE_DIR = os.environ.get('TACTICPLOT_PROFILE_DIR', os.path.join(datacache.CACHE_DIR, 'profiles'))
+# Number of profiles kept in PROFILE_DIR, the oldest ones are removed.
+PROFILE_KEEP = int(os.environ.get('TACTICPLOT_PROFILE_KEEP', 100))
+
+HELP = {
+    'tacticplot_stage_seconds': 'Time spent in each stage of rendering a match.',
+    'tacticplot_callback_seconds': 'Time spent in each Dash callback.',
+    'tacticplot_callback_calls_total': 'Number of calls of each Dash callback.',
+    'tacticplot_callback_errors_total': 'Number of calls of each Dash callback which raised.',
+    'tacticplot_request_seconds': 'Time spent answering each HTTP path, including the serialization of callback outputs.',
+}
+
+_lock = threading.Lock()
+# (name, label) -> [bucket counts, sum, count]
+_histograms = {}
+# (name, label) -> value
+_counters = {}
+# Functions returning {name: value} dicts of gauges, see add_collector
+_collectors = []
+
+def observe(name, label, seconds):
+    '''
+    Record a duration in a histogram.
+    :param name: metric name, e.g. 'tacticplot_stage_seconds'
+    :param label: tuple of a label name and value, e.g. ('stage', 'get_events')
+    :param seconds: the duration
+    '''
+    with _lock:
+        histogram = _histograms.get((name, label))
+        if histogram is None:
+            histogram = _histograms[(name, label)] = [[0] * len(BUCKETS), 0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[0][i] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+def count(name, label, value=1):
+    '''
+    Increase a counter.
+    :param name: metric name, e.g. 'tacticplot_callback_calls_total'
+    :param label: tuple of a label name and value
+    :param value: increment
+    '''
+    with _lock:
+        _counters[(name, label)] = _counters.get((name, label), 0) + value
+
+@contextmanager
+def timer(stage):
+    '''
+    Time the enclosed block as one stage of rendering a match.
+    :param stage: name of the stage, e.g. 'fetch', 'parse', 'get_events'
+    '''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('tacticplot_stage_seconds', ('stage', stage), time.perf_counter() - start)
+
+def instrument_callback(func):
+    '''
+    Decorator counting the calls and errors of a Dash callback and timing it.
+    '''
+    label = ('callback', func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        count('tacticplot_callback_calls_total', label)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            count('tacticplot_callback_errors_total', label)
+            raise
+        finally:
+            observe('tacticplot_callback_seconds', label, time.perf_counter() - start)
+    return wrapper
+
+def add_collector(collector):
+    '''
+    :param collector: function without arguments returning a dict of gauge names and values,
+                      called on every scrape
+    '''
+    _collectors.append(collector)
+
+def _format_label(label, extra=''):
+    return f'{{{label[0]}="{label[1]}"{extra}}}'
+
+def render():
+    '''
+    :return: all metrics of this process in the Prometheus text format
+    '''
+    with _lock:
+        histograms = {key: (list(buckets), total, n) for key, (buckets, total, n) in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name in sorted({name for name, _ in histograms}):
+        lines += [f'# HELP {name} {HELP.get(name, name)}', f'# TYPE {name} histogram']
+        for (metric, label), (buckets, total, n) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, bucket in zip(BUCKETS, buckets):
+                le = f',le="{bound}"'
+                lines.append(f'{name}_bucket{_format_label(label, le)} {bucket}')
+            le = ',le="+Inf"'
+            lines.append(f'{name}_bucket{_format_label(label, le)} {n}')
+            lines.append(f'{name}_sum{_format_label(label)} {total}')
+            lines.append(f'{name}_count{_format_label(label)} {n}')
+
+    for name in sorted({name for name, _ in counters}):
+        lines += [f'# HELP {name} {HELP.get(name, name)}', f'# TYPE {name} counter']
+        for (metric, label), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_format_label(label)} {value}')
+
+    for collector in _collectors:
+        for name, value in sorted(collector().items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines += [f'# TYPE {name} gauge', f'{name} {value}']
+    return '\n'.join(lines) + '\n'
+
+def _remove_old_profiles():
+    # Names start with the time of the request, the oldest profiles sort first.
+    names = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith('.prof'))
+    for name in names[:max(len(names) - PROFILE_KEEP, 0)]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except FileNotFoundError:
+            # Removed by another worker in the meantime.
+            pass
+
+def install(server):
+    '''
+    Serve the metrics on /metrics of a Flask server, and profile requests when asked to.
+    :param server: Flask server of the Dash app
+    '''
+    from flask import Response, g, request
+
+    @server.route('/metrics')
+    def metrics_endpoint():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    @server.before_request
+    def start_request():
+        g.request_start = time.perf_counter()
+        if PROFILE == '1' or (PROFILE == 'header' and request.headers.get('X-Profile') == '1'):
+            g.profile = cProfile.Profile()
+            g.profile.enable()
+
+    @server.after_request
+    def end_request(response):
+        start = g.pop('request_start', None)
+        if start is not None and request.path != '/metrics':
+            observe('tacticplot_request_seconds', ('path', request.path), time.perf_counter() - start)
+
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            name = request.path.strip('/').replace('/', '_') or 'index'
+            profile.dump_stats(os.path.join(PROFILE_DIR, f'{time.time():.6f}-{os.getpid()}-{name}.prof'))
+            _remove_old_profiles()
+        return response
@@ -0,0 +1,142 @@
+'''
+Rules classifying the events plotted by tacticplot, declared as data.
+
+RULES gives each category of get_events as alternatives, each an event type with conditions on the
+fields of the column store. The thresholds of the conditions are named parameters, which the app
+lets users change per session. compile_rules turns the rules and a set of parameters into
+vectorized predicates, evaluated on the rows of a team already grouped by eventstore.partition, so
+a new set of parameters costs a few numpy comparisons, without fetching or parsing the match again.
+'''
+import functools
+import json
+
+import numpy as np
+
+import eventstore
+from constants import DEFAULT_PARAMS
+from eventstore import GOAL_OUTCOME_ID
+
+# Categories of get_events: a list of alternatives, an event being in the category when it matches
+# any of them. An alternative has the event type ids it applies to and conditions which must all be
+# true, as [field of eventstore.EVENT_DTYPE, operator, value or name of a parameter].
+RULES = {
+    'goal': [{'types': [16], 'where': [['shot_outcome_id', '==', GOAL_OUTCOME_ID]]}],
+    'no_goal': [{'types': [16], 'where': [['shot_outcome_id', '!=', GOAL_OUTCOME_ID]]}],
+    'carry': [{'types': [43], 'where': [['duration', '>', 'carry_min_duration']]}],
+    'defense': [{'types': [9]},
+                {'types': [4], 'where': [['duel_type_id', 'in', 'duel_success_types']]},
+                {'types': [10], 'where': [['interception_outcome_id', 'in', 'interception_success_outcomes']]}],
+    'defense_no': [{'types': [4], 'where': [['duel_type_id', 'not in', 'duel_success_types']]},
+                   {'types': [10], 'where': [['interception_outcome_id', 'not in', 'interception_success_outcomes']]}],
+    'passes': [{'types': [30], 'where': [['pass_length', '>', 'long_pass_min_length'],
+                                         ['pass_outcome_id', 'in', 'long_pass_outcomes']]}],
+}
+
+# Periods left out of a category, penalty shootouts are not shots of the match.
+EXCLUDE_PERIODS = {'goal': (5,), 'no_goal': (5,)}
+
+def _member(values, ids):
+    # Membership in a short list of ids, one comparison per id, cheaper than np.isin for a few ids
+    return (values[:, None] == ids).any(axis=1)
+
+OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+    'in': _member,
+    'not in': lambda values, ids: ~_member(values, ids),
+}
+
+def params(overrides=None):
+    '''
+    :param overrides: dict of parameters changed from DEFAULT_PARAMS, e.g. sent by the app
+    :return: a complete dict of parameters, numbers as floats and ids as sorted lists of ints
+    '''
+    result = dict(DEFAULT_PARAMS)
+    for name, value in (overrides or {}).items():
+        if name not in DEFAULT_PARAMS:
+            raise ValueError(f'Unknown rule parameter {name!r}, expected one of {list(DEFAULT_PARAMS)}')
+        result[name] = value
+    return {name: sorted(int(i) for i in value) if isinstance(value, (list, tuple)) else float(value)
+            for name, value in result.items()}
+
+def legend_names(overrides=None):
+    '''
+    :param overrides: dict of parameters changed from DEFAULT_PARAMS
+    :return: the legend names of the opponent carries and long passes, with their thresholds
+    '''
+    values = params(overrides)
+    return {'carry': f"opponent carry (>{values['carry_min_duration']:g}s)",
+            'passes': f"opponent long pass (>{values['long_pass_min_length']:g} yards)"}
+
+def params_key(overrides=None):
+    '''
+    :return: a string identifying a set of parameters, e.g. for a cache key
+    '''
+    return json.dumps(params(overrides), sort_keys=True)
+
+def is_default(overrides=None):
+    '''
+    :return: True when the parameters give the same rules as DEFAULT_PARAMS
+    '''
+    return params_key(overrides) == params_key()
+
+def compile_rules(overrides=None):
+    '''
+    :param overrides: dict of parameters changed from DEFAULT_PARAMS
+    :return: a dict mapping each category of RULES to a tuple of the periods to leave out and the
+             alternatives as (type ids, predicates) tuples, a predicate being a (field, function,
+             value) tuple
+    '''
+    return _compile(params_key(overrides) if overrides else None)
+
+@functools.lru_cache(maxsize=64)
+def _compile(key):
+    values = json.loads(key) if key else params()
+    compiled = {}
+    for category, alternatives in RULES.items():
+        compiled_alternatives = []
+        for alternative in alternatives:
+            predicates = []
+            for field, operator, value in alternative.get('where', []):
+                if field not in eventstore.EVENT_DTYPE.names:
+                    raise ValueError(f'Unknown field {field!r} in the rules of {category!r}')
+                value = values[value] if isinstance(value, str) else value
+                if operator in ('in', 'not in'):
+                    value = np.array(value)
+                predicates.append((field, OPERATORS[operator], value))
+            compiled_alternatives.append((tuple(alternative['types']), predicates))
+        compiled[category] = (EXCLUDE_PERIODS.get(category, ()), compiled_alternatives)
+    return compiled
+
+def evaluate(rule, columns, groups):
+    '''
+    :param rule: compiled rule of a category, see compile_rules
+    :param columns: rows of a column store
+    :param groups: groups of the rows by period and type id, see eventstore.partition
+    :return: ascending positions of the rows of the category
+    '''
+    exclude_periods, alternatives = rule
+    selected = []
+    for type_ids, predicates in alternatives:
+        # Each alternative only reads the groups of its types
+        positions = eventstore.select(groups, type_ids, exclude_periods)
+        if predicates and len(positions):
+            mask = predicates[0][1](columns[predicates[0][0]][positions], predicates[0][2])
+            for field, function, value in predicates[1:]:
+                mask &= function(columns[field][positions], value)
+            positions = positions[mask]
+        selected.append(positions)
+    return np.sort(np.concatenate(selected)) if len(selected) > 1 else selected[0]
+
+def classify(columns, groups, overrides=None):
+    '''
+    :param columns: rows of a column store related to a team
+    :param groups: groups of the rows by period and type id, see eventstore.partition
+    :param overrides: dict of parameters changed from DEFAULT_PARAMS
+    :return: a dict mapping each category of RULES to the ascending positions of its rows
+    '''
+    return {category: evaluate(rule, columns, groups) for category, rule in compile_rules(overrides).items()}
@@ -0,0 +1,260 @@
+'''
+Spatial index of the actions plotted for each team, to list the events in a zone of the pitch.
+
+The points are bucketed in a uniform grid of CELL yards square. The points of a cell are stored
+together and the cells of a column of the grid one after the other, so a rectangle reads one slice
+of points per column of the grid it overlaps, and only the points of the cells on its border are
+compared with its edges. Indexes of several matches are merged into one.
+'''
+import threading
+
+import numpy as np
+
+import datacache
+import eventstore
+from geometry import CELL, GRID, PITCH, end_locations, locations
+
+# One row per point. Points are in the coordinates of the tactic plot of the team attacking to the
+# right: the opponent passes are rotated, as in the plot.
+POINT_DTYPE = np.dtype([
+    ('x', 'f8'),
+    ('y', 'f8'),
+    ('category', 'i1'),
+    ('match_id', 'i4'),
+    ('index', 'i4'),
+    ('period', 'i1'),
+    ('minute', 'i2'),
+    ('second', 'i1'),
+])
+
+# Categories of the points, the value of their 'category' field is the position in this tuple.
+CATEGORIES = ('goal', 'no_goal', 'defense', 'defense_no', 'pass_start', 'pass_end')
+
+CATEGORY_NAMES = {'goal': 'shots w/ goal', 'no_goal': 'shots w/ no goal', 'defense': 'defense-success',
+                  'defense_no': 'defense-no success', 'pass_start': 'opponent long pass senders',
+                  'pass_end': 'opponent long pass receivers'}
+
+# Indexes of the matches opened last
+_matches = datacache.MemoryCache()
+# Indexes of each team over a season: (team name, competition id, season id) -> (frozenset of the
+# match ids merged, GridIndex)
+_seasons = {}
+_lock = threading.Lock()
+
+def _cells(x, y):
+    '''
+    :return: column and row of the cells of the points, points off the pitch being in the cells of its border
+    '''
+    cx = np.clip(np.floor_divide(x, CELL).astype(np.intp), 0, GRID[0] - 1)
+    cy = np.clip(np.floor_divide(y, CELL).astype(np.intp), 0, GRID[1] - 1)
+    return cx, cy
+
+def inside_polygon(x, y, vx, vy):
+    '''
+    :param x: x of the points
+    :param y: y of the points
+    :param vx: x of the vertices of the polygon, the last one being joined to the first one
+    :param vy: y of the vertices
+    :return: boolean array, True for the points inside the polygon (even-odd rule)
+    '''
+    x, y = np.asarray(x)[:, None], np.asarray(y)[:, None]
+    vx, vy = np.asarray(vx, dtype=float), np.asarray(vy, dtype=float)
+    wx, wy = np.roll(vx, -1), np.roll(vy, -1)
+    # Edges crossing the horizontal line of each point, and the x of the crossing
+    crosses = (vy > y) != (wy > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = vx + (y - vy) * (wx - vx) / (wy - vy)
+    return (crosses & (x < x_cross)).sum(axis=1) % 2 == 1
+
+class GridIndex:
+    '''
+    Points of POINT_DTYPE sorted by cell of a uniform grid over the pitch.
+    '''
+
+    def __init__(self, points):
+        '''
+        :param points: array with POINT_DTYPE, points without a location are left out
+        '''
+        points = points[~(np.isnan(points['x']) | np.isnan(points['y']))]
+        cx, cy = _cells(points['x'], points['y'])
+        cells = cx * GRID[1] + cy
+        # Stable, points of a cell stay in the order they were given, e.g. by match and event index.
+        order = np.argsort(cells, kind='stable')
+        self.points = points[order]
+        # Points of cell c are self.points[self.starts[c]:self.starts[c + 1]]
+        self.starts = np.searchsorted(cells[order], np.arange(GRID[0] * GRID[1] + 1))
+
+    def __len__(self):
+        return len(self.points)
+
+    @classmethod
+    def merge(cls, indexes):
+        '''
+        :param indexes: GridIndex of several matches
+        :return: a GridIndex of all their points
+        '''
+        indexes = list(indexes)
+        if not indexes:
+            return cls(np.zeros(0, dtype=POINT_DTYPE))
+        return cls(np.concatenate([index.points for index in indexes]))
+
+    def _candidates(self, x0, y0, x1, y1):
+        '''
+        :return: points of the cells overlapping a rectangle, with x0 <= x1 and y0 <= y1
+        '''
+        (cx0, cx1), (cy0, cy1) = _cells(np.array([x0, x1]), np.array([y0, y1]))
+        columns = np.arange(cx0, cx1 + 1) * GRID[1]
+        slices = [self.points[a:b] for a, b in zip(self.starts[columns + cy0], self.starts[columns + cy1 + 1]) if b > a]
+        if not slices:
+            return self.points[:0]
+        return np.concatenate(slices) if len(slices) > 1 else slices[0]
+
+    def rect(self, x0, y0, x1, y1):
+        '''
+        :param x0: x of a corner of the rectangle
+        :param y0: y of the same corner
+        :param x1: x of the opposite corner
+        :param y1: y of the opposite corner
+        :return: points inside the rectangle, edges included
+        '''
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        points = self._candidates(x0, y0, x1, y1)
+        x, y = points['x'], points['y']
+        return points[(x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)]
+
+    def polygon(self, vx, vy):
+        '''
+        :param vx: x of the vertices of the polygon, e.g. of a lasso selection
+        :param vy: y of the vertices
+        :return: points inside the polygon
+        '''
+        if len(vx) < 3:
+            return self.points[:0]
+        points = self._candidates(min(vx), min(vy), max(vx), max(vy))
+        return points[inside_polygon(points['x'], points['y'], vx, vy)]
+
+def _points(rows, category, match_id, xy=None):
+    '''
+    :param rows: rows of a column store
+    :param category: one of CATEGORIES
+    :param match_id: Statsbomb match id
+    :param xy: array of shape (n, 2) with the locations of the points, the locations of the rows by default
+    :return: array with POINT_DTYPE
+    '''
+    points = np.zeros(len(rows), dtype=POINT_DTYPE)
+    if xy is None:
+        xy = locations(rows)
+    points['x'], points['y'] = xy[:, 0], xy[:, 1]
+    points['category'] = CATEGORIES.index(category)
+    points['match_id'] = match_id
+    for field in ('index', 'period', 'minute', 'second'):
+        points[field] = rows[field]
+    return points
+
+def team_index(match_id, team_tuples, opponent_tuples):
+    '''
+    :param match_id: Statsbomb match id
+    :param team_tuples: a tuple generated by tacticplot.get_events for the rows of the team in a
+                        column store
+    :param opponent_tuples: the same tuple for the opponent team
+    :return: GridIndex of the shots and defense actions of the team and of the opponent long passes
+    '''
+    passes = opponent_tuples[7]
+    # Opponent passes are seen from the other side of the pitch, as in the tactic plot.
+    pass_start = PITCH - locations(passes)
+    pass_end = PITCH - end_locations(passes)
+    return GridIndex(np.concatenate([
+        _points(team_tuples[0], 'goal', match_id),
+        _points(team_tuples[1], 'no_goal', match_id),
+        _points(team_tuples[5], 'defense', match_id),
+        _points(team_tuples[6], 'defense_no', match_id),
+        _points(passes, 'pass_start', match_id, pass_start),
+        _points(passes, 'pass_end', match_id, pass_end),
+    ]))
+
+def match_index(match_id, team1, team2):
+    '''
+    :param match_id: Statsbomb match id
+    :param team1: name of the home team, as in the events
+    :param team2: name of the away team, as in the events
+    :return: a dict mapping both team names to their GridIndex, kept in memory for the next calls
+    '''
+    indexes = _matches.get(match_id)
+    if indexes is not None:
+        return indexes
+
+    from tacticplot import get_events
+    match_parts, match_teams = eventstore.open_partition(match_id)
+    team1_events, team1_groups = match_parts[match_teams[team1]]
+    team2_events, team2_groups = match_parts[match_teams[team2]]
+    team1_tuples = get_events(team1_events, groups=team1_groups)
+    team2_tuples = get_events(team2_events, groups=team2_groups)
+    indexes = {team1: team_index(match_id, team1_tuples, team2_tuples),
+               team2: team_index(match_id, team2_tuples, team1_tuples)}
+
+    _matches.put(match_id, indexes)
+    return indexes
+
+def season_index(catalog, team_name, competition_id, season_id):
+    '''
+    Index of all matches of a team in a season. It is kept in memory and only the matches added to
+    the catalog since the last call are merged into it.
+    :param catalog: Catalog of the app
+    :param team_name: Statsbomb team name
+    :return: GridIndex
+    '''
+    key = (team_name, competition_id, season_id)
+    season = set(catalog.season_matches[(competition_id, season_id)])
+    match_ids = [m for m in catalog.matches_of_team(team_name) if m in season]
+
+    with _lock:
+        done, index = _seasons.get(key, (frozenset(), None))
+    if index is None or not done <= set(match_ids):
+        done, index = frozenset(), GridIndex.merge([])
+
+    added = [m for m in match_ids if m not in done]
+    if added:
+        index = GridIndex.merge([index] + [match_index(m, *catalog.teams(m))[team_name] for m in added])
+        done = done | frozenset(added)
+        with _lock:
+            _seasons[key] = (done, index)
+    return index
+
+def summary(points):
+    '''
+    :param points: points returned by a query
+    :return: a dict mapping each category of CATEGORIES to its number of points
+    '''
+    counts = np.bincount(points['category'], minlength=len(CATEGORIES))
+    return dict(zip(CATEGORIES, counts.tolist()))
+
+def chronological(points, match_ids):
+    '''
+    :param points: points returned by a query
+    :param match_ids: match ids in the order of the matches, e.g. Catalog.matches_of_team
+    :return: the points in the order of the matches, then of the time in the match
+    '''
+    rank = {match_id: i for i, match_id in enumerate(match_ids)}
+    match_order = [rank.get(int(match_id), -1) for match_id in points['match_id']]
+    return points[np.lexsort((points['second'], points['minute'], points['period'], match_order))]
+
+def select(index, selected_data, rotated=False):
+    '''
+    :param index: GridIndex to query
+    :param selected_data: selectedData of a dcc.Graph, with the 'range' of a box selection or the
+                          'lassoPoints' of a lasso selection
+    :param rotated: the figure shows the pitch rotated by 180 degrees, see tacticplot.ORIENTATIONS
+    :return: points inside the zone selected, none when there is no selection
+    '''
+    if selected_data and selected_data.get('range'):
+        (x0, x1), (y0, y1) = selected_data['range']['x'], selected_data['range']['y']
+        if rotated:
+            x0, x1, y0, y1 = PITCH[0] - x0, PITCH[0] - x1, PITCH[1] - y0, PITCH[1] - y1
+        return index.rect(x0, y0, x1, y1)
+    if selected_data and selected_data.get('lassoPoints'):
+        vx, vy = np.array(selected_data['lassoPoints']['x']), np.array(selected_data['lassoPoints']['y'])
+        if rotated:
+            vx, vy = PITCH[0] - vx, PITCH[1] - vy
+        return index.polygon(vx, vy)
+    return index.points[:0]
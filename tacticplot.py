@@ -1,446 +1,467 @@
-import requests
-import plotly.graph_objects as go
-
-import soccerfield, soccerfield2
-
-def load_json(url):
-    response = requests.get(url)
-    return response.json()
-
-# Generate position dictionary to plot formation. Refer to Statsbomb data specification.
-position_dict = {1:(10, 40),
-                 2:(25, 72), 3:(25, 56), 4:(25, 40), 5:(25, 24), 6:(25, 8),
-                 7:(42.5, 72), 9:(42.5, 56), 10:(42.5, 40), 11:(42.5, 24), 8:(42.5, 8),
-                 12:(60, 72), 13:(60, 56), 14:(60, 40), 15:(60, 24), 16:(60, 8),
-                 17:(77.5, 72), 18:(77.5, 56), 19:(77.5, 40), 20:(77.5, 24), 21:(77.5, 8),
-                 25:(88.75, 40), 22:(100, 56), 23:(100, 40), 24:(100, 24)}
-
-# Set up plot colors.
-goal = 'sienna'
-no_goal = 'goldenrod'
-carry = 'gainsboro'
-defense = 'darkgreen'
-defense_no = 'yellowgreen'
-passes = 'RGB(26,26,26)'
-
-def get_events(events):
-    '''
-    :param events: json data which contains events related to a specified team in a specified match
-    :return: multiple tuples, each contains a json data for a certain action
-    '''
-    
-    goal_events = [e for e in events if e['type']['id'] == 16 and 
-            e['shot']['outcome']['name'] == 'Goal' and e['period'] != 5]
-    no_goal_events = [e for e in events if e['type']['id'] == 16 and 
-            e['shot']['outcome']['name'] != 'Goal' and e['period'] != 5]
-
-    goal_seq = {}
-    for e in goal_events:        
-        before_goal_events = events[events.index(e)-5 : events.index(e)+1]
-        before_goal_events = [e for e in before_goal_events if 'location' in e]
-        goal_seq[e['index']] = before_goal_events
-        
-    no_goal_seq = {}
-    for e in no_goal_events:
-        before_no_goal_events = events[events.index(e)-4 : events.index(e)+1]
-        before_no_goal_events= [e for e in before_no_goal_events if 'location' in e]
-        no_goal_seq[e['index']] = before_no_goal_events    
-    
-    carry = [e for e in events if e['type']['id'] == 43 and e['duration'] > 3.5] 
-
-    defense = [e for e in events if e['type']['id'] == 9 or 
-                                    (e['type']['id'] == 4 and e['duel']['type']['id'] in [11, 4, 15, 16, 17]) or 
-                                    (e['type']['id'] == 10 and e['interception']['outcome']['id'] in [4, 15, 16, 17])]
-
-    defense_no = [e for e in events if (e['type']['id'] == 4 and e['duel']['type']['id'] not in [11, 4, 15, 16, 17]) or
-                                       (e['type']['id'] == 10 and e['interception']['outcome']['id'] not in [4, 15, 16, 17])]
-
-    passes_l = [e for e in events if e['type']['id'] == 30 and e['pass']['length'] > 40 and 'outcome' not in e['pass']]
-
-    starting_XI = [e for e in events if e['type']['id'] == 35]
-    tactic_shift = [e for e in events if e['type']['id'] == 36]
-
-    return (goal_events, no_goal_events, goal_seq, no_goal_seq, carry, defense,
-            defense_no, passes_l, starting_XI, tactic_shift)
-
-def plot(team1_name, team1_tuples, team2_tuples):
-    '''
-    :param team1_name:
-    :param team1_tuples: a tuple generated by function get_events(event) for team 1
-    :param team2_tuples: a tuple generated by function get_events(event) for team 2
-    :return: plot figure
-    '''
-    # Import soccer field layout and set up plot layout
-    field_layout = soccerfield.get_layout()
-
-    fig = go.Figure(layout=field_layout)
-    fig.update_layout(title=dict(text=f'{team1_name} Tactic Plot',
-                                 xanchor="left", x=0.8, y=0.89),
-                      title_font=dict(family = "Roboto, sans-serif", size=18, color='forestgreen'),
-                      width=1120, height=680, paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor='rgba(0,0,0,0)',
-                      margin=dict(l=0, r=100, t=0, b=0),
-                      xaxis=dict(showgrid=False, zeroline=False), yaxis=dict(showgrid=False, zeroline=False),
-                      legend=dict(xanchor="left", x=1, y=0.85,
-                                  font = dict(family = "Roboto, sans-serif", size = 14))
-                      )
-
-    fig.update_layout(dragmode= False)
-
-    # Plot opponent carry events
-    fig.add_trace(go.Scatter(x = [None], y = [None], legendgroup = 'carry', name = 'opponent carry (>3.5s)',
-                            mode='lines', line=dict(color=carry, width = 1.8, dash = 'dashdot')))
-    for e in team2_tuples[4]:
-        fig.add_trace(go.Scatter(
-            x = [120-e['location'][0], 120-e['carry']['end_location'][0]],
-            y = [80-e['location'][1], 80-e['carry']['end_location'][1]],
-            legendgroup = 'carry',
-            showlegend = False,
-            mode='lines',
-            line=dict(color=carry, width = 1.6, dash = 'dashdot')
-        ))
-
-    # Plot opponent pass events
-    fig.add_trace(go.Scatter(x = [None], y = [None], legendgroup = 'passes', name = 'opponent long pass (>40 yards)',
-                        mode='lines+markers',
-                        marker = dict(symbol = 'circle-open', color = passes, size = 8),
-                        line=dict(color=passes, width = 0.8, dash = 'dot')))
-    for e in team2_tuples[7]:
-        fig.add_trace(go.Scatter(
-            x = [120-e['pass']['end_location'][0]],
-            y = [80-e['pass']['end_location'][1]],
-            legendgroup = 'passes',
-            showlegend=False,
-            mode='markers', marker=dict(size=6, symbol = 'circle-open', color= passes, opacity=0.9)))
-        fig.add_trace(go.Scatter(
-            x = [120-e['location'][0]],
-            y = [80-e['location'][1]],
-            legendgroup = 'passes',
-            showlegend = False,
-            mode='markers', marker=dict(size=3, symbol = 'circle-open', color= passes, opacity=0.6)))
-        fig.add_trace(go.Scatter(
-            x = [120-e['location'][0], 120-e['pass']['end_location'][0]],
-            y = [80-e['location'][1], 80-e['pass']['end_location'][1]],
-            legendgroup = 'passes',
-            showlegend = False,
-            mode='lines',
-            line=dict(color=passes, width = 0.3, dash = 'dot')
-        ))
-
-    # Plot no goal events
-    fig.add_trace(go.Scatter(
-        x = [e['location'][0] for e in team1_tuples[1]],
-        y = [e['location'][1] for e in team1_tuples[1]],
-        legendgroup = 'no goal shots',
-        name = 'shots w/ no goal',
-        mode='markers',
-        marker=dict(size=7 , symbol = 'circle', color=no_goal)))
-
-    # Plot goal events
-    fig.add_trace(go.Scatter(
-        x = [e['location'][0] for e in team1_tuples[0]],
-        y = [e['location'][1] for e in team1_tuples[0]],
-        legendgroup = 'goal shots',
-        name = 'shots w/ goal',
-        mode='markers',
-        marker=dict(size=9, symbol = 'circle', color=goal)
-    ))
-
-    # Plot no goal recent trajectory events
-    for key, seq in team1_tuples[3].items():
-        fig.add_trace(go.Scatter(
-            x = [e['location'][0] for e in seq[:-1]],
-            y = [e['location'][1] for e in seq[:-1]],
-            legendgroup = 'no goal shots',
-            showlegend = False,
-            mode='markers',
-            marker=dict( size=6, symbol = 'circle', color=no_goal, opacity=0.3)
-        ))        
-    for key, seq in team1_tuples[3].items():
-        fig.add_trace(go.Scatter(
-            x=[event['location'][0] for event in seq],  
-            y=[event['location'][1] for event in seq], 
-            legendgroup = 'no goal shots',
-            showlegend = False,
-            mode='lines',
-            line=dict(color=no_goal, width = 0.7)
-        ))
-
-    # Plot goal recent trajectory events
-    for key, seq in team1_tuples[2].items():
-        fig.add_trace(go.Scatter(
-            x = [e['location'][0] for e in seq[:-1]],
-            y = [e['location'][1] for e in seq[:-1]],
-            legendgroup = 'goal shots',
-            showlegend = False,
-            mode='markers',
-            marker=dict(size=6, symbol = 'circle', color=goal, opacity=0.3)
-        ))        
-    for key, seq in team1_tuples[2].items():
-        fig.add_trace(go.Scatter(
-            x=[event['location'][0] for event in seq],  
-            y=[event['location'][1] for event in seq], 
-            legendgroup = 'goal shots',
-            showlegend = False,
-            mode='lines',
-            line=dict(color=goal, width = 1.2)
-        ))
-
-    # Plot defense success events
-    fig.add_trace(go.Scatter(
-        x = [e['location'][0] for e in team1_tuples[5]],
-        y = [e['location'][1] for e in team1_tuples[5]],
-        name = 'defense-success',
-        mode='markers',
-        marker=dict(size=6, symbol = 'diamond', color=defense, opacity=0.8)
-    ))
-
-    # Plot defense no success events
-    fig.add_trace(go.Scatter(
-        x = [e['location'][0] for e in team1_tuples[6]],
-        y = [e['location'][1] for e in team1_tuples[6]],
-        name = 'defense-no success',
-        mode='markers',
-        marker=dict(size=6, symbol = 'diamond', color=defense_no, opacity=0.8)
-    ))
-    
-    return fig
-
-def plot2(team2_name, team2_tuples, team1_tuples):
-    # Made a plot2 function because I want the lower plot to rotate for 180 degree. Didn't figure out a better way to do this.
-    '''
-    :param team2_name:
-    :param team2_tuples: a tuple generated by function get_events(event) for team 2
-    :param team1_tuples: a tuple generated by function get_events(event) for team 1
-    :return: plot figure
-    '''
-    # Import soccer field layout and set up plot layout
-    field_layout = soccerfield.get_layout()
-
-    fig = go.Figure(layout=field_layout)
-    fig.update_layout(title=dict(text=f'{team2_name} Tactic Plot',
-                                 xanchor="left", x=0.80, y=0.89),
-                      title_font=dict(family = "Roboto, sans-serif", size=18, color='forestgreen'),
-                      width=1120, height=680, paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor='rgba(0,0,0,0)',
-                      margin=dict(l=0, r=100, t=0, b=0),
-                      xaxis=dict(showgrid=False, zeroline=False), yaxis=dict(showgrid=False, zeroline=False),
-                      legend=dict(x=1, y=0.85,
-                                  font = dict(family = "Roboto, sans-serif", size = 14))
-                      )
-
-    fig.update_layout(dragmode=False)
-
-    # Plot opponent carry events
-    fig.add_trace(go.Scatter(x=[None], y=[None], legendgroup='carry', name='opponent carry (>3.5s)',
-                             mode='lines', line=dict(color=carry, width=1.8, dash='dashdot')))
-    for e in team1_tuples[4]:
-        fig.add_trace(go.Scatter(
-            x=[e['location'][0], e['carry']['end_location'][0]],
-            y=[e['location'][1], e['carry']['end_location'][1]],
-            legendgroup='carry',
-            showlegend=False,
-            mode='lines',
-            line=dict(color=carry, width=1.6, dash='dashdot')
-        ))
-
-    # Plot opponent pass events
-    fig.add_trace(go.Scatter(x=[None], y=[None], legendgroup='passes', name='opponent long pass (>40 yards)',
-                             mode='lines+markers',
-                             marker=dict(symbol='circle-open', color=passes, size=8),
-                             line=dict(color=passes, width=0.8, dash='dot')))
-    for e in team1_tuples[7]:
-        fig.add_trace(go.Scatter(
-            x=[e['pass']['end_location'][0]],
-            y=[e['pass']['end_location'][1]],
-            legendgroup='passes',
-            showlegend=False,
-            mode='markers', marker=dict(size=6, symbol='circle-open', color=passes, opacity=0.9)))
-        fig.add_trace(go.Scatter(
-            x=[e['location'][0]],
-            y=[e['location'][1]],
-            legendgroup='passes',
-            showlegend=False,
-            mode='markers', marker=dict(size=3, symbol='circle-open', color=passes, opacity=0.6)))
-        fig.add_trace(go.Scatter(
-            x=[e['location'][0], e['pass']['end_location'][0]],
-            y=[e['location'][1], e['pass']['end_location'][1]],
-            legendgroup='passes',
-            showlegend=False,
-            mode='lines',
-            line=dict(color=passes, width=0.3, dash='dot')
-        ))
-
-    # Plot no goal events
-    fig.add_trace(go.Scatter(
-        x=[120-e['location'][0] for e in team2_tuples[1]],
-        y=[80-e['location'][1] for e in team2_tuples[1]],
-        legendgroup='no goal shots',
-        name='shots w/ no goal',
-        mode='markers',
-        marker=dict(size=7, symbol='circle', color=no_goal)))
-
-    # Plot goal events
-    fig.add_trace(go.Scatter(
-        x=[120-e['location'][0] for e in team2_tuples[0]],
-        y=[80-e['location'][1] for e in team2_tuples[0]],
-        legendgroup='goal shots',
-        name='shots w/ goal',
-        mode='markers',
-        marker=dict(size=9, symbol='circle', color=goal)
-    ))
-
-    # Plot no goal recent trajectory events
-    for key, seq in team2_tuples[3].items():
-        fig.add_trace(go.Scatter(
-            x=[120-e['location'][0] for e in seq[:-1]],
-            y=[80-e['location'][1] for e in seq[:-1]],
-            legendgroup='no goal shots',
-            showlegend=False,
-            mode='markers',
-            marker=dict(size=6, symbol='circle', color=no_goal, opacity=0.3)
-        ))
-    for key, seq in team2_tuples[3].items():
-        fig.add_trace(go.Scatter(
-            x=[120-event['location'][0] for event in seq],
-            y=[80-event['location'][1] for event in seq],
-            legendgroup='no goal shots',
-            showlegend=False,
-            mode='lines',
-            line=dict(color=no_goal, width=0.7)
-        ))
-
-    # Plot goal recent trajectory events
-    for key, seq in team2_tuples[2].items():
-        fig.add_trace(go.Scatter(
-            x=[120-e['location'][0] for e in seq[:-1]],
-            y=[80-e['location'][1] for e in seq[:-1]],
-            legendgroup='goal shots',
-            showlegend=False,
-            mode='markers',
-            marker=dict(size=6, symbol='circle', color=goal, opacity=0.3)
-        ))
-    for key, seq in team2_tuples[2].items():
-        fig.add_trace(go.Scatter(
-            x=[120-event['location'][0] for event in seq],
-            y=[80-event['location'][1] for event in seq],
-            legendgroup='goal shots',
-            showlegend=False,
-            mode='lines',
-            line=dict(color=goal, width=1.2)
-        ))
-
-    # Plot defense success events
-    fig.add_trace(go.Scatter(
-        x=[120-e['location'][0] for e in team2_tuples[5]],
-        y=[80-e['location'][1] for e in team2_tuples[5]],
-        name='defense-success',
-        mode='markers',
-        marker=dict(size=6, symbol='diamond', color=defense, opacity=0.8)
-    ))
-
-    # Plot defense no success events
-    fig.add_trace(go.Scatter(
-        x=[120-e['location'][0] for e in team2_tuples[6]],
-        y=[80-e['location'][1] for e in team2_tuples[6]],
-        name='defense-no success',
-        mode='markers',
-        marker=dict(size=6, symbol='diamond', color=defense_no, opacity=0.8)
-    ))
-
-    return fig
-
-def formation(team1_name, team1_tuples):
-    '''
-    :param team1_name:
-    :param team1_tuples: a tuple generated by function get_events(event) for team 1
-    :return: plot figure
-    '''
-    # Import soccer field layout and set up plot layout
-    field_layout = soccerfield2.get_layout()
-
-    fig = go.Figure(layout=field_layout)
-    fig.update_layout(title=dict(text=f'{team1_name} Formation',
-                                 yanchor="bottom", x=0.5, y=0.96),
-                      title_font=dict(family="Roboto, sans-serif", size=14),
-                      margin=dict(l=0, r=0, t=20, b=140),
-                      xaxis=dict(showgrid=False, zeroline=False), yaxis=dict(showgrid=False, zeroline=False),
-                      legend=dict(xanchor="left", yanchor="top",
-                                  x=0, y=0, font=dict(family="Roboto, sans-serif", size=14)),
-                      paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor='rgba(0,0,0,0)',
-                      )
-    fig.update_layout(dragmode=False)
-
-    # Get starting XI position id from event tuple
-    start_ids = [player['position']['id'] for player in team1_tuples[8][0]['tactics']['lineup']]
-    fig.add_trace(go.Scatter(
-        x = [position_dict[i][0] for i in start_ids],
-        y = [position_dict[i][1] for i in start_ids],
-        mode='markers',
-        name = 'starting XI',
-        marker=dict(size=8, symbol = 'circle', color='grey'),
-    ))
-
-    # Get tactical shift position id from event tuple
-    tac_temp = start_ids
-    for tac in team1_tuples[9]:
-        m = tac['minute']
-        s =tac['second']
-        position_ids = [player['position']['id'] for player in tac['tactics']['lineup']]
-        if position_ids != tac_temp :
-            fig.add_trace(go.Scatter(
-                x=[position_dict[i][0] for i in position_ids],
-                y=[position_dict[i][1] for i in position_ids],
-                mode='markers',
-                name=f'tactical shift {m}:{s}',
-                marker=dict(size=8, symbol='circle', color='tan'),
-                visible='legendonly'
-            ))
-            tac_temp = position_ids
-    return fig
-
-def formation2(team2_name, team2_tuples):
-    # Made a formation2 function because I want the lower plot to rotate for 180 degree. Didn't figure out a better way to do this.
-    '''
-    :param team2_name:
-    :param team2_tuples: a tuple generated by function get_events(event) for team 2
-    :return: plot figure
-    '''
-    # Import soccer field layout and set up plot layout
-    field_layout = soccerfield2.get_layout()
-
-    fig = go.Figure(layout=field_layout)
-    fig.update_layout(title=dict(text=f'{team2_name} Formation',
-                                 yanchor="bottom", x=0.5, y=0.96),
-                      title_font=dict(family="Roboto, sans-serif", size=14),
-                      margin=dict(l=0, r=0, t=20, b=140),
-                      xaxis=dict(showgrid=False, zeroline=False), yaxis=dict(showgrid=False, zeroline=False),
-                      legend=dict(xanchor="left", yanchor="top",
-                                  x=0, y=0, font=dict(family="Roboto, sans-serif", size=14)),
-                      paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor='rgba(0,0,0,0)',
-                      )
-    fig.update_layout(dragmode=False)
-
-    start_ids = [player['position']['id'] for player in team2_tuples[8][0]['tactics']['lineup']]
-    fig.add_trace(go.Scatter(
-        x=[120-position_dict[i][0] for i in start_ids],
-        y=[80-position_dict[i][1] for i in start_ids],
-        mode='markers',
-        name='starting XI',
-        marker=dict(size=8, symbol='circle', color='grey'),
-    ))
-
-    tac_temp = start_ids
-    for tac in team2_tuples[9]:
-        m = tac['minute']
-        s = tac['second']
-        position_ids = [player['position']['id'] for player in tac['tactics']['lineup']]
-        if position_ids != tac_temp:
-            fig.add_trace(go.Scatter(
-                x=[120-position_dict[i][0] for i in position_ids],
-                y=[80-position_dict[i][1] for i in position_ids],
-                mode='markers',
-                name=f'tactical shift {m}:{s}',
-                marker=dict(size=8, symbol='circle', color='tan'),
-                visible='legendonly'
-            ))
-            tac_temp = position_ids
-    return fig
+import copy
+import functools
+
+import numpy as np
+import plotly.graph_objects as go
+
+import soccerfield, soccerfield2
+import eventstore
+import geometry
+import rules
+import timewindow
+from catalog import team_label
+from metrics import timer
+
+# Generate position dictionary to plot formation. Refer to Statsbomb data specification.
+position_dict = {1:(10, 40),
+                 2:(25, 72), 3:(25, 56), 4:(25, 40), 5:(25, 24), 6:(25, 8),
+                 7:(42.5, 72), 9:(42.5, 56), 10:(42.5, 40), 11:(42.5, 24), 8:(42.5, 8),
+                 12:(60, 72), 13:(60, 56), 14:(60, 40), 15:(60, 24), 16:(60, 8),
+                 17:(77.5, 72), 18:(77.5, 56), 19:(77.5, 40), 20:(77.5, 24), 21:(77.5, 8),
+                 25:(88.75, 40), 22:(100, 56), 23:(100, 40), 24:(100, 24)}
+
+# Same positions as an array indexed by position id, to look a whole lineup up at once.
+position_xy = np.full((max(position_dict) + 1, 2), np.nan)
+position_xy[list(position_dict)] = list(position_dict.values())
+
+# Attacking directions of the team a figure is about. The lower plot of the app shows the second
+# team attacking to the left, which is the same pitch rotated by 180 degrees.
+ORIENTATIONS = ('right', 'left')
+
+# Set up plot colors.
+goal = 'sienna'
+no_goal = 'goldenrod'
+carry = 'gainsboro'
+defense = 'darkgreen'
+defense_no = 'yellowgreen'
+passes = 'RGB(26,26,26)'
+
+def get_events(events, goal_window=5, no_goal_window=4, groups=None, params=None):
+    '''
+    :param events: json data which contains events related to a specified team in a specified match,
+                   or the rows of a column store (see eventstore) for the same events
+    :param goal_window: number of events before a goal shot kept as its trajectory
+    :param no_goal_window: number of events before a no goal shot kept as its trajectory
+    :param groups: for rows of a column store, their groups by period and type id, see get_events_columns
+    :param params: dict of thresholds changed from rules.DEFAULT_PARAMS
+    :return: multiple tuples, each contains a json data (or rows of columns) for a certain action
+    '''
+    if isinstance(events, np.ndarray):
+        return get_events_columns(events, goal_window, no_goal_window, groups, params)
+
+    params = rules.params(params)
+
+    goal_events, no_goal_events, goal_seq, no_goal_seq = [], [], {}, {}
+    carry, defense, defense_no, passes_l, starting_XI, tactic_shift = [], [], [], [], [], []
+
+    # Classify every event in one pass. Shots keep their position in the list, so the trajectory
+    # before a shot is a slice at a known offset instead of a lookup with events.index().
+    for i, e in enumerate(events):
+        type_id = e['type']['id']
+
+        if type_id == 16 and e['period'] != 5:
+            if e['shot']['outcome']['name'] == 'Goal':
+                goal_events.append(e)
+                goal_seq[e['index']] = _trajectory(events, i, goal_window)
+            else:
+                no_goal_events.append(e)
+                no_goal_seq[e['index']] = _trajectory(events, i, no_goal_window)
+
+        elif type_id == 43:
+            if e['duration'] > params['carry_min_duration']:
+                carry.append(e)
+
+        elif type_id == 9:
+            defense.append(e)
+
+        elif type_id == 4:
+            if e['duel']['type']['id'] in params['duel_success_types']:
+                defense.append(e)
+            else:
+                defense_no.append(e)
+
+        elif type_id == 10:
+            if e['interception']['outcome']['id'] in params['interception_success_outcomes']:
+                defense.append(e)
+            else:
+                defense_no.append(e)
+
+        elif type_id == 30:
+            if (e['pass']['length'] > params['long_pass_min_length'] and
+                    eventstore.field_id(e['pass'], 'outcome', 'id') in params['long_pass_outcomes']):
+                passes_l.append(e)
+
+        elif type_id == 35:
+            starting_XI.append(e)
+
+        elif type_id == 36:
+            tactic_shift.append(e)
+
+    return (goal_events, no_goal_events, goal_seq, no_goal_seq, carry, defense,
+            defense_no, passes_l, starting_XI, tactic_shift)
+
+def _trajectory(events, i, window):
+    '''
+    :param events: json data of events, or rows of a column store
+    :param i: position of a shot in events
+    :param window: number of events before the shot to keep
+    :return: the shot and the events before it which have a location, fewer events for a shot
+             among the first `window` events
+    '''
+    before_events = events[max(i - window, 0):i + 1]
+    if isinstance(events, np.ndarray):
+        return before_events[~np.isnan(before_events['x'])]
+    return [e for e in before_events if 'location' in e]
+
+def get_events_columns(columns, goal_window=5, no_goal_window=4, groups=None, params=None):
+    '''
+    Same classification as get_events, done with the vectorized predicates of rules.RULES on the
+    groups of a column store by period and type id. Only the rows of the types plotted are read,
+    whatever the number of events of the match.
+    :param columns: rows of a column store (see eventstore) related to a specified team in a specified match
+    :param goal_window: number of events before a goal shot kept as its trajectory
+    :param no_goal_window: number of events before a no goal shot kept as its trajectory
+    :param groups: groups of the rows by period and type id returned by eventstore.partition or
+                   eventstore.group, computed when not given
+    :param params: dict of thresholds changed from rules.DEFAULT_PARAMS
+    :return: multiple tuples, each contains the rows for a certain action
+    '''
+    if groups is None:
+        groups = eventstore.group(columns)
+    selected = rules.classify(columns, groups, params)
+
+    goal_seq = {int(columns['index'][i]): _trajectory(columns, i, goal_window) for i in selected['goal']}
+    no_goal_seq = {int(columns['index'][i]): _trajectory(columns, i, no_goal_window) for i in selected['no_goal']}
+
+    starting_XI = columns[eventstore.select(groups, (35,))]
+    tactic_shift = columns[eventstore.select(groups, (36,))]
+
+    return (columns[selected['goal']], columns[selected['no_goal']], goal_seq, no_goal_seq,
+            columns[selected['carry']], columns[selected['defense']], columns[selected['defense_no']],
+            columns[selected['passes']], starting_XI, tactic_shift)
+
+def _lineup(event):
+    '''
+    :param event: a Starting XI or Tactical Shift event, as json data or a row of a column store
+    :return: list of position ids of the lineup
+    '''
+    if isinstance(event, np.void):
+        return [int(i) for i in event['lineup'] if i > 0]
+    return [player['position']['id'] for player in event['tactics']['lineup']]
+
+def _add_layer(fig, parts, rotated, batch, **trace_args):
+    '''
+    Add a plot layer made of several parts (line segments, trajectories or single points).
+    :param fig: plot figure
+    :param parts: list of arrays of shape (n, 2), one per part
+    :param rotated: rotate the layer by 180 degrees, see geometry.orient
+    :param batch: if True, all parts go into one trace separated by gaps, which keeps the number of
+                  traces constant however many events the layer has. Otherwise one trace per part.
+    :param trace_args: arguments of go.Scatter shared by all parts
+    '''
+    if not batch:
+        for part in parts:
+            xy = geometry.orient(part, rotated)
+            fig.add_trace(go.Scatter(x=xy[:, 0], y=xy[:, 1], **trace_args))
+        return
+
+    # Join the parts with gaps between them and transform the whole layer at once.
+    xy = geometry.orient(geometry.join(parts), rotated)
+    fig.add_trace(go.Scatter(x=xy[:, 0], y=xy[:, 1], **trace_args))
+
+@functools.lru_cache(maxsize=None)
+def _skeleton(kind):
+    '''
+    Build the part of a figure that is the same for every team and orientation: the soccer field
+    and the plot styling. Built once per process.
+    :param kind: 'plot' or 'formation'
+    :return: figure as a dict
+    '''
+    if kind == 'plot':
+        # Import soccer field layout and set up plot layout
+        field_layout = soccerfield.get_layout()
+
+        fig = go.Figure(layout=field_layout)
+        fig.update_layout(title=dict(xanchor="left", x=0.8, y=0.89),
+                          title_font=dict(family = "Roboto, sans-serif", size=18, color='forestgreen'),
+                          width=1120, height=680, paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor='rgba(0,0,0,0)',
+                          margin=dict(l=0, r=100, t=0, b=0),
+                          xaxis=dict(showgrid=False, zeroline=False), yaxis=dict(showgrid=False, zeroline=False),
+                          legend=dict(xanchor="left", x=1, y=0.85,
+                                      font = dict(family = "Roboto, sans-serif", size = 14))
+                          )
+    else:
+        # Import soccer field layout and set up plot layout
+        field_layout = soccerfield2.get_layout()
+
+        fig = go.Figure(layout=field_layout)
+        fig.update_layout(title=dict(yanchor="bottom", x=0.5, y=0.96),
+                          title_font=dict(family="Roboto, sans-serif", size=14),
+                          margin=dict(l=0, r=0, t=20, b=140),
+                          xaxis=dict(showgrid=False, zeroline=False), yaxis=dict(showgrid=False, zeroline=False),
+                          legend=dict(xanchor="left", yanchor="top",
+                                      x=0, y=0, font=dict(family="Roboto, sans-serif", size=14)),
+                          paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor='rgba(0,0,0,0)',
+                          )
+    fig.update_layout(dragmode=False)
+    return fig.to_dict()
+
+def _new_figure(kind, title):
+    '''
+    :param kind: 'plot' or 'formation', see _skeleton
+    :param title: title of the figure
+    :return: a new figure on a copy of the skeleton
+    '''
+    # The skeleton was validated when it was built. Validating the copy again would cost more
+    # than adding all the traces.
+    fig = go.Figure(copy.deepcopy(_skeleton(kind)), _validate=False)
+    fig.layout.title.text = title
+    return fig
+
+def _check_orientation(orientation):
+    if orientation not in ORIENTATIONS:
+        raise ValueError(f'orientation must be one of {ORIENTATIONS}, got {orientation!r}')
+    return orientation == 'left'
+
+def plot(team_name, team_tuples, opponent_tuples, orientation='right', batch=True, params=None):
+    '''
+    :param team_name:
+    :param team_tuples: a tuple generated by function get_events(event) for the team
+    :param opponent_tuples: a tuple generated by function get_events(event) for the opponent team
+    :param orientation: attacking direction of the team, 'right' for the upper plot of the app and
+                        'left' for the lower one
+    :param batch: merge the events of each layer into one trace (see _add_layer)
+    :param params: dict of the thresholds the tuples were classified with, changed from
+                   rules.DEFAULT_PARAMS, shown in the legend
+    :return: plot figure
+    '''
+    rotated = _check_orientation(orientation)
+    legend = rules.legend_names(params)
+    fig = _new_figure('plot', f'{team_name} Tactic Plot')
+
+    # Opponent actions are seen from the other side of the pitch.
+    opponent_rotated = not rotated
+
+    # Plot opponent carry events
+    fig.add_trace(go.Scatter(x = [None], y = [None], legendgroup = 'carry', name = legend['carry'],
+                            mode='lines', line=dict(color=carry, width = 1.8, dash = 'dashdot')))
+    _add_layer(fig, geometry.segments(opponent_tuples[4], 'carry'), opponent_rotated, batch,
+               legendgroup = 'carry',
+               showlegend = False,
+               mode='lines',
+               line=dict(color=carry, width = 1.6, dash = 'dashdot'))
+
+    # Plot opponent pass events
+    fig.add_trace(go.Scatter(x = [None], y = [None], legendgroup = 'passes', name = legend['passes'],
+                        mode='lines+markers',
+                        marker = dict(symbol = 'circle-open', color = passes, size = 8),
+                        line=dict(color=passes, width = 0.8, dash = 'dot')))
+    pass_segments = geometry.segments(opponent_tuples[7], 'pass')
+    _add_layer(fig, [segment[1:] for segment in pass_segments], opponent_rotated, batch,
+               legendgroup = 'passes',
+               showlegend=False,
+               mode='markers', marker=dict(size=6, symbol = 'circle-open', color= passes, opacity=0.9))
+    _add_layer(fig, [segment[:1] for segment in pass_segments], opponent_rotated, batch,
+               legendgroup = 'passes',
+               showlegend = False,
+               mode='markers', marker=dict(size=3, symbol = 'circle-open', color= passes, opacity=0.6))
+    _add_layer(fig, pass_segments, opponent_rotated, batch,
+               legendgroup = 'passes',
+               showlegend = False,
+               mode='lines',
+               line=dict(color=passes, width = 0.3, dash = 'dot'))
+
+    # Plot no goal events
+    _add_layer(fig, [geometry.locations(team_tuples[1])], rotated, True,
+               legendgroup = 'no goal shots',
+               name = 'shots w/ no goal',
+               mode='markers',
+               marker=dict(size=7 , symbol = 'circle', color=no_goal))
+
+    # Plot goal events
+    _add_layer(fig, [geometry.locations(team_tuples[0])], rotated, True,
+               legendgroup = 'goal shots',
+               name = 'shots w/ goal',
+               mode='markers',
+               marker=dict(size=9, symbol = 'circle', color=goal))
+
+    # Plot no goal recent trajectory events
+    no_goal_seq = [geometry.locations(seq) for seq in team_tuples[3].values()]
+    _add_layer(fig, [seq[:-1] for seq in no_goal_seq], rotated, batch,
+               legendgroup = 'no goal shots',
+               showlegend = False,
+               mode='markers',
+               marker=dict( size=6, symbol = 'circle', color=no_goal, opacity=0.3))
+    _add_layer(fig, no_goal_seq, rotated, batch,
+               legendgroup = 'no goal shots',
+               showlegend = False,
+               mode='lines',
+               line=dict(color=no_goal, width = 0.7))
+
+    # Plot goal recent trajectory events
+    goal_seq = [geometry.locations(seq) for seq in team_tuples[2].values()]
+    _add_layer(fig, [seq[:-1] for seq in goal_seq], rotated, batch,
+               legendgroup = 'goal shots',
+               showlegend = False,
+               mode='markers',
+               marker=dict(size=6, symbol = 'circle', color=goal, opacity=0.3))
+    _add_layer(fig, goal_seq, rotated, batch,
+               legendgroup = 'goal shots',
+               showlegend = False,
+               mode='lines',
+               line=dict(color=goal, width = 1.2))
+
+    # Plot defense success events
+    _add_layer(fig, [geometry.locations(team_tuples[5])], rotated, True,
+               name = 'defense-success',
+               mode='markers',
+               marker=dict(size=6, symbol = 'diamond', color=defense, opacity=0.8))
+
+    # Plot defense no success events
+    _add_layer(fig, [geometry.locations(team_tuples[6])], rotated, True,
+               name = 'defense-no success',
+               mode='markers',
+               marker=dict(size=6, symbol = 'diamond', color=defense_no, opacity=0.8))
+
+    return fig
+
+def formation(team_name, team_tuples, orientation='right'):
+    '''
+    :param team_name:
+    :param team_tuples: a tuple generated by function get_events(event) for the team
+    :param orientation: attacking direction of the team, see plot
+    :return: plot figure
+    '''
+    rotated = _check_orientation(orientation)
+    fig = _new_figure('formation', f'{team_name} Formation')
+
+    # Get starting XI position id from event tuple. A live match may not have it yet, see live.py
+    if not len(team_tuples[8]):
+        return fig
+    start_ids = _lineup(team_tuples[8][0])
+    _add_layer(fig, [position_xy[start_ids]], rotated, True,
+               mode='markers',
+               name = 'starting XI',
+               marker=dict(size=8, symbol = 'circle', color='grey'))
+
+    # Get tactical shift position id from event tuple
+    tac_temp = start_ids
+    for tac in team_tuples[9]:
+        m = tac['minute']
+        s = tac['second']
+        position_ids = _lineup(tac)
+        if position_ids != tac_temp:
+            _add_layer(fig, [position_xy[position_ids]], rotated, True,
+                       mode='markers',
+                       name=f'tactical shift {m}:{s}',
+                       marker=dict(size=8, symbol='circle', color='tan'),
+                       visible='legendonly')
+            tac_temp = position_ids
+    return fig
+
+def _points(events):
+    xy = geometry.locations(events)
+    return {'x': xy[:, 0].tolist(), 'y': xy[:, 1].tolist()}
+
+def _timed(events, columns):
+    # Period and match clock in seconds of each row, for the minute range of assets/tacticplot.js
+    columns['period'] = events['period'].tolist()
+    columns['clock'] = (events['minute'].astype(int) * 60 + events['second']).tolist()
+    return columns
+
+def _segment_columns(events, kind):
+    xy, end_xy = geometry.locations(events), geometry.end_locations(events, kind)
+    return {'x': xy[:, 0].tolist(), 'y': xy[:, 1].tolist(), 'end_x': end_xy[:, 0].tolist(), 'end_y': end_xy[:, 1].tolist()}
+
+def compact(team_tuples):
+    '''
+    The actions plotted for a team as plain lists of coordinates, which assets/tacticplot.js turns
+    into the same figures as plot and formation in the browser.
+    :param team_tuples: a tuple generated by function get_events(event) for the rows of the team
+                        in a column store, sorted by time (see timewindow.window)
+    :return: a dict of the locations, periods and clocks of each category of get_events, the
+             trajectories before shots in the order of the shots, and the lineups, the starting XI first
+    '''
+    lineups = [{'minute': 0, 'second': 0, 'positions': _lineup(team_tuples[8][0])}]
+    lineups += [{'minute': int(tac['minute']), 'second': int(tac['second']), 'positions': _lineup(tac)}
+                for tac in team_tuples[9]]
+    return {'goal': _timed(team_tuples[0], _points(team_tuples[0])),
+            'no_goal': _timed(team_tuples[1], _points(team_tuples[1])),
+            'goal_seq': [_points(team_tuples[2][int(i)]) for i in team_tuples[0]['index']],
+            'no_goal_seq': [_points(team_tuples[3][int(i)]) for i in team_tuples[1]['index']],
+            'carry': _timed(team_tuples[4], _segment_columns(team_tuples[4], 'carry')),
+            'defense': _timed(team_tuples[5], _points(team_tuples[5])),
+            'defense_no': _timed(team_tuples[6], _points(team_tuples[6])),
+            'passes': _timed(team_tuples[7], _segment_columns(team_tuples[7], 'pass')),
+            'lineups': lineups}
+
+def client_skeleton():
+    '''
+    :return: what assets/tacticplot.js needs besides the match data: the skeletons of both kinds of
+             figure, the coordinates of the positions and the end of the minute range
+    '''
+    return {'plot': _skeleton('plot'), 'formation': _skeleton('formation'),
+            'positions': {str(i): list(xy) for i, xy in position_dict.items()},
+            'match_end': timewindow.MATCH_END}
+
+def match_payload(match_id, team1, team2, params=None):
+    '''
+    :param match_id: Statsbomb match id
+    :param team1: name of the home team, as in the events
+    :param team2: name of the away team, as in the events
+    :param params: dict of the thresholds of the rules changed from rules.DEFAULT_PARAMS
+    :return: the data of both teams for the clientside rendering mode (see compact), and the legend
+             names of the thresholds
+    '''
+    team1_indexed, team2_indexed = timewindow.match_tuples(match_id, team1, team2, params)
+    return {'match_id': match_id, 'legend': rules.legend_names(params),
+            'teams': [dict(compact(timewindow.window(team1_indexed)), name=team_label(team1)),
+                      dict(compact(timewindow.window(team2_indexed)), name=team_label(team2))]}
+
+def match_figures(match_id, team1, team2, window=None, params=None):
+    '''
+    :param match_id: Statsbomb match id
+    :param team1: name of the home team, as in the events
+    :param team2: name of the away team, as in the events
+    :param window: tuple of the start and the end of a window of the match clock in seconds (see
+                   timewindow.window) to only plot the actions in it, None for the whole match
+    :param params: dict of the thresholds of the rules changed from rules.DEFAULT_PARAMS
+    :return: a list of the tactic plot and the formation plot of both teams
+    '''
+    team1_name = team_label(team1)
+    team2_name = team_label(team2)
+
+    if window is not None or params is not None:
+        # Actions sorted by time once per match and set of rules, each window is a binary search per period
+        with timer('time_window'):
+            team1_indexed, team2_indexed = timewindow.match_tuples(match_id, team1, team2, params)
+            team1_tuples = timewindow.window(team1_indexed, *(window or (0, None)))
+            team2_tuples = timewindow.window(team2_indexed, *(window or (0, None)))
+        with timer('figures'):
+            return [plot(team1_name, team1_tuples, team2_tuples, params=params),
+                    plot(team2_name, team2_tuples, team1_tuples, orientation='left', params=params),
+                    formation(team1_name, team1_tuples),
+                    formation(team2_name, team2_tuples, orientation='left')]
+
+    # Load event data from Statsbomb as a memory mapped column store shared by all workers, with its
+    # rows grouped by team, period and type id in one sort
+    with timer('open_store'):
+        match_parts, match_teams = eventstore.open_partition(match_id)
+
+    team1_events, team1_groups = match_parts[match_teams[team1]]
+    team2_events, team2_groups = match_parts[match_teams[team2]]
+
+    # Get tuples of team actions
+    with timer('get_events'):
+        team1_tuples = get_events(team1_events, groups=team1_groups)
+        team2_tuples = get_events(team2_events, groups=team2_groups)
+
+    # Generate plots
+    with timer('figures'):
+        fig1 = plot(team1_name, team1_tuples, team2_tuples)
+        fig2 = plot(team2_name, team2_tuples, team1_tuples, orientation='left')
+
+        fig3 = formation(team1_name, team1_tuples)
+        fig4 = formation(team2_name, team2_tuples, orientation='left')
+
+    return [fig1, fig2, fig3, fig4]
@@ -0,0 +1,116 @@
+'''
+Windows of the match time for the minute range of the tactic plots.
+
+The rows of each category of get_events are sorted by (period, minute, second) once per match. A
+window of the match clock is then a binary search per period in each category, whatever the
+number of events, so the plots follow the slider while it is dragged.
+'''
+
+import numpy as np
+
+import datacache
+import eventstore
+import rules
+from constants import MATCH_END
+
+# Positions of the categories of rows in the tuples of get_events. The other positions hold the
+# trajectories before the shots, and the Starting XI and Tactical Shift events which are not windowed.
+ROW_CATEGORIES = (0, 1, 4, 5, 6, 7)
+
+# Indexed tuples of the matches opened last
+_matches = datacache.MemoryCache()
+
+class TimeIndex:
+    '''
+    Rows of a column store sorted by (period, minute, second), sliced by match time.
+    '''
+
+    def __init__(self, rows):
+        '''
+        :param rows: rows of a column store, in any order
+        '''
+        order = np.lexsort((rows['second'], rows['minute'], rows['period']))
+        self.rows = rows[order]
+        # Match clock in seconds. The minute goes on from a period to the next one, but the stoppage
+        # time of a period overlaps the start of the next one, so the clock is only sorted per period.
+        self.clock = self.rows['minute'].astype(np.int32) * 60 + self.rows['second']
+        period = self.rows['period']
+        bounds = np.flatnonzero(period[1:] != period[:-1]) + 1
+        self.periods = list(zip(np.concatenate(([0], bounds)).tolist(),
+                                np.concatenate((bounds, [len(period)])).tolist()))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def window(self, start, end=None):
+        '''
+        :param start: first second of the match clock
+        :param end: second of the match clock where the window ends, excluded, None for the end of the match
+        :return: rows of the window in every period, sorted by (period, minute, second)
+        '''
+        slices = []
+        for a, b in self.periods:
+            i = a + np.searchsorted(self.clock[a:b], start, 'left')
+            j = b if end is None else a + np.searchsorted(self.clock[a:b], end, 'left')
+            if j > i:
+                slices.append(self.rows[i:j])
+        if not slices:
+            return self.rows[:0]
+        return np.concatenate(slices) if len(slices) > 1 else slices[0]
+
+def index_tuples(team_tuples):
+    '''
+    :param team_tuples: a tuple generated by tacticplot.get_events for the rows of a team in a column store
+    :return: the same tuple, each category of rows replaced by its TimeIndex
+    '''
+    return tuple(TimeIndex(item) if i in ROW_CATEGORIES else item for i, item in enumerate(team_tuples))
+
+def window(indexed_tuples, start=0, end=None):
+    '''
+    :param indexed_tuples: a tuple returned by index_tuples
+    :param start: first second of the match clock
+    :param end: second of the match clock where the window ends, excluded, None for the end of the match
+    :return: a tuple like the ones of get_events with the actions of the window only, sorted by time.
+             The trajectories are those of the shots kept, the lineups are all kept.
+    '''
+    team_tuples = [item.window(start, end) if i in ROW_CATEGORIES else item
+                   for i, item in enumerate(indexed_tuples)]
+    for shots, seq in ((0, 2), (1, 3)):
+        team_tuples[seq] = {int(i): indexed_tuples[seq][int(i)] for i in team_tuples[shots]['index']}
+    return tuple(team_tuples)
+
+def match_tuples(match_id, team1, team2, params=None):
+    '''
+    :param match_id: Statsbomb match id
+    :param team1: name of the home team, as in the events
+    :param team2: name of the away team, as in the events
+    :param params: dict of thresholds changed from rules.DEFAULT_PARAMS
+    :return: a tuple of the indexed tuples of both teams, see index_tuples, kept in memory for the next calls
+    '''
+    key = match_id if rules.is_default(params) else (match_id, rules.params_key(params))
+    indexed = _matches.get(key)
+    if indexed is not None:
+        return indexed
+
+    from tacticplot import get_events
+    match_parts, match_teams = eventstore.open_partition(match_id)
+    team1_events, team1_groups = match_parts[match_teams[team1]]
+    team2_events, team2_groups = match_parts[match_teams[team2]]
+    indexed = (index_tuples(get_events(team1_events, groups=team1_groups, params=params)),
+               index_tuples(get_events(team2_events, groups=team2_groups, params=params)))
+
+    _matches.put(key, indexed)
+    return indexed
+
+def parse_range(minute_range):
+    '''
+    :param minute_range: value of the range slider, first and last second of the match clock
+    :return: a tuple of the start and the end of the window (see window), or None for the whole match
+    '''
+    if not minute_range:
+        return None
+    start, end = int(minute_range[0]), int(minute_range[1])
+    end = None if end >= MATCH_END else end
+    if start <= 0 and end is None:
+        return None
+    return start, end
@@ -0,0 +1,163 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import datacache
+import figurecache
+from catalog import KNOCKOUT_STAGES
+
+logger = logging.getLogger(__name__)
+
+# Warm-up of the caches after the app starts, set to 0 to turn it off.
+ENABLED = os.environ.get('TACTICPLOT_WARMUP', '1') != '0'
+
+# Matches prepared at the same time. Kept low, the warm-up shares the CPU with the requests.
+THREADS = int(os.environ.get('TACTICPLOT_WARMUP_THREADS', 2))
+
+# Only the process holding this lock warms the caches up, the others use the files it writes.
+LOCK_FILE = os.path.join(datacache.CACHE_DIR, 'warmup.lock')
+
+_lock = threading.Lock()
+_progress = {'state': 'idle', 'total': 0, 'done': 0, 'cached': 0, 'failed': 0,
+             'started_at': None, 'finished_at': None}
+_lock_file = None
+# Requests being answered by this process. The warm-up only starts a match when there is none.
+_in_flight = 0
+_idle = threading.Event()
+_idle.set()
+
+def priority(catalog):
+    '''
+    :param catalog: Catalog of the app
+    :return: match ids in the order they are warmed up: finals first, then the other knockout
+             stages from the last to the first, then the other matches, the most recent first
+    '''
+    def key(match_id):
+        match = catalog.match(match_id)
+        stage = match['competition_stage']['name']
+        rank = KNOCKOUT_STAGES.index(stage) + 1 if stage in KNOCKOUT_STAGES else 0
+        return -rank, _negated(match['match_date'])
+    return sorted(catalog.matches, key=key)
+
+def _negated(date):
+    # Sort key of a 'YYYY-MM-DD' date giving the most recent date first
+    return tuple(-int(part) for part in date.split('-'))
+
+def progress():
+    '''
+    :return: a dict with the state of the warm-up ('idle', 'skipped', 'running' or 'done'), the
+             number of matches to prepare, done, found in the cache or failed, and the start and end times
+    '''
+    with _lock:
+        return dict(_progress)
+
+def _update(**changes):
+    with _lock:
+        for key, value in changes.items():
+            _progress[key] = _progress[key] + value if key in ('done', 'cached', 'failed') else value
+
+def warm_match(catalog, match_id, render_mode='server'):
+    '''
+    Fill the column store and the figure cache of a match, as the first update_plot would.
+    :param render_mode: 'server' to cache the figures, 'client' to cache the data of the
+                        clientside rendering mode, see dash_app.RENDER_MODE
+    :return: True when the figures were already cached
+    '''
+    options = {'render': 'client'} if render_mode == 'client' else {}
+    if figurecache.contains(figurecache.cache_key(match_id, options)):
+        return True
+
+    from tacticplot import match_figures, match_payload
+    build = match_payload if render_mode == 'client' else match_figures
+    team1, team2 = catalog.teams(match_id)
+    figurecache.get_or_build(match_id, options, lambda: build(match_id, team1, team2))
+    return False
+
+def install(server):
+    '''
+    Pause the warm-up of this process while its Flask server answers requests, so the callbacks
+    do not wait for the GIL behind the matches being prepared.
+    :param server: Flask server of the Dash app
+    '''
+    from flask import g
+
+    @server.before_request
+    def request_started():
+        global _in_flight
+        with _lock:
+            _in_flight += 1
+            _idle.clear()
+        g.warmup_in_flight = True
+
+    @server.teardown_request
+    def request_finished(error):
+        global _in_flight
+        if g.pop('warmup_in_flight', False):
+            with _lock:
+                _in_flight -= 1
+                if not _in_flight:
+                    _idle.set()
+
+def _warm_when_idle(catalog, match_id, render_mode):
+    _idle.wait()
+    return warm_match(catalog, match_id, render_mode)
+
+def run(catalog, render_mode='server', threads=THREADS):
+    '''
+    Warm every match of the catalog up in priority order, with a bounded pool of threads sharing
+    the connection pool of datacache. A match waits for the requests in flight, see install.
+    :param catalog: Catalog of the app
+    :param render_mode: see warm_match
+    :param threads: matches prepared at the same time
+    '''
+    match_ids = priority(catalog)
+    _update(state='running', total=len(match_ids), started_at=time.time())
+    logger.info('Warming up %d matches with %d threads', len(match_ids), threads)
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='warmup') as executor:
+        futures = {executor.submit(_warm_when_idle, catalog, match_id, render_mode): match_id for match_id in match_ids}
+        for future in as_completed(futures):
+            try:
+                cached = future.result()
+            except Exception as e:
+                logger.warning('Warm-up of match %s failed: %r', futures[future], e)
+                _update(failed=1)
+                continue
+            _update(done=1, cached=int(cached))
+
+    _update(state='done', finished_at=time.time())
+    state = progress()
+    logger.info('Warm-up done in %.1fs: %d matches, %d already cached, %d failed',
+                state['finished_at'] - state['started_at'], state['done'], state['cached'], state['failed'])
+
+def start(catalog, render_mode='server'):
+    '''
+    Start the warm-up in a background thread, in one process of the machine only. Returns at once.
+    Called in a gunicorn worker once it loaded the app (see gunicorn.conf.py), never before the
+    fork: the master process of gunicorn --preload would hold the lock without serving requests.
+    :param catalog: Catalog of the app
+    :param render_mode: see warm_match
+    :return: True when this process runs the warm-up
+    '''
+    global _lock_file
+    if not ENABLED:
+        _update(state='skipped')
+        return False
+
+    os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
+    lock_file = open(LOCK_FILE, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        # Another worker warms the caches up.
+        lock_file.close()
+        _update(state='skipped')
+        return False
+    # The lock is held as long as the file stays open, that is for the life of the process.
+    _lock_file = lock_file
+
+    threading.Thread(target=run, args=(catalog, render_mode), name='warmup', daemon=True).start()
+    return True